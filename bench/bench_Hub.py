@@ -0,0 +1,146 @@
+#===========================================================================
+#
+# Benchmark: Hub link command latency, overflows, and CPU use.
+#
+#===========================================================================
+"""Compare Hub buffer polling strategies against a local Hub emulator.
+
+A HubEmulator (tests/util/helpers/hub.py) with a few virtual devices runs
+in a separate process (so the CPU time measured is only the Hub link) and a
+Hub link and Protocol send a command every GAP seconds while the devices
+send random broadcasts.
+Each polling strategy sets the HubClient poll intervals:
+
+- fixed 0.5:  the original fixed rate of two buffer reads per second.
+- fixed 0.15:  always poll quickly.
+- adaptive:  the default busy and idle intervals.
+
+For each strategy, the command round trip latency (send to finished), the
+buffer reads per second, the Hub buffer overflows, and the CPU use of this
+process are printed.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Hub.py [seconds] [latency] [bcast_rate]
+"""
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+from insteon_mqtt.network.Hub import HubClient
+
+# The Hub emulator is in the test helpers.
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests",
+                             "util"))
+import helpers as H  # noqa: E402 pylint: disable=wrong-import-position
+
+# Seconds between commands.
+GAP = 2.0
+
+# Number of virtual devices.
+NUM_DEVICES = 8
+
+# (name, busy_poll_interval, idle_poll_interval, poll_backoff)
+STRATEGIES = [
+    ("fixed 0.5", 0.5, 0.5, 1.0),
+    ("fixed 0.15", 0.15, 0.15, 1.0),
+    ("adaptive", HubClient.busy_poll_interval, HubClient.idle_poll_interval,
+     HubClient.poll_backoff),
+    ]
+
+
+def serve(conn, latency, bcast_rate):
+    """Run the Hub emulator until the stop request."""
+    logging.getLogger().setLevel(logging.CRITICAL)
+    hub = H.hub.HubEmulator(latency=latency)
+    hub.sim.rand.seed(1)
+    hub.sim.broadcast_rate = bcast_rate
+    for i in range(NUM_DEVICES):
+        hub.sim.add_device("aa.00.%02x" % i, "dimmer")
+    hub.start()
+    conn.send(hub.port)
+
+    conn.recv()
+    conn.send((hub.num_reads, hub.num_overflows))
+    hub.stop()
+
+
+def run_strategy(strategy, duration, latency, bcast_rate):
+    name, busy, idle, backoff = strategy
+    HubClient.busy_poll_interval = busy
+    HubClient.idle_poll_interval = idle
+    HubClient.poll_backoff = backoff
+
+    conn, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=serve,
+                                   args=(child, latency, bcast_rate))
+    proc.start()
+    port = conn.recv()
+
+    mgr = IM.network.Manager()
+    link = IM.network.Hub("127.0.0.1", port, "user", "password")
+    proto = IM.Protocol(link)
+    mgr.add(link, connected=False)
+
+    times = []
+    pending = []
+
+    def callback(msg, on_done):
+        on_done(True, "done", None)
+
+    def on_done(success, msg, data):
+        if success:
+            times.append(time.time() - pending.pop())
+
+    cpu0 = time.process_time()
+    t0 = time.time()
+    next_cmd = t0
+    i = 0
+    while time.time() - t0 < duration:
+        if not pending and time.time() >= next_cmd:
+            addr = IM.Address("aa.00.%02x" % (i % NUM_DEVICES))
+            msg = Msg.OutStandard.direct(addr, 0x11, i % 256)
+            pending.append(time.time())
+            proto.send(msg, IM.handler.StandardCmd(msg, callback, on_done))
+            next_cmd += GAP
+            i += 1
+
+        # Wake up for the next command if none is waiting.
+        time_out = None if pending else max(next_cmd - time.time(), 0.0)
+        mgr.select(time_out=time_out)
+
+    dt = time.time() - t0
+    cpu = time.process_time() - cpu0
+    stats = link.stats.to_dict()["counters"]
+    link.close()
+
+    conn.send("stop")
+    num_reads, num_overflows = conn.recv()
+    proc.join()
+
+    times.sort()
+    print("%-10s  %3d cmds  latency mean %.3f s  p95 %.3f s  "
+          "%.1f reads/s  %d overflows (%d seen)  cpu %.1f%%" %
+          (name, len(times), statistics.mean(times) if times else 0,
+           times[int(0.95 * (len(times) - 1))] if times else 0,
+           num_reads / dt, num_overflows, stats.get("hub_overflows", 0),
+           100 * cpu / dt))
+
+
+def run(duration, latency, bcast_rate):
+    logging.getLogger().setLevel(logging.CRITICAL)
+    IM.log.get_logger().setLevel(logging.CRITICAL)
+
+    print("%.0f s per strategy, %.3f s Hub latency, %.2f broadcasts/s" %
+          (duration, latency, bcast_rate))
+    for strategy in STRATEGIES:
+        run_strategy(strategy, duration, latency, bcast_rate)
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.03,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.1)
@@ -0,0 +1,102 @@
+#===========================================================================
+#
+# Benchmark: Hub buffstatus.xml ring buffer parsing.
+#
+#===========================================================================
+"""Compare the HubClient buffstatus parser to the ElementTree based parser.
+
+A sequence of buffstatus.xml responses is built by writing standard
+messages into a 200 character ring buffer the way the Hub does and each
+parser extracts the new bytes from every response.  The ElementTree
+parser is the original implementation which parses the XML and copies the
+ring into order on every read.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Hub_parse.py [num_reads]
+"""
+import sys
+import threading
+import time
+from unittest import mock
+import xml.etree.ElementTree as ET
+from insteon_mqtt.network.Hub import HubClient
+
+RING_SIZE = 200
+VERIFY_LENGTH = 10
+
+
+class ElementTreeParser:
+    """The original ElementTree and string slicing parser."""
+    def __init__(self):
+        self.prev_bytestring = ''
+        self.prev_byte_end = -1
+
+    def parse(self, content):
+        root = ET.fromstring(content.decode())
+        bytestring = root.find('BS').text
+        byte_end = int(bytestring[-2:], 16)
+        bytestring = bytestring[byte_end:-2] + bytestring[:byte_end]
+
+        ret = None
+        if self.prev_bytestring != '' and self.prev_byte_end >= 0:
+            new_length = byte_end - self.prev_byte_end
+            if new_length < 0:
+                new_length = RING_SIZE + new_length
+
+            verify_start = RING_SIZE - VERIFY_LENGTH - new_length
+            verify_end = RING_SIZE - new_length
+            if (new_length > 0 and self.prev_bytestring ==
+                    bytestring[verify_start:verify_end]):
+                ret = bytes.fromhex(bytestring[-new_length:])
+
+        self.prev_bytestring = bytestring[-VERIFY_LENGTH:]
+        self.prev_byte_end = byte_end
+        return ret
+
+
+def make_responses(num):
+    """Build num buffstatus.xml responses with 0-3 new messages each."""
+    ring = ['0'] * RING_SIZE
+    end = 0
+    out = []
+    for i in range(num):
+        for j in range(i % 4):
+            msg = bytes([0x02, 0x50, 0x10, (i >> 8) & 0xff, i & 0xff, 0x00,
+                         0x00, 0x01, 0xcb, 0x11, j]).hex().upper()
+            for c in msg:
+                ring[end] = c
+                end = (end + 1) % RING_SIZE
+
+        out.append(b"<response><BS>%s%02X</BS></response>" %
+                   ("".join(ring).encode(), end))
+    return out
+
+
+def run(num):
+    responses = make_responses(num)
+
+    old = ElementTreeParser()
+    t0 = time.perf_counter()
+    old_data = [old.parse(i) for i in responses]
+    dt_old = time.perf_counter() - t0
+
+    with mock.patch.object(threading, "Thread"):
+        client = HubClient("127.0.0.1", 25105, "", "")
+
+    t0 = time.perf_counter()
+    new_data = []
+    for content in responses:
+        # pylint: disable=protected-access
+        ring, byte_end = client._parse_buffer(content)
+        new_data.append(client._parse_bytes(ring, byte_end))
+    dt_new = time.perf_counter() - t0
+
+    assert new_data == old_data
+    print("%d reads  ElementTree: %.3f s, %.1f us/read" %
+          (num, dt_old, 1e6 * dt_old / num))
+    print("%d reads  HubClient:   %.3f s, %.1f us/read (%.1fx)" %
+          (num, dt_new, 1e6 * dt_new / num, dt_old / dt_new))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
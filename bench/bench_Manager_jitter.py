@@ -0,0 +1,65 @@
+#===========================================================================
+#
+# Benchmark: event loop scheduling jitter.
+#
+#===========================================================================
+"""Measure how late timed calls run in the network event loop.
+
+A chain of TimedCall calls is run through network.Manager where each call
+schedules the next one a random 20-200 msec later.  The lateness of each
+call is the time it ran minus the time it was scheduled for.  This is run
+once with the links reporting their deadlines to the manager and once with
+the deadlines hidden (the manager only wakes up at the loop time out) for
+comparison.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Manager_jitter.py [num_calls] [time_out]
+"""
+import random
+import sys
+import time
+import insteon_mqtt as IM
+
+
+class NoDeadlineTimedCall(IM.network.TimedCall):
+    """TimedCall that doesn't report its deadline to the manager."""
+    def next_poll_time(self, t):
+        return None
+
+
+def run(link, num, time_out):
+    mgr = IM.network.Manager()
+    mgr.add_poll(link)
+    rand = random.Random(1)
+    late = []
+
+    def call(sched_time):
+        late.append(time.time() - sched_time)
+        if len(late) < num:
+            schedule()
+
+    def schedule():
+        t = time.time() + rand.uniform(0.02, 0.2)
+        link.add(t, call, t)
+
+    schedule()
+    t0 = time.perf_counter()
+    while len(late) < num:
+        mgr.select(time_out=time_out)
+    dt = time.perf_counter() - t0
+
+    late.sort()
+    return ("median %6.1f msec, 95%% %6.1f msec, max %6.1f msec, "
+            "total %.1f s" % (1e3 * late[num // 2], 1e3 * late[int(num * .95)],
+                              1e3 * late[-1], dt))
+
+
+if __name__ == "__main__":
+    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    loop_time_out = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    print("%d calls, loop time out %.2f s" % (num_calls, loop_time_out))
+    print("  deadlines:    %s" % run(IM.network.TimedCall(), num_calls,
+                                     loop_time_out))
+    print("  no deadlines: %s" % run(NoDeadlineTimedCall(), num_calls,
+                                     loop_time_out))
@@ -0,0 +1,160 @@
+#===========================================================================
+#
+# Benchmark: MQTT publish rate, socket writes, and poll mask changes.
+#
+#===========================================================================
+"""Measure the MQTT link publish rate.
+
+A minimal MQTT broker runs in a separate process (so the CPU time measured is
+only the MQTT link) and counts the publish messages it receives.  Bursts of
+BURST publishes (like a scene changing BURST devices) are sent with the
+event loop running between the bursts.  Each write strategy is run:
+
+- per publish:  write the socket after every publish like paho does on its
+  own.
+- batched:  the link default of writing every queued message in one send
+  per loop iteration.
+
+For each strategy, the publishes per second, the socket sends and poll mask
+modify() calls per burst, and the CPU use of this process are printed.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Mqtt.py [seconds]
+"""
+import logging
+import multiprocessing
+import socket
+import sys
+import time
+import insteon_mqtt as IM
+
+# Publishes per burst.
+BURST = 20
+
+PAYLOAD = '{ "state" : "ON", "level" : 255 }'
+
+
+class CountPoll:
+    """select.poll wrapper that counts the modify() calls."""
+    def __init__(self, poll):
+        self._poll = poll
+        self.num_modify = 0
+
+    def modify(self, fd, mask):
+        self.num_modify += 1
+        self._poll.modify(fd, mask)
+
+    def __getattr__(self, name):
+        return getattr(self._poll, name)
+
+
+def serve(conn):
+    """Accept one client, acknowledge the connection, and count publishes."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    conn.send(server.getsockname()[1])
+
+    client = server.accept()[0]
+    client.settimeout(0.2)
+    buf = bytearray()
+    num_pub = 0
+    acked = False
+    while True:
+        try:
+            data = client.recv(65536)
+        except socket.timeout:
+            if conn.poll():
+                break
+            continue
+        if not data:
+            break
+        buf += data
+
+        # Split the packets: type, 7 bit varint remaining length, body.
+        while len(buf) >= 2:
+            size, shift, i = 0, 0, 1
+            while buf[i] & 0x80 and i + 1 < len(buf):
+                size += (buf[i] & 0x7f) << shift
+                shift += 7
+                i += 1
+            size += buf[i] << shift
+            end = i + 1 + size
+            if len(buf) < end:
+                break
+
+            if buf[0] >> 4 == 3:
+                num_pub += 1
+            del buf[:end]
+
+        if not acked:
+            client.send(b"\x20\x02\x00\x00")
+            acked = True
+
+    conn.recv()
+    conn.send(num_pub)
+    client.close()
+    server.close()
+
+
+def run_strategy(name, duration):
+    conn, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=serve, args=(child,))
+    proc.start()
+    port = conn.recv()
+
+    mgr = IM.network.Manager()
+    mgr.poll = CountPoll(mgr.poll)
+    link = IM.network.Mqtt("127.0.0.1", port)
+    mgr.add(link, connected=False)
+    t0 = time.time()
+    while not link.connected and time.time() - t0 < 5:
+        mgr.select(time_out=0.05)
+    fd = link.fileno()
+
+    writes0 = link.stats.counters.get("writes", 0)
+    modify0 = mgr.poll.num_modify
+    per_publish = name == "per publish"
+
+    cpu0 = time.process_time()
+    t0 = time.time()
+    num_burst = 0
+    while time.time() - t0 < duration:
+        for i in range(BURST):
+            link.publish("insteon/aa.bb.%02x/state" % i, PAYLOAD)
+            if per_publish:
+                link.write_to_link(time.time())
+
+        # Run the loop until everything is written.
+        while mgr.masks[fd] != mgr.READ:
+            mgr.select(time_out=0)
+        mgr.select(time_out=0)
+        num_burst += 1
+
+    dt = time.time() - t0
+    cpu = time.process_time() - cpu0
+    writes = link.stats.counters["writes"] - writes0
+    modify = mgr.poll.num_modify - modify0
+
+    conn.send("stop")
+    num_pub = conn.recv()
+    proc.join()
+    link.close()
+
+    print("%-12s  %8.0f publishes/s  %5.1f sends/burst  "
+          "%4.1f modify/burst  %d received  cpu %.1f%%" %
+          (name, num_burst * BURST / dt, writes / num_burst,
+           modify / num_burst, num_pub, 100 * cpu / dt))
+
+
+def run(duration):
+    logging.getLogger().setLevel(logging.CRITICAL)
+    IM.log.get_logger().setLevel(logging.CRITICAL)
+
+    print("%.0f s per strategy, %d publishes per burst" % (duration, BURST))
+    for name in ("per publish", "batched"):
+        run_strategy(name, duration)
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 5)
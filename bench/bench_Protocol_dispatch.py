@@ -0,0 +1,93 @@
+#===========================================================================
+#
+# Benchmark: Protocol inbound message dispatch cost.
+#
+#===========================================================================
+"""Measure the cost of passing inbound messages to the read handlers.
+
+A modem is configured with a set of dimmers and thermostats and then a mix
+of broadcasts from the dimmers and direct status messages from the
+thermostats is passed to Protocol._process_msg().  The device
+handle_broadcast() calls are replaced with a no-op so only the dispatch to
+the handler and device lookups are timed.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Protocol_dispatch.py [num_devices] [num_msgs]
+"""
+import logging
+import sys
+import tempfile
+import time
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+
+# pylint: disable=protected-access
+
+
+class BenchLink(IM.network.PollLink):
+    """Link that doesn't read or write anything.
+
+    PollLink provides the next_poll_time() and set_busy() methods that the
+    Protocol uses.
+    """
+    def __init__(self):
+        super().__init__()
+        self.signal_read = IM.Signal()
+        self.signal_wrote = IM.Signal()
+
+    def write(self, data, next_write_time):
+        pass
+
+
+def no_op(msg):
+    pass
+
+
+def run(num_devices, num_msgs, save_path):
+    logging.getLogger().setLevel(logging.WARNING)
+    IM.log.get_logger().setLevel(logging.WARNING)
+
+    proto = IM.Protocol(BenchLink())
+    modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+    modem.addr = IM.Address('44.85.11')
+    modem.save_path = save_path
+
+    # 1 in 30 devices is a thermostat.  Each thermostat adds it's own read
+    # handler to the protocol.
+    addrs = []
+    for i in range(num_devices):
+        addr = IM.Address(0x10, i >> 8, i & 0xff)
+        name = "dev%d" % i
+        if i % 30 == 0:
+            device = IM.device.Thermostat(proto, modem, addr, name)
+        else:
+            device = IM.device.Dimmer(proto, modem, addr, name)
+        device.handle_broadcast = no_op
+        modem.add(device)
+        addrs.append(addr)
+
+    bcast = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False, 0, 0)
+    direct = Msg.Flags(Msg.Flags.Type.DIRECT, False, 0, 0)
+    msgs = []
+    for i in range(num_msgs):
+        addr = addrs[(i * 7) % num_devices]
+        if (i * 7) % num_devices % 30 == 0:
+            # Thermostat humidity status.
+            msgs.append(Msg.InpStandard(addr, modem.addr, direct, 0x6f, 40))
+        else:
+            msgs.append(Msg.InpStandard(addr, IM.Address(0, 0, 1), bcast,
+                                        0x11, 0xff))
+
+    t0 = time.perf_counter()
+    for msg in msgs:
+        proto._process_msg(msg)
+    dt = time.perf_counter() - t0
+
+    print("%d devices, %d msgs: %.3f s, %.1f usec/msg" %
+          (num_devices, num_msgs, dt, 1e6 * dt / num_msgs))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 20000, tmp_dir)
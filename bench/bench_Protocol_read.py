@@ -0,0 +1,69 @@
+#===========================================================================
+#
+# Benchmark: Protocol inbound frame parsing throughput.
+#
+#===========================================================================
+"""Measure how many PLM frames/sec Protocol._data_read can parse.
+
+A stream of standard and extended messages is fed to the Protocol in
+serial sized chunks (the way network.Serial delivers it) with no handlers
+registered.  Messages use zero hops so they expire immediately from the
+duplicate history and only the framing and parsing are timed.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Protocol_read.py [num_frames] [chunk_size]
+"""
+import logging
+import sys
+import time
+import insteon_mqtt as IM
+
+
+class BenchLink(IM.network.PollLink):
+    """Link that doesn't read or write anything.
+
+    PollLink provides the next_poll_time() and set_busy() methods that the
+    Protocol uses.
+    """
+    def __init__(self):
+        super().__init__()
+        self.signal_read = IM.Signal()
+        self.signal_wrote = IM.Signal()
+
+
+def make_stream(num):
+    """Build a byte stream of num unique standard/extended messages."""
+    out = bytearray()
+    for i in range(num):
+        addr = bytes([0x10, (i >> 8) & 0xff, i & 0xff])
+        if i % 4:
+            # Standard broadcast 0x11 (on) to group 1.
+            out.extend(b"\x02\x50" + addr + b"\x00\x00\x01\xc0\x11\x00")
+        else:
+            # Extended direct message w/ 14 bytes of data.
+            out.extend(b"\x02\x51" + addr + b"\x44\x85\x11\x10\x2f\x00" +
+                       bytes(range(14)))
+    return bytes(out)
+
+
+def run(num, chunk):
+    logging.getLogger().setLevel(logging.WARNING)
+    IM.log.get_logger().setLevel(logging.WARNING)
+
+    link = BenchLink()
+    proto = IM.Protocol(link)
+    stream = make_stream(num)
+
+    t0 = time.perf_counter()
+    for i in range(0, len(stream), chunk):
+        link.signal_read.emit(link, stream[i:i + chunk])
+    dt = time.perf_counter() - t0
+    assert not proto._buf  # pylint: disable=protected-access
+
+    print("%d frames, %d byte chunks: %.3f s, %.0f frames/sec" %
+          (num, chunk, dt, num / dt))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4096)
@@ -0,0 +1,71 @@
+#===========================================================================
+#
+# Benchmark: replay captured PLM traffic through the Protocol.
+#
+#===========================================================================
+"""Measure how fast a captured PLM traffic file is processed.
+
+The capture (see network.Capture and the insteon capture config input) is
+played as fast as possible through a network.Replay link into a Protocol
+and Modem.  This times the parsing, duplicate checks, and dispatch with
+real traffic.  If no capture file is given, a synthetic one with a mix of
+broadcasts and extended messages is generated.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Protocol_replay.py [capture_file]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+import insteon_mqtt as IM
+from insteon_mqtt.network.Capture import MAGIC, RECORD, READ
+
+
+def make_capture(path, num):
+    """Write a synthetic capture of num messages read in serial chunks."""
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for i in range(num):
+            addr = bytes([0x10, (i >> 8) & 0xff, i & 0xff])
+            if i % 4:
+                data = b"\x02\x50" + addr + b"\x00\x00\x01\xc0\x11\x00"
+            else:
+                data = (b"\x02\x51" + addr + b"\x44\x85\x11\x10\x2f\x00" +
+                        bytes(range(14)))
+            f.write(RECORD.pack(1000, READ, len(data)))
+            f.write(data)
+
+
+def run(path, save_path):
+    # There are no devices configured so the unknown device errors from
+    # the broadcast handler are expected.
+    logging.getLogger().setLevel(logging.CRITICAL)
+    IM.log.get_logger().setLevel(logging.CRITICAL)
+
+    link = IM.network.Replay(path, speed=0)
+    proto = IM.Protocol(link)
+    modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+    modem.addr = IM.Address('44.85.11')
+    modem.save_path = save_path
+
+    t0 = time.perf_counter()
+    proto._poll(time.time())  # pylint: disable=protected-access
+    dt = time.perf_counter() - t0
+    assert link.is_finished
+
+    num = proto.stats.counters.get("read", 0)
+    print("%d bytes, %d messages: %.3f s, %.0f msgs/sec" %
+          (link.num_read, num, dt, num / dt))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if len(sys.argv) > 1:
+            cap_path = sys.argv[1]
+        else:
+            cap_path = os.path.join(tmp_dir, "synthetic.cap")
+            make_capture(cap_path, 20000)
+
+        run(cap_path, tmp_dir)
@@ -0,0 +1,146 @@
+#===========================================================================
+#
+# Benchmark: load test with a virtual Insteon network.
+#
+#===========================================================================
+"""Load test the Protocol, Modem, devices, and MQTT with a virtual network.
+
+A network.Simulator link with a few hundred virtual devices (a mix of
+dimmers, switches, keypads, and motion sensors) is configured through the
+same config.apply() call the server uses.  The MQTT link is a stub that
+counts the published messages.  Commands are sent to random devices with a
+fixed number outstanding while the sensors send random broadcasts.  The run
+is in real time since the Protocol write pacing is part of what's measured.
+
+Usage:
+  PYTHONPATH=. python bench/bench_Simulator.py [num_devices] [seconds]
+"""
+import logging
+import random
+import sys
+import tempfile
+import time
+import insteon_mqtt as IM
+
+# Number of commands waiting or in progress at any time.
+CONCURRENCY = 4
+
+# Device kind mix.
+KINDS = ["dimmer", "dimmer", "switch", "switch", "keypad_linc", "motion"]
+
+
+class MqttLink:
+    """Stub MQTT network link that counts the published messages."""
+    def __init__(self):
+        self.signal_connected = IM.Signal()
+        self.connected = True
+        self.num_published = 0
+
+    def load_config(self, config):
+        pass
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.num_published += 1
+
+    def subscribe(self, topic, qos=0, callback=None):
+        pass
+
+    def unsubscribe(self, topic):
+        pass
+
+
+def make_config(num, save_path):
+    """Build a config with num virtual devices."""
+    cfg = IM.config.load("config.yaml")
+    devices = {}
+    for i in range(num):
+        kind = KINDS[i % len(KINDS)]
+        devices.setdefault(kind, []).append("aa.%02x.%02x" % (i >> 8,
+                                                               i & 0xff))
+
+    cfg['insteon'] = {
+        'address' : '44.85.11',
+        'storage' : save_path,
+        'devices' : devices,
+        'sim_seed' : 1,
+        'sim_nak_rate' : 0.01,
+        'sim_timeout_rate' : 0.01,
+        'sim_broadcast_rate' : 1.0,
+        }
+    return cfg
+
+
+def run(num_devices, duration, save_path):
+    # The injected NAK's and timeouts are logged as errors.
+    logging.getLogger().setLevel(logging.CRITICAL)
+    IM.log.get_logger().setLevel(logging.CRITICAL)
+
+    sim = IM.network.Simulator()
+    stack = IM.network.Stack()
+    timed = IM.network.TimedCall()
+    proto = IM.Protocol(sim)
+    modem = IM.Modem(proto, stack, timed)
+    mqtt_link = MqttLink()
+    mqtt = IM.mqtt.Mqtt(mqtt_link, modem)
+    IM.config.apply(make_config(num_devices, save_path), mqtt, modem)
+
+    def poll():
+        # Same polling as network.Manager with a simulator link.
+        t = time.time()
+        proto._poll(t)  # pylint: disable=protected-access
+        stack.poll(t)
+        timed.poll(t)
+        time.sleep(0.001)
+        return t
+
+    # The devices are created once the modem replies to the address request.
+    while len(modem.devices) < num_devices:
+        poll()
+
+    targets = [modem.devices[i.addr.id] for i in sim.devices.values()
+               if not i.is_asleep]
+    rand = random.Random(1)
+    latency = []
+    failed = [0]
+
+    def send():
+        device = rand.choice(targets)
+        start = time.perf_counter()
+
+        def on_done(success, msg, data):
+            latency.append(time.perf_counter() - start)
+            failed[0] += not success
+            send()
+
+        if rand.random() < 0.5:
+            device.on(on_done=on_done)
+        else:
+            device.off(on_done=on_done)
+
+    for _ in range(CONCURRENCY):
+        send()
+
+    cpu0 = time.process_time()
+    t0 = time.time()
+    while poll() - t0 < duration:
+        pass
+    cpu = time.process_time() - cpu0
+
+    latency.sort()
+    num = len(latency)
+    print("%d devices, %.0f s: %d commands (%d failed), %.1f cmds/sec, "
+          "%d messages read" % (num_devices, duration, num, failed[0],
+                                num / duration,
+                                proto.stats.counters.get("read", 0)))
+    if num:
+        print("  latency: median %.3f s, 95%% %.3f s, max %.3f s" %
+              (latency[num // 2], latency[int(num * .95)], latency[-1]))
+    print("  %d MQTT messages published, CPU %.2f s (%.1f%%)" %
+          (mqtt_link.num_published, cpu, 100 * cpu / duration))
+
+
+if __name__ == "__main__":
+    num_dev = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    num_sec = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run(num_dev, num_sec, tmp_dir)
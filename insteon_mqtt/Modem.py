@@ -94,14 +94,18 @@ class Modem:
 
         # Add a generic read handler for any broadcast messages initiated by
         # the Insteon devices.
-        self.protocol.add_handler(handler.Broadcast(self))
+        self.protocol.add_handler(handler.Broadcast(self),
+                                  [Msg.InpStandard.msg_code])
 
         # Handle all link complete messages that the modem sends when the set
         # button or linking mode is finished.
-        self.protocol.add_handler(handler.ModemLinkComplete(self))
+        self.protocol.add_handler(handler.ModemLinkComplete(self),
+                                  [Msg.InpAllLinkComplete.msg_code])
 
         # Handle user triggered factory reset of the modem.
-        self.protocol.add_handler(handler.ModemReset(self))
+        self.protocol.add_handler(handler.ModemReset(self),
+                                  [Msg.OutResetModem.msg_code,
+                                   Msg.InpUserReset.msg_code])
 
         # Log messages as they received so we can track the message hop count
         # to each device.
@@ -135,6 +139,10 @@ class Modem:
                              new entries on start up.
         - devices   List of devices.  Each device is a type and insteon
                     address of the device.
+        - supersede Optional list of device types (dimmer, switch, etc)
+                    where a new on/off/level command replaces an unsent one
+                    in the queue.  If this isn't set, the device type
+                    defaults are used (see Base.supersede_cmds).
 
         This funciton is the first of 2 load_config steps.  It initializes the
         protocol and checks the Modem address.  Step_2 below, continues the
@@ -214,7 +222,8 @@ class Modem:
                       self.addr, self.db.desc, firmware)
 
         # Read the device definitions
-        self._load_devices(config_data.get('devices', []))
+        self._load_devices(config_data.get('devices', []),
+                           config_data.get('supersede', None))
 
         # Read the scenes definitions and load db_configs
         self.scenes = Scenes.SceneManager(self,
@@ -907,7 +916,7 @@ class Modem:
         # Set the error stop to true so an error in one of the import functions
         # stops the stack from running and stopping potentially garbage data
         # from being written to the scenes.yaml file.
-        group = self.stack.new(error_stop=True)
+        group = self.stack.new(error_stop=True, name="Import Scenes")
 
         # First the modem database.
         group.add(self.import_scenes, dry_run=dry_run, save=False)
@@ -1094,7 +1103,9 @@ class Modem:
         if not isinstance(msg, (Msg.InpStandard, Msg.InpExtended)):
             return
 
-        device = self.find(msg.from_addr)
+        # Look up by id directly - this is called for every message so
+        # skip the name and string handling in find().
+        device = self.devices.get(msg.from_addr.id, None)
         if device:
             device.handle_received(msg)
 
@@ -1191,7 +1202,7 @@ class Modem:
         pass
 
     #-----------------------------------------------------------------------
-    def _load_devices(self, data):
+    def _load_devices(self, data, supersede=None):
         """Load device definitions from a configuration data object.
 
         The input is the insteon.devices configuration dictionary.  Keys are
@@ -1200,6 +1211,9 @@ class Modem:
 
         Args:
           data:   Configuration devices dictionary.
+          supersede (list):  Optional list of the device types that use
+                    command supersession.  If this is None, the device
+                    type defaults are used.
         """
         # Add ourselves as a device.
         self.signal_new_device.emit(self, self)
@@ -1225,6 +1239,8 @@ class Modem:
 
             for dev in devices:
                 LOG.info("Created %s at %s", device_type, dev.label)
+                if supersede is not None:
+                    dev.supersede_cmds = device_type in supersede
 
                 # Store the device by ID in the map.
                 self.add(dev)
@@ -5,11 +5,16 @@
 #===========================================================================
 import collections
 import enum
+import heapq
+import itertools
+import logging
 import time
 import datetime
 from . import log
 from . import message as Msg
 from .Signal import Signal
+from .Stats import Stats, COUNT_BUCKETS
+from .WriteQueue import WriteQueue
 #from . import util
 
 LOG = log.get_logger()
@@ -27,8 +32,12 @@ class WriteStatus(enum.Enum):
     WAIT_FOR_REPLY = 2
 
 
-# Output message and handler stored together.
-OutputMsg = collections.namedtuple('OutputMsg', ['msg', 'handler'])
+# Output message and handler stored together.  supersede is the optional
+# key passed to Protocol.send() (see WriteQueue.replace()) and time is when
+# the message was queued.
+OutputMsg = collections.namedtuple('OutputMsg', ['msg', 'handler',
+                                                 'supersede', 'time'],
+                                   defaults=[None, None])
 
 
 class Protocol:
@@ -68,6 +77,10 @@ class Protocol:
        sending one command, getting an ACK, then reading a series of messages
        (1 per db entry) until we get a final message which ends the sequence.
     """
+    # Number of consumed bytes in the inbound buffer before they are removed
+    # from the start of the buffer.
+    buf_compact_size = 4096
+
     def __init__(self, link):
         """Constructor
 
@@ -78,9 +91,13 @@ class Protocol:
         self.link = link
 
         # Forward poll() calls from the network link to ourselves.  That way
-        # we can test for write message time outs periodically.
+        # we can test for write message time outs periodically.  The poll
+        # deadline is forwarded as well so the event loop wakes up for timed
+        # messages and time outs.
         self._linkPoll = self.link.poll
         self.link.poll = self._poll
+        self._linkNextPollTime = self.link.next_poll_time
+        self.link.next_poll_time = self._next_poll_time
 
         # Connect the link read/write signals to our callback methods.
         link.signal_read.connect(self._data_read)
@@ -94,66 +111,112 @@ class Protocol:
         # been removed from the _write_queue
         self.signal_msg_finished = Signal()  # (Message)
 
-        # Inbound message buffer.
+        # Inbound message buffer.  Messages are parsed starting at the
+        # _buf_pos read offset and the bytes before that are only removed
+        # when the buffer is compacted.
         self._buf = bytearray()
-
-        # List of messages to send.  These contain an OutputMsg object which
-        # has the message and handler from oldest to newest.  The handlers
-        # are used to process responses.  We have to wait until the handler
-        # says that it's done receiving replies until we can send the next
-        # message.  If we write to the modem before that, it basically
-        # cancels the previous action.  The _write_status flag indicates what
-        # state the [0] message is in during the write process.  Status of
-        # READY_TO_WRITE indicates we can write to the serial link.  When we
-        # send a message to the serial link, status will change to
-        # PENDING_WRITE.  When the serial link actually sends out the
-        # message, status is changed to WAIT_FOR_REPLY.  When the message
-        # handler says that it's done processing replies, status is changed
-        # back to READY_TO_WRITE and we can write, the [0] object is removed,
-        # can we'll write any other messages in the queue.
-        self._write_queue = []
+        self._buf_pos = 0
+
+        # Queue of messages to send.  These contain an OutputMsg object which
+        # has the message and handler.  The handlers are used to process
+        # responses.  We have to wait until the handler says that it's done
+        # receiving replies until we can send the next message.  If we write
+        # to the modem before that, it basically cancels the previous action.
+        # The _write_status flag indicates what state the head message is in
+        # during the write process.  Status of READY_TO_WRITE indicates we
+        # can write to the serial link.  When we send a message to the serial
+        # link, status will change to PENDING_WRITE.  When the serial link
+        # actually sends out the message, status is changed to
+        # WAIT_FOR_REPLY.  When the message handler says that it's done
+        # processing replies, status is changed back to READY_TO_WRITE and we
+        # can write, the head is removed, and we'll write any other messages
+        # in the queue.  See WriteQueue for the order the messages are sent.
+        self._write_queue = WriteQueue()
         self._write_status = WriteStatus.READY_TO_WRITE
 
-        # Set of possible message handlers to use.  These are handlers that
-        # handle any message that isn't handled by an explicit write handler.
-        # # write handler.
-        self._read_handlers = []
-
-        # This is a list of prior read messages that are checked against to
-        # determine if a subsequent message is a duplicate and can be
-        # ignored.  Message are removed when their expired time is exceeded.
-        # Only InpStandard and InpExtended messsages are de-duplicated at
-        # this time.
-        self._read_history = []
-
-        # List of Msg.Timed objects which store a message and a time at which
-        # to send the message.  It will be sorted by send time.  These are
+        # Time the head message was written and if the PLM ACK of it has
+        # been seen.  Used to measure the reply latency.
+        self._write_time = None
+        self._write_acked = False
+
+        # Performance metrics.  See the Stats class for the API.  Times are
+        # in seconds and the names are:
+        # - counters: read, written, duplicates, plm_busy, plm_nak,
+        #   superseded, finished, expired, handler_retries, handler_timeouts
+        # - gauges: queue_depth
+        # - histograms: queue_depth (at each send), queue_time (send call
+        #   to write), ack_time (write to PLM ACK), and finished_time.CLASS
+        #   (write to handler finished, by output message class).
+        self.stats = Stats()
+
+        # Possible message handlers to use.  These are handlers that handle
+        # any message that isn't handled by the write handler.  This maps a
+        # (msg_code, from address id) key to a list of handlers.  Handlers
+        # for any type or any address use None in that part of the key.
+        # From address ids are only used for InpStandard and InpExtended
+        # messages.
+        self._read_handlers = {}
+
+        # Prior read messages that are checked against to determine if a
+        # subsequent message is a duplicate and can be ignored.  This maps
+        # the message fingerprint to the message expiration time.  The
+        # _read_expire heap holds (expire_time, count, fingerprint) so
+        # messages can be removed when their expire time is exceeded without
+        # scanning the history.  The count breaks ties between equal times
+        # so the fingerprints are never compared.  Only InpStandard and
+        # InpExtended messsages are de-duplicated at this time.
+        self._read_history = {}
+        self._read_expire = []
+        self._read_count = itertools.count()
+
+        # Heap of Msg.Timed objects which store a message and a time at which
+        # to send the message.  The heap is ordered by send time.  These are
         # messages that should be sent after a certain time has passed.  The
-        # _poll() call will this and push them onto the message queue when
-        # the current time is after the message time.
+        # _poll() call will pop them and push them onto the message queue
+        # when the current time is after the message time.  Cancelled
+        # messages stay in the heap until they come due or until they make
+        # up more than half of the heap.
         self._timed_messages = []
+        self._timed_cancelled = 0
 
         # Next time that a message can be written.  When a message is read,
         # we wait until it's expiration time (which is set by the hop count)
         # until we send another message.  Sending messages before a message
         # could expire w/ Insteon is a good way to cancel previous command so
-        # we try and avoid that.
+        # we try and avoid that.  _wait_time is the end of the waits set
+        # with set_wait_time() and _hold_offs maps a caller's key to the end
+        # of a hold off that can be ended early (see hold_off()).  The next
+        # write time is the latest of all of them.
         self._next_write_time = 0
+        self._wait_time = 0
+        self._hold_offs = {}
 
     #-----------------------------------------------------------------------
-    def add_handler(self, handler):
+    def add_handler(self, handler, msg_codes=None, addr=None):
         """Add a universal message handler.
 
         These handlers can handle any message that shows up.  This is
         normally used for broadcast messages that originate on the network
         without us writing us commands.
 
+        Handlers are only passed the messages they were registered for so
+        they don't have to be offered every inbound message.
+
         See the classes in the handler sub-package for examples.
 
         Args:
            handler:  Message handler class to add.
+           msg_codes (list):  The message type codes (Msg.msg_code) that the
+                     handler should be passed.  If this is None, all
+                     messages are passed to the handler.
+           addr (Address):  Only pass InpStandard and InpExtended messages
+                from this address to the handler.  If this is None,
+                messages from any address are passed.
         """
-        self._read_handlers.append(handler)
+        addr_id = addr.id if addr is not None else None
+        for code in msg_codes if msg_codes is not None else [None]:
+            key = (code, addr_id)
+            self._read_handlers.setdefault(key, []).append(handler)
 
     #-----------------------------------------------------------------------
     def remove_handler(self, handler):
@@ -163,7 +226,11 @@ class Protocol:
            handler:  Message handler to remove.  If this doesn't exist,
                      nothing is done.
         """
-        self._read_handlers.pop(handler, None)
+        for key, handlers in list(self._read_handlers.items()):
+            if handler in handlers:
+                handlers.remove(handler)
+                if not handlers:
+                    del self._read_handlers[key]
 
     #-----------------------------------------------------------------------
     def load_config(self, config):
@@ -178,7 +245,8 @@ class Protocol:
         self.link.load_config(config)
 
     #-----------------------------------------------------------------------
-    def send(self, msg, msg_handler, high_priority=False, after=None):
+    def send(self, msg, msg_handler, high_priority=False, after=None,
+             supersede=None):
         """Write a message to the PLM modem.
 
         If there are no other messages in the queue, the message gets written
@@ -204,43 +272,177 @@ class Protocol:
           after (float):  Unix clock time tag to send the message after. If
                 None, the message is sent as soon as possible.  Exact time is
                 not guaranteed - the message will be send no earlier than this.
+
+          supersede:  Optional hashable key for the kind of command (e.g.
+                setting the state of a group).  If an unsent message to the
+                same device with the same key is in the queue, this message
+                replaces it and the old handler on_done callback is called
+                with a superseded failure.  This is ignored in timed
+                messages.
+
+        Messages to different devices are sent round robin so the order
+        messages are sent is only guaranteed for messages to the same device.
+
+        Returns:
+          Msg.Timed:  If after is input, returns the timed message object
+          which can be passed to cancel_timed().  Otherwise returns None.
         """
-        # If the time is input, append the inputs to the timer list and sort
-        # the list by the times field.
+        # If the time is input, push the inputs onto the timer heap.
         if after is not None:
             timed = Msg.Timed(msg, msg_handler, high_priority, after)
-            self._timed_messages.append(timed)
-            self._timed_messages.sort(key=lambda i: i.time)
-            return
-
-        # Normal message queue.
-        output = OutputMsg(msg, msg_handler)
-        if not high_priority:
-            self._write_queue.append(output)
-
-        # High priority messages insert at the front of the queue.
-        else:
-            self._write_queue.insert(0, output)
+            heapq.heappush(self._timed_messages, timed)
+            return timed
+
+        output = OutputMsg(msg, msg_handler, supersede, time.time())
+
+        # If this replaces an older unsent command, the older command is
+        # dropped and there is no need to try and send anything since the
+        # queue had at least one message waiting already.
+        if supersede is not None:
+            old = self._write_queue.replace(output, high_priority)
+            if old is not None:
+                LOG.info("Message superseded by newer message: %s", old.msg)
+                self.stats.incr("superseded")
+                old.handler.on_done(False, "Command superseded", None)
+                return None
+
+        # Normal message queue.  High priority messages are sent before any
+        # other queued messages.
+        self._write_queue.append(output, high_priority)
+        self.stats.observe("queue_depth", len(self._write_queue),
+                           COUNT_BUCKETS)
+        self.stats.gauge("queue_depth", len(self._write_queue))
 
         # If there are no existing messages that we're waiting to send or
         # processing replies for, send the message immediately.
         if self._write_status == WriteStatus.READY_TO_WRITE:
             self._send_next_msg()
 
+        return None
+
+    #-----------------------------------------------------------------------
+    def cancel_timed(self, timed):
+        """Cancel a timed message that hasn't been sent yet.
+
+        The message is flagged as cancelled and is skipped when it comes due.
+        If cancelled messages make up more than half of the timed messages,
+        they are removed and the heap is rebuilt.
+
+        Args:
+          timed (Msg.Timed):  The timed message returned by send().  If this
+                has already been sent or cancelled, nothing is done.
+        """
+        if timed.is_cancelled or timed.is_sent:
+            return
+
+        timed.cancel()
+        self._timed_cancelled += 1
+
+        if self._timed_cancelled * 2 > len(self._timed_messages):
+            self._timed_messages = [i for i in self._timed_messages
+                                    if not i.is_cancelled]
+            heapq.heapify(self._timed_messages)
+            self._timed_cancelled = 0
+
+    #-----------------------------------------------------------------------
+    def next_timed_time(self):
+        """Return the send time of the next timed message.
+
+        Returns:
+          float:  Unix clock time of the next timed message that will be
+          sent or None if there are no timed messages.
+        """
+        while self._timed_messages and self._timed_messages[0].is_cancelled:
+            heapq.heappop(self._timed_messages)
+            self._timed_cancelled -= 1
+
+        return self._timed_messages[0].time if self._timed_messages else None
+
     #-----------------------------------------------------------------------
     def set_wait_time(self, wait_time):
         """Set the Next Time that a Message Can be Sent to Avoid Collision.
 
         Next time that a message can be written.  If the wait time is set to
-        zero, it will cancel all pending wait time.  If the wait time is
-        less than the current pending wait time, it will be ignored.
+        zero, it will cancel all pending wait time including the hold offs.
+        If the wait time is less than the current pending wait time, it will
+        be ignored.
 
         Args:
           wait_time (epoch Seconds): The next time a message can be sent
         """
-        if wait_time == 0 or wait_time > self._next_write_time:
-            wait_time = time.time() if wait_time == 0 else wait_time
-            self._next_write_time = wait_time
+        if wait_time == 0:
+            self._hold_offs.clear()
+            self._wait_time = time.time()
+            self._set_next_write_time(self._wait_time)
+
+        elif wait_time > self._wait_time:
+            self._wait_time = wait_time
+            if wait_time > self._next_write_time:
+                self._set_next_write_time(wait_time)
+
+    #-----------------------------------------------------------------------
+    def hold_off(self, key, end):
+        """Hold off writes until a time that may be ended early.
+
+        This works like set_wait_time() but the hold off can be shortened
+        later with release_hold_off() without changing any other wait.  This
+        is used to hold off writes while a device sends the cleanup messages
+        for a scene broadcast.
+
+        Args:
+          key:  Hashable key for the hold off.  The Broadcast handler uses
+                (device address id, group).
+          end (epoch Seconds):  The time the hold off ends.
+        """
+        if end > self._hold_offs.get(key, 0):
+            self._hold_offs[key] = end
+            if end > self._next_write_time:
+                self._set_next_write_time(end)
+
+    #-----------------------------------------------------------------------
+    def release_hold_off(self, key, end):
+        """End a hold off set with hold_off() early.
+
+        The hold off is removed and end becomes a normal wait time.  The
+        next write time is moved back to the latest of the other hold offs,
+        the wait times, and end.  If the hold off doesn't exist or end isn't
+        before the hold off end, nothing is changed.
+
+        Args:
+          key:  Hashable key for the hold off that was passed to hold_off().
+          end (epoch Seconds):  The new end of the hold off.
+
+        Returns:
+          float:  Returns the end time of the hold off that was removed or
+          None if nothing was changed.
+        """
+        hold_end = self._hold_offs.get(key, None)
+        if hold_end is None or end >= hold_end:
+            return None
+
+        del self._hold_offs[key]
+        self._wait_time = max(self._wait_time, end)
+
+        # Expired hold offs are removed here since this is the only place
+        # the next write time is moved back.
+        t = time.time()
+        self._hold_offs = {k: v for k, v in self._hold_offs.items() if v > t}
+        self._set_next_write_time(max([self._wait_time,
+                                       *self._hold_offs.values()]))
+        return hold_end
+
+    #-----------------------------------------------------------------------
+    def _set_next_write_time(self, next_time):
+        """Set the next write time and log it.
+
+        Args:
+          next_time (epoch Seconds): The next time a message can be sent
+        """
+        self._next_write_time = next_time
+
+        # This is called for every inbound message so skip formatting the
+        # time unless it will be logged.
+        if LOG.isEnabledFor(logging.DEBUG):
             print_time = datetime.datetime.fromtimestamp(
                 self._next_write_time).strftime('%H:%M:%S.%f')[:-3]
             LOG.debug("Setting next write time: %s", print_time)
@@ -265,11 +467,7 @@ class Protocol:
         Args:
           addr (Address): The address to search for.
         """
-        for out in self._write_queue:
-            if isinstance(out.msg, (Msg.OutExtended, Msg.OutStandard)):
-                if out.msg.to_addr == addr:
-                    return True
-        return False
+        return self._write_queue.has_addr(addr)
 
     #-----------------------------------------------------------------------
     def _poll(self, t):
@@ -285,9 +483,13 @@ class Protocol:
         # Call the link poll function in case it needs to do something.
         self._linkPoll(t)
 
-        # See if any timed messages should sent.
+        # Send every timed message that is due.
         while self._timed_messages and self._timed_messages[0].is_active(t):
-            timed = self._timed_messages.pop(0)
+            timed = heapq.heappop(self._timed_messages)
+            if timed.is_cancelled:
+                self._timed_cancelled -= 1
+                continue
+
             LOG.info("Moving timer based message to queue: %s", timed.msg)
             timed.send(self)
 
@@ -295,9 +497,57 @@ class Protocol:
         # the time out in which case we'll mark this message as finished and
         # move on.
         if (self._write_status == WriteStatus.WAIT_FOR_REPLY and
-                self._write_queue[0].handler.is_expired(self, t)):
+                self._write_queue.head.handler.is_expired(self, t)):
+            self.stats.incr("expired")
             self._write_finished()
 
+        # Let the link know if more traffic is expected.
+        self.link.set_busy(self.is_busy(t))
+
+    #-----------------------------------------------------------------------
+    def is_busy(self, t):
+        """Return True if messages are being exchanged with the modem.
+
+        This is True if there are messages to send, if the head message is
+        waiting for replies, or if an inbound message was seen recently
+        enough that more hops or cleanup messages may still arrive.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           bool:  Returns True if the protocol is busy.
+        """
+        return (self._write_status != WriteStatus.READY_TO_WRITE or
+                len(self._write_queue) > 0 or t < self._next_write_time)
+
+    #-----------------------------------------------------------------------
+    def _next_poll_time(self, t):
+        """Return the time the link next needs to be polled.
+
+        This replaces the link next_poll_time() method and adds the protocol
+        deadlines: the next timed message, the time out of the message
+        waiting for a reply, and the end of the wait for more hops of an
+        inbound message.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the earliest deadline or None if there are none.
+        """
+        times = [self._linkNextPollTime(t), self.next_timed_time()]
+        if self._write_status == WriteStatus.WAIT_FOR_REPLY:
+            times.append(self._write_queue.head.handler.expire_time)
+
+        # Poll when the wait for more hops ends so link.set_busy() is
+        # updated.
+        if t < self._next_write_time:
+            times.append(self._next_write_time)
+
+        times = [i for i in times if i is not None]
+        return min(times) if times else None
+
     #-----------------------------------------------------------------------
     def _data_read(self, link, data):
         """PLM modem data read callback.
@@ -313,18 +563,37 @@ class Protocol:
         # Append the read data to the inbound message buffer.
         self._buf.extend(data)
 
+        # Parse all the complete messages in the buffer and then drop the
+        # bytes that have been consumed.  Parsing uses memoryviews into the
+        # buffer and those must be released before the buffer can be resized
+        # so these are two separate steps.
+        self._parse_buf()
+        self._compact_buf()
+
+    #-----------------------------------------------------------------------
+    def _parse_buf(self):
+        """Parse and process the messages in the inbound buffer.
+
+        Messages are read starting at the _buf_pos read offset.  Rather than
+        copying the rest of the buffer each time a message is consumed, the
+        offset is moved forward and each message class reads from a
+        memoryview of the buffer.  The consumed bytes are removed later by
+        _compact_buf().
+        """
+        buf = self._buf
+        view = memoryview(buf)
+
         # Keep processing until there are no more messages to handle.  There
         # must be at least 2 bytes so we can read the message type code.
-        while len(self._buf) > 1:
-            #LOG.debug("Searching message (len %d): %s... ",
-            #               len(self._buf), util.to_hex(self._buf,20))
+        while len(buf) - self._buf_pos > 1:
+            pos = self._buf_pos
 
             # Look for PLM slow down messages
-            start = self._buf.find(0x15)
-            if start == 0:
+            if buf[pos] == 0x15:
                 LOG.info("PLM is busy, pausing briefly")
+                self.stats.incr("plm_busy")
                 self.set_wait_time(time.time() + .3)
-                self._buf = self._buf[1:]
+                self._buf_pos += 1
                 continue
 
             # Find a message start token.  Note that this token could also
@@ -333,57 +602,78 @@ class Protocol:
             # starting token - we're probably reading at the start in the
             # middle of a message so just clear it and wait until we get a
             # start token.
-            start = self._buf.find(0x02)
+            start = buf.find(0x02, pos)
             if start == -1:
                 LOG.debug("No 0x02 starting byte found - clearing")
-                self._buf = bytearray()
+                self._buf_pos = len(buf)
                 break
 
-            # Move the buffer to the start token.  Make sure we still have at
-            # least 2 bytes or wait for more to arrive.
-            if start != 0:
-                LOG.debug("0x02 found at byte %d - shifting", start)
-                self._buf = self._buf[start:]
-                if len(self._buf) < 2:
+            # Move the read offset to the start token.  Make sure we still
+            # have at least 2 bytes or wait for more to arrive.
+            if start != pos:
+                LOG.debug("0x02 found at byte %d - shifting", start - pos)
+                self._buf_pos = pos = start
+                if len(buf) - pos < 2:
                     break
 
             # Messages are [0x02,TYPE] so find map the type code to the
             # message class we need to use to read it.
-            msg_type = self._buf[1]
+            msg_type = buf[pos + 1]
             msg_class = Msg.types.get(msg_type, None)
             if not msg_class:
                 LOG.info("Skipping unknown message type %#04x", msg_type)
                 # Only dropping the first byte (0x02), as the second byte could
                 # be 0x02. Let the find function to locate the next 0x02
-                self._buf = self._buf[1:]
+                self._buf_pos += 1
                 continue
 
             # See if we have enough bytes to read the message.  If not, wait
             # until more data is read.
-            msg_size = msg_class.msg_size(self._buf)
-            if len(self._buf) < msg_size:
+            msg_size = msg_class.msg_size(view[pos:])
+            if len(buf) - pos < msg_size:
                 break
 
-            # Read the message and move the buffer forward.
+            # Read the message and move the read offset forward.
             try:
-                msg = msg_class.from_bytes(self._buf)
+                msg = msg_class.from_bytes(view[pos:pos + msg_size])
             except:
                 LOG.exception("Unknown message bytes sequence")
                 # Skip the initial 0x02 - this way if we got a weird message
                 # with a 0x02 in the message, we won't miss an actual message
                 # by moving msg_size bytes forward which could be wrong.
-                self._buf = self._buf[1:]
+                self._buf_pos += 1
                 continue
 
-            self._buf = self._buf[msg_size:]
+            self._buf_pos += msg_size
             LOG.info("Read %#04x: %s", msg_type, msg)
+            self.stats.incr("read")
 
             if self._is_duplicate(msg):
                 LOG.info("Ignored duplicate %s", msg)
+                self.stats.incr("duplicates")
             else:
                 # And try to process the message using the handlers.
                 self._process_msg(msg)
 
+        view.release()
+
+    #-----------------------------------------------------------------------
+    def _compact_buf(self):
+        """Remove the consumed bytes from the inbound buffer.
+
+        If everything has been read, the buffer is just cleared.  Otherwise
+        the consumed bytes are only removed once the read offset passes
+        buf_compact_size so that a partial message at the end of a large
+        read doesn't cause the remaining buffer to be copied.
+        """
+        if self._buf_pos >= len(self._buf):
+            self._buf.clear()
+            self._buf_pos = 0
+
+        elif self._buf_pos >= self.buf_compact_size:
+            del self._buf[:self._buf_pos]
+            self._buf_pos = 0
+
     #-----------------------------------------------------------------------
     def _is_duplicate(self, msg):
         """Check whether incomming message is a duplicate.
@@ -400,7 +690,7 @@ class Protocol:
         Returns:
           bool: True if this is a duplicate message, false otherwise
         """
-        if not isinstance(msg, Msg.InpStandard):  # Also matches InpExtended
+        if not isinstance(msg, (Msg.InpStandard, Msg.InpExtended)):
             return False
 
         current = time.time()
@@ -413,10 +703,13 @@ class Protocol:
         self.set_wait_time(msg.expire_time)
 
         # See if we have a duplicate message.
-        if msg in self._read_history:
+        key = msg.fingerprint()
+        if key in self._read_history:
             return True
         else:
-            self._read_history.append(msg)
+            self._read_history[key] = msg.expire_time
+            heapq.heappush(self._read_expire,
+                           (msg.expire_time, next(self._read_count), key))
             return False
 
     #-----------------------------------------------------------------------
@@ -428,17 +721,12 @@ class Protocol:
         Args:
           t (float): The current time.
         """
-        expired_idx = []
-
-        # Find all the messages where the current time is after the message
-        # expiration time.
-        for i, msg in enumerate(self._read_history):
-            if t > msg.expire_time:
-                expired_idx.append(i)
-
-        # Remove them in reverse order so that the list indices remain valid.
-        for i in reversed(expired_idx):
-            del self._read_history[i]
+        # The expire heap is sorted by time so only the expired entries at
+        # the front need to be looked at.
+        expire = self._read_expire
+        while expire and t > expire[0][0]:
+            key = heapq.heappop(expire)[2]
+            del self._read_history[key]
 
     #-----------------------------------------------------------------------
     def _process_msg(self, msg):
@@ -459,15 +747,33 @@ class Protocol:
         # status is FINISHED, then the handler has seen all the messages it
         # expects. If it's CONTINUE, it processed the message but expects
         # more.  If it's UNKNOWN, the handler ignored that message.
-        if self._write_queue:
-            handler = self._write_queue[0].handler
+        if self._write_queue.head is not None:
+            head = self._write_queue.head
+            handler = head.handler
             LOG.debug("Passing msg to write handler: %s", handler)
             status = handler.msg_received(self, msg)
 
+            # The first message of the same type as the written message that
+            # the handler accepts is the PLM echo (ACK or NAK).
+            if (status != Msg.UNKNOWN and not self._write_acked and
+                    self._write_time is not None and
+                    msg.msg_code == head.msg.msg_code):
+                self._write_acked = True
+                if getattr(msg, "is_ack", True):
+                    self.stats.observe("ack_time",
+                                       time.time() - self._write_time)
+                else:
+                    self.stats.incr("plm_nak")
+
             # Handler is finished.  Send the next outgoing message if one is
             # waiting.
             if status == Msg.FINISHED:
                 LOG.debug("Write handler finished")
+                self.stats.incr("finished")
+                if self._write_time is not None:
+                    self.stats.observe(
+                        "finished_time." + type(head.msg).__name__,
+                        time.time() - self._write_time)
                 self._write_finished()
                 # Notify any listeners that msg FINISHED
                 self.signal_msg_finished.emit(msg)
@@ -483,15 +789,27 @@ class Protocol:
             assert status == Msg.UNKNOWN
 
         # No write handler or the message didn't match what the handler
-        # expects to see.  Try the regular read handler to see if they
-        # understand the message.
-        for handler in self._read_handlers:
-            status = handler.msg_received(self, msg)
+        # expects to see.  Try the read handlers registered for this message
+        # to see if they understand the message.  Handlers registered for
+        # the sending address are tried first, then the handlers for the
+        # message type, then the handlers for all messages.
+        code = msg.msg_code
+        if isinstance(msg, (Msg.InpStandard, Msg.InpExtended)):
+            addr_id = msg.from_addr.id
+            keys = ((code, addr_id), (None, addr_id), (code, None),
+                    (None, None))
+        else:
+            keys = ((code, None), (None, None))
 
-            # If the message was understood by this handler return.  This
-            # limits us to one handler per message but that's probably ok.
-            if status != Msg.UNKNOWN:
-                return
+        for key in keys:
+            for handler in self._read_handlers.get(key, ()):
+                status = handler.msg_received(self, msg)
+
+                # If the message was understood by this handler return.  This
+                # limits us to one handler per message but that's probably
+                # ok.
+                if status != Msg.UNKNOWN:
+                    return
 
         # No handler was found for the message.  Shift pass the ID code and
         # look for more messages.  This might be better by having a lookup by
@@ -509,10 +827,10 @@ class Protocol:
         The write handler is cleared and the next message in the queue is
         written.  It can also be called if the handler times out.
         """
-        assert self._write_queue
-
-        self._write_queue.pop(0)
+        self._write_queue.finish()
         self._write_status = WriteStatus.READY_TO_WRITE
+        self._write_time = None
+        self.stats.gauge("queue_depth", len(self._write_queue))
 
         if self._write_queue:
             self._send_next_msg()
@@ -529,28 +847,33 @@ class Protocol:
                communicate with the PLM modem.
           data (bytes): The data that was written to the link.
         """
-        assert self._write_queue
+        assert self._write_queue.head is not None
         assert self._write_status == WriteStatus.PENDING_WRITE
 
-        # Set the status to show that the [0] message in the queue was
+        # Set the status to show that the head message in the queue was
         # written out.
         self._write_status = WriteStatus.WAIT_FOR_REPLY
+        self._write_time = time.time()
+        self._write_acked = False
+        self.stats.incr("written")
 
         # Tell the handler that we've sent the message to update the current
         # time out time.
-        out = self._write_queue[0]
+        out = self._write_queue.head
         out.handler.sending_message(out.msg)
 
     #-----------------------------------------------------------------------
     def _send_next_msg(self):
         """Send the next message in the write queue.
 
-        This grabs the first message in the queue and sets it into the
-        write_data field for later processing of replies.
+        This picks the next message in the queue which becomes the head
+        message for later processing of replies.
         """
         # Get the next output message and handler from the write queue.
-        out = self._write_queue[0]
+        out = self._write_queue.start()
         msg_bytes = out.msg.to_bytes()
+        if out.time is not None:
+            self.stats.observe("queue_time", time.time() - out.time)
 
         LOG.info("Write message to modem: %s", out.msg)
         LOG.debug("Write bytes to modem: %s", msg_bytes.hex())
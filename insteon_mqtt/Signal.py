@@ -20,6 +20,10 @@ class Signal:
     the slot will be removed.  Slots can also disconnect themselves in the
     middle of the signal being emitted.
     """
+    # Optional network.LoopMonitor that every slot is called through to find
+    # slow slots.  This is set by LoopMonitor.start().
+    monitor = None
+
     #-----------------------------------------------------------------------
     def __init__(self):
         """Constructor
@@ -41,10 +45,14 @@ class Signal:
         # Loop in reverse order over the slots.  That way we can delete any
         # weak references that no longer exist and support a slot that calls
         # disconnect on itself in the middle of the loop.
+        monitor = Signal.monitor
         for i in reversed(range(len(self.slots))):
             slot = self.slots[i]()
             if slot is not None:
-                slot(*args, **kwargs)
+                if monitor is None:
+                    slot(*args, **kwargs)
+                else:
+                    monitor.call(slot, *args, **kwargs)
             else:
                 del self.slots[i]
 
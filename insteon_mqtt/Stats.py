@@ -0,0 +1,165 @@
+#===========================================================================
+#
+# Performance metrics.
+#
+#===========================================================================
+import bisect
+import math
+
+#: Default histogram bucket upper bounds in seconds.
+TIME_BUCKETS = [.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10]
+
+#: Default histogram bucket upper bounds for counts (like queue depths).
+COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+
+class Histogram:
+    """Fixed bucket histogram.
+
+    Values are counted in the first bucket with an upper bound that is
+    greater than or equal to the value.  Values larger than the last bound
+    are counted in an overflow bucket.  The count, sum, min, and max of the
+    values are also tracked.
+    """
+    def __init__(self, bounds=None):
+        """Constructor
+
+        Args:
+          bounds (list):  Sorted list of bucket upper bounds.  If this is
+                 None, TIME_BUCKETS is used.
+        """
+        self.bounds = list(bounds if bounds is not None else TIME_BUCKETS)
+        self.reset()
+
+    #-----------------------------------------------------------------------
+    def reset(self):
+        """Clear all the values.
+        """
+        # One extra bucket for values greater than the last bound.
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    #-----------------------------------------------------------------------
+    def add(self, value):
+        """Add a value to the histogram.
+
+        Args:
+          value (float):  The value to add.
+        """
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    #-----------------------------------------------------------------------
+    def to_dict(self):
+        """Return the histogram as a JSON compatible dictionary.
+
+        Returns:
+          dict:  Returns the count, sum, min, max, mean, and the bucket
+          counts keyed by the upper bound (the last one is "inf").
+        """
+        if not self.count:
+            return {"count" : 0}
+
+        keys = [str(i) for i in self.bounds] + ["inf"]
+        return {
+            "count" : self.count,
+            "sum" : self.sum,
+            "min" : self.min,
+            "max" : self.max,
+            "mean" : self.sum / self.count,
+            "buckets" : dict(zip(keys, self.buckets)),
+            }
+
+    #-----------------------------------------------------------------------
+
+
+#===========================================================================
+class Stats:
+    """Collection of named counters, gauges, and histograms.
+
+    This is used to track the performance of the Insteon message processing.
+    Counters are incremented, gauges are set to the current value (and the
+    maximum is tracked), and histograms record a distribution of values.
+    Names are created the first time they're used.
+    """
+    def __init__(self):
+        """Constructor
+        """
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    #-----------------------------------------------------------------------
+    def incr(self, name, value=1):
+        """Increment a counter.
+
+        Args:
+          name (str):  The counter name.
+          value (int):  The amount to increment the counter by.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    #-----------------------------------------------------------------------
+    def gauge(self, name, value):
+        """Set a gauge value.
+
+        Args:
+          name (str):  The gauge name.
+          value:  The current value.
+        """
+        gauge = self.gauges.get(name)
+        if gauge is None:
+            self.gauges[name] = [value, value]
+        else:
+            gauge[0] = value
+            gauge[1] = max(gauge[1], value)
+
+    #-----------------------------------------------------------------------
+    def observe(self, name, value, bounds=None):
+        """Add a value to a histogram.
+
+        Args:
+          name (str):  The histogram name.
+          value (float):  The value to add.
+          bounds (list):  The bucket bounds to use if the histogram doesn't
+                 exist yet.  If this is None, TIME_BUCKETS is used.
+        """
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(bounds)
+
+        hist.add(value)
+
+    #-----------------------------------------------------------------------
+    def reset(self):
+        """Clear all the metrics.
+        """
+        self.counters.clear()
+        self.gauges.clear()
+        self.histograms.clear()
+
+    #-----------------------------------------------------------------------
+    def to_dict(self):
+        """Return the metrics as a JSON compatible dictionary.
+
+        Returns:
+          dict:  Returns a dict with counters, gauges, and histograms keys.
+          Gauges are reported as {"value" : current, "max" : maximum}.
+        """
+        # Copy the items first - the Hub records its stats in another
+        # thread.
+        return {
+            "counters" : dict(self.counters),
+            "gauges" : {k: {"value" : v[0], "max" : v[1]}
+                        for k, v in list(self.gauges.items())},
+            "histograms" : {k: v.to_dict()
+                            for k, v in list(self.histograms.items())},
+            }
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,235 @@
+#===========================================================================
+#
+# Protocol output message queue.
+#
+#===========================================================================
+import collections
+from . import message as Msg
+
+
+class WriteQueue:
+    """Queue of output messages waiting to be written to the PLM modem.
+
+    This is used by the Protocol class to store the messages to write.  Only
+    one message can be written and waiting for replies at a time.  That
+    message is the head of the queue.  When the Protocol is ready to write,
+    it calls start() to pick the next message which becomes the head.  When
+    the head message handler has finished, finish() removes it.
+
+    Messages are queued per device (by the to address of standard and
+    extended messages - all other messages are for the modem).  The next
+    message is picked round robin across the devices with queued messages so
+    a long series of messages to one device doesn't stop messages to other
+    devices from being sent.  Messages to the same device are always sent in
+    the order they were queued.  High priority messages are always sent
+    before any other queued messages.
+
+    A count of the queued messages per address is kept so checking for
+    messages to an address doesn't have to scan the queue.
+
+    Messages can have a supersede key (see Protocol.send()).  replace() will
+    swap out an unsent message to the same device with the same key so a
+    burst of commands (like slider changes) only sends the latest one.
+    """
+    def __init__(self):
+        """Constructor
+        """
+        # The message being written or waiting for replies.  This is None if
+        # start() hasn't been called since the last finish().
+        self.head = None
+
+        # High priority messages.  These are inserted at the front so the
+        # most recent one is sent first.
+        self._high = collections.deque()
+
+        # Address ID (or None for modem messages) to deque of the queued
+        # messages for that address.  _order holds the keys that have
+        # messages in round robin order.
+        self._queues = {}
+        self._order = collections.deque()
+
+        # Address ID to the number of messages (including the head) for
+        # that address.
+        self._addr_count = {}
+
+        # Total number of messages (including the head).
+        self._len = 0
+
+    #-----------------------------------------------------------------------
+    def append(self, output, high_priority=False):
+        """Add a message to the queue.
+
+        Args:
+          output (OutputMsg):  The message and handler to queue.
+          high_priority (bool):  False to add the message at the end of the
+                        device queue.  True to send this message before any
+                        other queued messages.
+        """
+        key = self._key(output.msg)
+
+        if high_priority:
+            self._high.appendleft(output)
+        else:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = collections.deque()
+                self._order.append(key)
+
+            queue.append(output)
+
+        if key is not None:
+            self._addr_count[key] = self._addr_count.get(key, 0) + 1
+        self._len += 1
+
+    #-----------------------------------------------------------------------
+    def start(self):
+        """Pick the next message to write.
+
+        If there is already a head message, it's returned.  Otherwise the
+        next message is removed from the queued messages and becomes the
+        head.
+
+        Returns:
+          OutputMsg:  Returns the head message or None if the queue is empty.
+        """
+        if self.head is not None:
+            return self.head
+
+        if self._high:
+            self.head = self._high.popleft()
+
+        elif self._order:
+            # Take the next message from the device at the front of the
+            # round robin order.  If the device has more messages, move it
+            # to the back so the other devices get a turn first.
+            key = self._order.popleft()
+            queue = self._queues[key]
+            self.head = queue.popleft()
+            if queue:
+                self._order.append(key)
+            else:
+                del self._queues[key]
+
+        return self.head
+
+    #-----------------------------------------------------------------------
+    def finish(self):
+        """Remove the head message from the queue.
+
+        Returns:
+          OutputMsg:  Returns the removed head message.
+        """
+        assert self.head is not None
+
+        output = self.head
+        self.head = None
+        self._len -= 1
+
+        key = self._key(output.msg)
+        if key is not None:
+            count = self._addr_count[key] - 1
+            if count:
+                self._addr_count[key] = count
+            else:
+                del self._addr_count[key]
+
+        return output
+
+    #-----------------------------------------------------------------------
+    def replace(self, output, high_priority=False):
+        """Replace an unsent message with a newer one.
+
+        If there is a message in the queue (excluding the head which is
+        already being sent) to the same device with the same supersede key,
+        the new message takes its place in the queue.  A high priority
+        message that replaces a normal message is moved to the front like
+        append() does.
+
+        Args:
+          output (OutputMsg):  The new message and handler.
+          high_priority (bool):  True if the new message is high priority.
+
+        Returns:
+          OutputMsg:  Returns the replaced message or None if there wasn't a
+          matching message.  If None is returned, the new message was not
+          added to the queue.
+        """
+        if output.supersede is None:
+            return None
+
+        key = self._key(output.msg)
+        for queue in (self._queues.get(key, ()), self._high):
+            for i, old in enumerate(queue):
+                if (old.supersede != output.supersede or
+                        self._key(old.msg) != key):
+                    continue
+
+                if high_priority and queue is not self._high:
+                    del queue[i]
+                    if not queue:
+                        del self._queues[key]
+                        self._order.remove(key)
+                    self._high.appendleft(output)
+                else:
+                    queue[i] = output
+                return old
+
+        return None
+
+    #-----------------------------------------------------------------------
+    def has_addr(self, addr):
+        """Check if there are any messages to an address.
+
+        Args:
+          addr (Address):  The address to search for.
+
+        Returns:
+          bool:  True if there is a standard or extended message to the
+          address in the queue (including the head).
+        """
+        return addr.id in self._addr_count
+
+    #-----------------------------------------------------------------------
+    def __len__(self):
+        return self._len
+
+    #-----------------------------------------------------------------------
+    def __iter__(self):
+        """Iterate over the messages in the order they'll be sent.
+
+        The head is first, followed by the high priority messages and then
+        the device queues in round robin order.
+        """
+        if self.head is not None:
+            yield self.head
+
+        yield from self._high
+
+        # Simulate the round robin selection.
+        queues = [iter(self._queues[key]) for key in self._order]
+        while queues:
+            remaining = []
+            for it in queues:
+                output = next(it, None)
+                if output is not None:
+                    yield output
+                    remaining.append(it)
+            queues = remaining
+
+    #-----------------------------------------------------------------------
+    def _key(self, msg):
+        """Return the queue key for a message.
+
+        Args:
+          msg:  The output message.
+
+        Returns:
+          int:  The to address ID for standard and extended messages or None
+          for modem messages.
+        """
+        # OutStandard also matches OutExtended.
+        if isinstance(msg, Msg.OutStandard):
+            return msg.to_addr.id
+        return None
+
+    #-----------------------------------------------------------------------
@@ -30,3 +30,5 @@ from .CommandSeq import CommandSeq
 from .Modem import Modem
 from .Protocol import Protocol
 from .Signal import Signal
+from .Stats import Stats
+from .WriteQueue import WriteQueue
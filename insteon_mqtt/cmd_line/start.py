@@ -29,26 +29,52 @@ def start(args, cfg):
     # config file logging data is used.
     log.initialize(args.level, args.log_screen, args.log, config=cfg)
 
+    # Optionally log slow event loop calls and track the loop lag.
+    monitor = None
+    slow_time = cfg['insteon'].get('loop_monitor', None)
+    if slow_time:
+        monitor = network.LoopMonitor(slow_time).start()
+
     # Create the network event loop and MQTT and serial modem clients.
-    loop = network.Manager()
+    if cfg['insteon'].get('use_asyncio', False):
+        loop = network.AsyncManager()
+    else:
+        loop = network.Manager(monitor=monitor)
     mqtt_link = network.Mqtt()
     stack_link = network.Stack()
 
     # Setup the PLM or Hub
     use_hub = cfg['insteon'].get('use_hub', False)
     time_out = None
-    if use_hub:
-        # This reduces the time that the select/poll call will block. The
-        # default of None is 3 seconds.  A half a second is the same speed at
-        # which we query the hub for incoming messages. If that rate is
-        # changed, consider changing this as well.
-        time_out = .5
-        plm_link = network.Hub()
+    if cfg['insteon'].get('simulator', False):
+        # Use a virtual modem and devices instead of a modem.  These links
+        # report when they need to be polled so no time out is needed.
+        plm_link = network.Simulator()
+        loop.add_poll(plm_link)
+    elif cfg['insteon'].get('replay', None):
+        # Play back a capture file instead of using a modem.
+        plm_link = network.Replay()
         loop.add_poll(plm_link)
+    elif use_hub:
+        # The Hub link wakes up the loop when the Hub thread reads data so no
+        # time out is needed.
+        plm_link = network.Hub()
+        loop.add(plm_link, connected=False)
+    elif cfg['insteon'].get('use_tcp', False):
+        # PLM modem over a raw TCP socket (Hub 1, ser2net, etc).
+        plm_link = network.Tcp()
+        loop.add(plm_link, connected=False)
     else:
         plm_link = network.Serial()
         loop.add(plm_link, connected=False)
 
+    # Optionally record all of the modem traffic.  The capture object has
+    # to stay alive while the loop is running.
+    capture = None
+    capture_path = cfg['insteon'].get('capture', None)
+    if capture_path:
+        capture = network.Capture(plm_link, capture_path)
+
     # Add Stack and timed
     stack_link = network.Stack()
     timed_link = network.TimedCall()
@@ -63,10 +89,22 @@ def start(args, cfg):
     insteon = Protocol(plm_link)
     modem = Modem(insteon, stack_link, timed_link)
     mqtt_handler = mqtt.Mqtt(mqtt_link, modem)
+    mqtt_handler.loop_monitor = monitor
 
     # Load the configuration data into the objects.
     config.apply(cfg, mqtt_handler, modem)
 
     # Start the network event loop.
-    while loop.active():
-        loop.select(time_out=time_out)
+    try:
+        if isinstance(loop, network.AsyncManager):
+            loop.run(time_out=time_out)
+        else:
+            while loop.active():
+                loop.select(time_out=time_out)
+    finally:
+        if isinstance(loop, network.AsyncManager):
+            loop.close()
+        if capture:
+            capture.close()
+        if monitor:
+            monitor.stop()
@@ -32,6 +32,13 @@ class Base:
     names from the class, then anything could be called via remote message
     which isn't desirable.
     """
+    # If this is True, a newly queued command that sets the state of a
+    # group (on/off/level) replaces an unsent command for the same group in
+    # the Protocol write queue.  Derived types turn this on when the device
+    # only cares about the last requested state.  The insteon supersede
+    # config input sets this for each device instead.
+    supersede_cmds = False
+
     @classmethod
     def from_config(cls, values, protocol, modem, **kwargs):
         """Load all the devices for a specific type from configuration.
@@ -176,7 +183,8 @@ class Base:
             }}
 
     #-----------------------------------------------------------------------
-    def send(self, msg, msg_handler, high_priority=False, after=None):
+    def send(self, msg, msg_handler, high_priority=False, after=None,
+             supersede=None):
         """Send a message to the device.
 
         This will use the history of messages received from the device to set
@@ -198,11 +206,23 @@ class Base:
                 If None, the message is sent as soon as possible.  Exact time
                 is not guaranteed - the message will be send no earlier than
                 this.
+          supersede:  Key for the kind of command being sent.  If
+                supersede_cmds is True, this is passed to Protocol.send() so
+                that this message replaces any unsent message with the same
+                key.  Otherwise it is ignored.
+
+        Returns:
+          Msg.Timed:  If after is input, returns the timed message handle
+          from Protocol.send() which can be used to cancel the message.
         """
         if isinstance(msg, Msg.OutStandard):  # handles OutExtended as well
             msg.flags.set_hops(self.history.avg_hops())
 
-        self.protocol.send(msg, msg_handler, high_priority, after)
+        if not self.supersede_cmds:
+            supersede = None
+
+        return self.protocol.send(msg, msg_handler, high_priority, after,
+                                  supersede)
 
     #-----------------------------------------------------------------------
     def db_path(self):
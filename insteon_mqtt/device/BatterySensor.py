@@ -91,7 +91,8 @@ class BatterySensor(Base):
         self._awake_time = False
 
     #-----------------------------------------------------------------------
-    def send(self, msg, msg_handler, high_priority=False, after=None):
+    def send(self, msg, msg_handler, high_priority=False, after=None,
+             supersede=None):
         """Send a message to the device.
 
         This captures and queues messages so that they can be sent when the
@@ -114,14 +115,23 @@ class BatterySensor(Base):
                 If None, the message is sent as soon as possible.  Exact time
                 is not guaranteed - the message will be send no earlier than
                 this.
+          supersede:  Key for the kind of command being sent.  See
+                Base.send() for details.
+
+        Returns:
+          Msg.Timed:  If after is input and the device is awake, returns the
+          timed message handle from Base.send().  Otherwise returns None.
         """
         # It seems like pressing the set button seems to keep them awake for
         # about 3 minutes
         if self._awake_time >= (time.time() - 180):
-            super().send(msg, msg_handler, high_priority, after)
-        else:
-            LOG.ui("BatterySensor %s - queueing msg until awake", self.label)
-            self._send_queue.append([msg, msg_handler, high_priority, after])
+            return super().send(msg, msg_handler, high_priority, after,
+                                supersede)
+
+        LOG.ui("BatterySensor %s - queueing msg until awake", self.label)
+        self._send_queue.append([msg, msg_handler, high_priority, after,
+                                 supersede])
+        return None
 
     #-----------------------------------------------------------------------
     def is_on(self):
@@ -307,8 +317,9 @@ class BatterySensor(Base):
         if (self._send_queue and
                 not self.protocol.is_addr_in_write_queue(self.addr)):
             LOG.info("BatterySensor %s awake - sending msg", self.label)
-            msg, handler, high_priority, after = self._send_queue.pop()
+            msg, handler, high_priority, after, supersede = \
+                self._send_queue.pop()
             handler.set_retry_num(0)
-            super().send(msg, handler, high_priority, after)
+            super().send(msg, handler, high_priority, after, supersede)
 
     #-----------------------------------------------------------------------
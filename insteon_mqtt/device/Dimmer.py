@@ -37,6 +37,10 @@ class Dimmer(functions.Scene, functions.Set, Base):
       released).
     """
 
+    # A new on/off/level command replaces an unsent one in the write queue
+    # so a burst of level changes only sends the last one.
+    supersede_cmds = True
+
     # Mapping of ramp rates to human readable values
     ramp_pretty = {0x00: 540, 0x01: 480, 0x02: 420, 0x03: 360, 0x04: 300,
                    0x05: 270, 0x06: 240, 0x07: 210, 0x08: 180, 0x09: 150,
@@ -140,7 +144,7 @@ class Dimmer(functions.Scene, functions.Set, Base):
         # command is ACK'ed.
         callback = functools.partial(self.handle_ack, reason=reason)
         msg_handler = handler.StandardCmd(msg, callback, on_done)
-        self.send(msg, msg_handler)
+        self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def off(self, group=0x01, mode=on_off.Mode.NORMAL, reason="",
@@ -182,7 +186,7 @@ class Dimmer(functions.Scene, functions.Set, Base):
         # the command is ACK'ed.
         callback = functools.partial(self.handle_ack, reason=reason)
         msg_handler = handler.StandardCmd(msg, callback, on_done)
-        self.send(msg, msg_handler)
+        self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def increment_up(self, reason="", on_done=None):
@@ -35,6 +35,10 @@ class FanLinc(Dimmer):
     """
     type_name = "fan_linc"
 
+    # A new fan speed or light level command replaces an unsent one of the
+    # same kind.  The fan is controlled via group 2 in the extended data.
+    supersede_cmds = True
+
     # Enum of fan speeds to Insteon speed variables.  The values for LOW and
     # MED were picked arbitrarily as the mid points of those ranges.  The
     # exact value doesn't really matter in this case as long as it's in the
@@ -164,7 +168,7 @@ class FanLinc(Dimmer):
         # command is ACK'ed.
         callback = functools.partial(self.handle_speed, reason=reason)
         msg_handler = handler.StandardCmd(msg, callback, on_done, num_retry=3)
-        self.send(msg, msg_handler)
+        self.send(msg, msg_handler, supersede=("state", 0x02))
 
     #-----------------------------------------------------------------------
     def fan_off(self, reason="", on_done=None):
@@ -198,7 +202,7 @@ class FanLinc(Dimmer):
         # command is ACK'ed.
         callback = functools.partial(self.handle_speed, reason=reason)
         msg_handler = handler.StandardCmd(msg, callback, on_done)
-        self.send(msg, msg_handler)
+        self.send(msg, msg_handler, supersede=("state", 0x02))
 
     #-----------------------------------------------------------------------
     def fan_set(self, speed, reason="", on_done=None):
@@ -48,6 +48,9 @@ class KeypadLinc(functions.Set, functions.Scene, Base):
       device starts or stops manual mode (when a button is held down or
       released).
     """
+    # A new load level or button LED command replaces an unsent one for the
+    # same button in the write queue.
+    supersede_cmds = True
 
     #-----------------------------------------------------------------------
     def __init__(self, protocol, modem, address, name, dimmer=True):
@@ -327,7 +330,7 @@ class KeypadLinc(functions.Set, functions.Scene, Base):
             # command is ACK'ed.
             callback = functools.partial(self.handle_set_load, reason=reason)
             msg_handler = handler.StandardCmd(msg, callback, on_done)
-            self.send(msg, msg_handler)
+            self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def off(self, group=0, mode=on_off.Mode.NORMAL, reason="",
@@ -397,7 +400,7 @@ class KeypadLinc(functions.Set, functions.Scene, Base):
             # command is ACK'ed.
             callback = functools.partial(self.handle_set_load, reason=reason)
             msg_handler = handler.StandardCmd(msg, callback, on_done)
-            self.send(msg, msg_handler)
+            self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def increment_up(self, reason="", on_done=None):
@@ -687,7 +690,7 @@ class KeypadLinc(functions.Set, functions.Scene, Base):
                                          is_on=is_on, led_bits=led_bits,
                                          reason=reason)
             msg_handler = handler.StandardCmd(msg, callback, on_done)
-            self.send(msg, msg_handler)
+            self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def set_backlight(self, level, on_done=None):
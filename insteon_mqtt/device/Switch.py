@@ -34,6 +34,9 @@ class Switch(functions.Set, functions.Scene, Base):
     - signal_manual( Device, on_off.Manual mode ): Sent when the device
       starts or stops manual mode (when a button is held down or released).
     """
+    # A new on/off command replaces an unsent one in the write queue.
+    supersede_cmds = True
+
     def __init__(self, protocol, modem, address, name=None):
         """Constructor
 
@@ -113,7 +116,7 @@ class Switch(functions.Set, functions.Scene, Base):
         callback = functools.partial(self.handle_ack, reason=reason)
         msg_handler = handler.StandardCmd(msg, callback, on_done)
 
-        self.send(msg, msg_handler)
+        self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def off(self, group=0x01, mode=on_off.Mode.NORMAL, reason="",
@@ -156,7 +159,7 @@ class Switch(functions.Set, functions.Scene, Base):
         # command is ACK'ed.
         callback = functools.partial(self.handle_ack, reason=reason)
         msg_handler = handler.StandardCmd(msg, callback, on_done)
-        self.send(msg, msg_handler)
+        self.send(msg, msg_handler, supersede=("state", group))
 
     #-----------------------------------------------------------------------
     def set_backlight(self, level, on_done=None):
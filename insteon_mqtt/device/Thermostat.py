@@ -117,7 +117,8 @@ class Thermostat(Base):
 
         # Add handler for processing direct Messages from the thermostat.
         # This handler stays active for all time - it never ends.
-        protocol.add_handler(handler.ThermostatCmd(self))
+        protocol.add_handler(handler.ThermostatCmd(self),
+                             [Msg.InpStandard.msg_code], self.addr)
 
         # Defined controller groups and the handlers for them
         self.group_map = {
@@ -106,6 +106,13 @@ class Base:
         """
         self._expire_time = time.time() + self._time_out
 
+    #-----------------------------------------------------------------------
+    @property
+    def expire_time(self):
+        """The time the handler times out or None if it hasn't been sent.
+        """
+        return self._expire_time
+
     #-----------------------------------------------------------------------
     def is_expired(self, protocol, t):
         """See if the time out time has been exceeded.
@@ -129,11 +136,13 @@ class Base:
         elif not self._msg or self._num_sent > self._num_retry:
             LOG.error("Handler timed out - no more retries (%s sent)",
                       self._num_sent - 1)
+            protocol.stats.incr("handler_timeouts")
             self.handle_timeout(protocol)
             return True
 
         LOG.warning("Handler timed out %s of %s sent: %s",
                     self._num_sent, self._num_retry, self._msg)
+        protocol.stats.incr("handler_retries")
 
         # Increase the hop count if we can.
         if isinstance(self._msg, Msg.OutStandard):  # also handles OutExtended
@@ -33,9 +33,22 @@ class Broadcast(Base):
     This handler will call device.handle_broadcast(msg) for the device that
     sends the message.
 
+    While the cleanups are being sent, writes are held off to avoid
+    collisions.  The hold off uses a worst case estimate of the time
+    required based on the number of responders.  That's only used as a
+    ceiling - the hold off is ended early when the cleanup report arrives or
+    when the cleanup sent to the modem shows that only a few responders are
+    left.  Each device and group has its own hold off in the protocol so
+    ending one early doesn't affect the others.  The protocol stats track
+    how much write time that saves.
+
     NOTE: This handler is designed to always be active - it never returns
     FINISHED.
     """
+    # Hold off timing in seconds.  See msg_received() for details.
+    wait_overhead = .5
+    wait_per_responder = .522
+
     def __init__(self, modem):
         """Constructor
 
@@ -82,11 +95,17 @@ class Broadcast(Base):
         # misterhouse.  Each device causes a cleanup and an ack.  Assuminng
         # a max of three hops in each direction that is 6 * .087 or .522 per
         # device.
-        device = self.modem.find(msg.from_addr)
+        #
+        # Look the device up directly by address id rather than using
+        # Modem.find() which also handles names and strings.  This is done
+        # once and passed on since this is called for every broadcast.
+        device = self.modem.devices.get(msg.from_addr.id, None)
+        responders = []
         wait_time = 0
         if device:
             responders = device.db.find_group(msg.group)
-            wait_time = .5 + (len(responders) * .522)
+            wait_time = (self.wait_overhead +
+                         len(responders) * self.wait_per_responder)
 
         # Process the all link broadcast.
         if msg.flags.type == Msg.Flags.Type.ALL_LINK_BROADCAST:
@@ -94,11 +113,8 @@ class Broadcast(Base):
                 # This is the final broadcast signalling completion.
                 # All of these messages will be forwarded to the device
                 # potentially even duplicates
-                # Re-enable sending
-                # First clear wait time
-                protocol.set_wait_time(0)
-                # Then set as expire time of this message
-                protocol.set_wait_time(msg.expire_time)
+                # Re-enable sending once this message has expired.
+                self._release(protocol, msg, msg.expire_time)
                 # cmd2 identifies the number of failed devices
                 if msg.cmd2 == 0x00:
                     LOG.debug("Cleanup report for %s, grp %s success.",
@@ -106,11 +122,11 @@ class Broadcast(Base):
                 else:
                     text = "Cleanup report for %s, grp %s had %d fails."
                     LOG.warning(text, msg.from_addr, msg.group, msg.cmd2)
-                return self._process(msg, protocol, wait_time)
+                return self._process(msg, protocol, device, None)
             else:
                 # This is the initial broadcast or an echo of it.
                 if self._should_process(msg, wait_time):
-                    return self._process(msg, protocol, wait_time)
+                    return self._process(msg, protocol, device, wait_time)
                 else:
                     return Msg.CONTINUE
 
@@ -119,28 +135,39 @@ class Broadcast(Base):
         # if we missed the broadcast, this gives us a second chance to
         # trigger the scene.
         elif msg.flags.type == Msg.Flags.Type.ALL_LINK_CLEANUP:
+            result = Msg.CONTINUE
             if self._should_process(msg, wait_time):
-                return self._process(msg, protocol, wait_time)
-            else:
-                return Msg.CONTINUE
+                result = self._process(msg, protocol, device, wait_time)
+
+            # The cleanup to the modem shows where the device is in its list
+            # of responders so the hold off can be shortened to cover only
+            # the responders after the modem.
+            remaining = self._remaining_responders(responders)
+            if remaining is not None:
+                end = time.time() + (remaining + 1) * self.wait_per_responder
+                self._release(protocol, msg, end)
+
+            return result
 
         # Different message flags than we expected.
         return Msg.UNKNOWN
 
     #-----------------------------------------------------------------------
-    def _process(self, msg, protocol, wait_time):
+    def _process(self, msg, protocol, device, wait_time):
         """Process the all link broadcast message.
 
         Args:
           msg (Msg.InpStandard):  Message to handle.
+          protocol (Protocol):  The Insteon Protocol object
+          device:  The device that sent the message or None if it's unknown.
+          wait_time (float):  The number of seconds to delay sending.  If
+                    this is None, the write hold off isn't changed.
 
         Returns:
           Msg.UNKNOWN if we can't handle this message.
           Msg.CONTINUE if we handled the message and expect more.
           Msg.FINISHED if we handled the message and are done.
         """
-        # Find the device that sent the message.
-        device = self.modem.find(msg.from_addr)
         if not device:
             LOG.error("Unknown broadcast device %s", msg.from_addr)
             return Msg.UNKNOWN
@@ -152,7 +179,10 @@ class Broadcast(Base):
         self._last_broadcast = msg
 
         # Delay sending, see above
-        protocol.set_wait_time(time.time() + wait_time)
+        if wait_time is not None:
+            protocol.stats.incr("hold_off")
+            protocol.hold_off((msg.from_addr.id, msg.group),
+                              time.time() + wait_time)
 
         # Tell the device about it.  This will look up all the responders for
         # this group and tell them that the scene has been activated.
@@ -187,3 +217,54 @@ class Broadcast(Base):
             return False
 
         return True
+
+    #-----------------------------------------------------------------------
+    def _release(self, protocol, msg, end):
+        """End the write hold off for the device and group early.
+
+        If there is a hold off for the message device and group and the end
+        time is before the hold off end time, the hold off is shortened to
+        the input end time.  Hold offs for other devices and groups and
+        other protocol wait times aren't changed.
+
+        Args:
+          protocol (Protocol):  The Insteon Protocol object
+          msg (Msg.InpStandard):  The cleanup or cleanup report message.
+          end (float):  The new end time of the hold off.
+        """
+        # The protocol removes the hold off when it's released so each hold
+        # off is only counted once in the stats.
+        hold_end = protocol.release_hold_off((msg.from_addr.id, msg.group),
+                                             end)
+        if hold_end is None:
+            return
+
+        saved = hold_end - max(end, time.time())
+        protocol.stats.incr("hold_off_released")
+        protocol.stats.observe("hold_off_saved", saved)
+        LOG.debug("Broadcast hold off for %s, grp %s ended %.3f sec early",
+                  msg.from_addr, msg.group, saved)
+
+    #-----------------------------------------------------------------------
+    def _remaining_responders(self, responders):
+        """Find the number of responders after the modem.
+
+        Devices send the cleanups in the order of their all link database
+        which is scanned from the highest memory location down.
+
+        Args:
+          responders ([DeviceEntry]):  The device database entries for the
+                     group.
+
+        Returns:
+          int:  Returns the number of responders that get a cleanup after
+          the modem or None if the modem isn't a responder.
+        """
+        mem_locs = [i.mem_loc for i in responders
+                    if i.addr == self.modem.addr]
+        if not mem_locs:
+            return None
+
+        return sum(1 for i in responders if i.mem_loc < mem_locs[0])
+
+    #-----------------------------------------------------------------------
@@ -137,6 +137,19 @@ class InpStandard(Base):
                     (self.from_addr, self.flags, self.group, self.cmd1,
                      self.cmd2))
 
+    #-----------------------------------------------------------------------
+    def fingerprint(self):
+        """Return a hashable key used to detect duplicate messages.
+
+        Two messages with the same fingerprint are equal (see __eq__) so
+        this ignores the hops_left and max_hops fields.
+
+        Returns:
+          tuple:  The message fingerprint.
+        """
+        return (self.msg_code, self.from_addr.id, self.flags.type,
+                self.flags.is_ext, self.group, self.cmd1, self.cmd2)
+
     #-----------------------------------------------------------------------
     def __eq__(self, rhs):
         """Checks for message for equality.
@@ -197,7 +210,7 @@ class InpExtended(Base):
         flags = Flags.from_bytes(raw, 8)
         cmd1 = raw[9]
         cmd2 = raw[10]
-        data = raw[11:25]
+        data = bytes(raw[11:25])
         return InpExtended(from_addr, to_addr, flags, cmd1, cmd2, data)
 
     #-----------------------------------------------------------------------
@@ -251,6 +264,20 @@ class InpExtended(Base):
             o.write("%02x " % i)
         return o.getvalue()
 
+    #-----------------------------------------------------------------------
+    def fingerprint(self):
+        """Return a hashable key used to detect duplicate messages.
+
+        Two messages with the same fingerprint are equal (see __eq__) so
+        this ignores the hops_left and max_hops fields.
+
+        Returns:
+          tuple:  The message fingerprint.
+        """
+        return (self.msg_code, self.from_addr.id, self.flags.type,
+                self.flags.is_ext, self.group, self.cmd1, self.cmd2,
+                bytes(self.data))
+
     #-----------------------------------------------------------------------
     def __eq__(self, rhs):
         """Checks for message for equality.
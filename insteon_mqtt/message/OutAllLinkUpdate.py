@@ -86,7 +86,7 @@ class OutAllLinkUpdate(Base):
         db_flags = DbFlags.from_bytes(raw, 3)
         group = raw[4]
         addr = Address.from_bytes(raw, 5)
-        data = raw[8:11]
+        data = bytes(raw[8:11])
         is_ack = raw[11] == 0x06
         return OutAllLinkUpdate(cmd, db_flags, group, addr, data, is_ack)
 
@@ -57,7 +57,7 @@ class OutStandard(Base):
 
         # Read the extended message payload.
         assert len(raw) >= OutExtended.fixed_msg_size
-        data = raw[8:22]
+        data = bytes(raw[8:22])
         is_ack = raw[22] == 0x06
         return OutExtended(to_addr, flags, cmd1, cmd2, data, is_ack)
 
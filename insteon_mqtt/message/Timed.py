@@ -3,6 +3,7 @@
 # Timed message class
 #
 #===========================================================================
+import itertools
 
 
 class Timed:
@@ -11,7 +12,16 @@ class Timed:
     This stores a message and time at which the message should be sent and is
     used by the Protocol class for storing a message that should be sent at
     some later time.
+
+    Timed objects sort by send time (and then by creation order) so they can
+    be stored in a heapq.  Protocol.send() returns the Timed object as a
+    handle which can be passed to Protocol.cancel_timed() to cancel the
+    message.  Cancelled messages are left in the heap and skipped when they
+    come due.
     """
+    # Creation counter used to keep messages with the same time in FIFO
+    # order in the heap.
+    _count = itertools.count()
 
     #-----------------------------------------------------------------------
     def __init__(self, msg, msg_handler, high_priority, after):
@@ -35,6 +45,9 @@ class Timed:
         self.msg_handler = msg_handler
         self.high_priority = high_priority
         self.time = after
+        self.is_cancelled = False
+        self.is_sent = False
+        self._seq = next(Timed._count)
 
     #-----------------------------------------------------------------------
     def is_active(self, t):
@@ -45,6 +58,12 @@ class Timed:
         """
         return t >= self.time
 
+    #-----------------------------------------------------------------------
+    def cancel(self):
+        """Cancel the message so it won't be sent.
+        """
+        self.is_cancelled = True
+
     #-----------------------------------------------------------------------
     def send(self, protocol):
         """Send the message.
@@ -52,6 +71,16 @@ class Timed:
         Args:
           protocol (Protocol):  The Protocol class to use.
         """
+        self.is_sent = True
         protocol.send(self.msg, self.msg_handler, self.high_priority)
 
+    #-----------------------------------------------------------------------
+    def __lt__(self, rhs):
+        """Heap ordering by send time and then creation order.
+
+        Args:
+          rhs (Timed):  The Timed object to compare to.
+        """
+        return (self.time, self._seq) < (rhs.time, rhs._seq)
+
 #===========================================================================
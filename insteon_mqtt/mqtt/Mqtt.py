@@ -6,7 +6,9 @@
 import functools
 import json
 import logging
+import time
 from .. import log
+from ..Stats import Stats
 from . import config
 from .MsgTemplate import MsgTemplate
 from .Reply import Reply
@@ -40,7 +42,26 @@ class Mqtt:
     implements for various things.  The payload for these messages is always
     a json data object that will get passed to the Insteon device for
     handling
+
+    If the stats_topic is configured, the Insteon Protocol performance
+    metrics (see Protocol.stats) are published as a JSON payload to that
+    topic every stats_interval seconds.
+
+    Retained messages can skip payloads that were already sent on a topic
+    (duplicate broadcasts, refreshes, etc) with the publish_policy input:
+
+    - always:  publish every message (the default).
+    - on_change:  only publish if the payload changed.
+    - refresh:  only publish if the payload changed or publish_refresh
+      seconds have passed since it was last published.
+
+    Messages that aren't retained (button presses, etc) are always
+    published.  The cache is cleared when the broker connection is made so
+    the current state is always sent after a reconnect.
     """
+    # Allowed publish_policy inputs.
+    policies = ["always", "on_change", "refresh"]
+
     def __init__(self, mqtt_link, modem):
         """Constructor
 
@@ -72,6 +93,26 @@ class Mqtt:
         # Loaded config object.
         self._config = None
 
+        # Optional metrics topic and publishing interval in seconds.
+        # _stats_call is the scheduled TimedCall entry for the next publish.
+        self._stats_topic = None
+        self._stats_interval = 60
+        self._stats_call = None
+
+        # Optional network.LoopMonitor to publish the event loop metrics of.
+        self.loop_monitor = None
+
+        # Retained message publish policy (see policies) and the refresh
+        # time in seconds.  _published is the last payload and time
+        # published for each topic.
+        self._publish_policy = "always"
+        self._publish_refresh = 3600
+        self._published = {}
+
+        # Counters: publish_suppressed (messages not sent because of the
+        # publish policy).
+        self.stats = Stats()
+
     #-----------------------------------------------------------------------
     def load_config(self, data):
         """Load a configuration dictionary.
@@ -89,6 +130,15 @@ class Mqtt:
         - retain:      (bool) Retain sent messages (Default True)
         - cmd_topic:   (str) The MQTT topic prefix to subscribe to for
                        system commands.
+        - stats_topic: (str) Optional topic to publish the Insteon protocol
+                       metrics to.
+        - stats_interval: (float) The number of seconds between metrics
+                       messages (Default 60).
+        - publish_policy: (str) When to publish retained messages: always,
+                       on_change, or refresh (Default always).
+        - publish_refresh: (float) The number of seconds after which an
+                       unchanged payload is published again with the
+                       refresh policy (Default 3600).
 
         Args:
           data (dict):  Configuration data to load.
@@ -104,9 +154,31 @@ class Mqtt:
         self.qos = data.get('qos', self.qos)
         self.retain = data.get('retain', self.retain)
 
+        policy = data.get('publish_policy', self._publish_policy)
+        if policy not in self.policies:
+            LOG.error("Invalid MQTT publish_policy '%s'.  Valid inputs: %s",
+                      policy, ", ".join(self.policies))
+            policy = "always"
+
+        self._publish_policy = policy
+        self._publish_refresh = data.get('publish_refresh',
+                                         self._publish_refresh)
+        self._published.clear()
+
         # Save the config for later passing to devices when they are created.
         self._config = data
 
+        # Start (or stop) the periodic metrics messages.
+        self._stats_topic = data.get('stats_topic', None)
+        self._stats_interval = data.get('stats_interval',
+                                        self._stats_interval)
+        if self._stats_call:
+            self.modem.timed_call.remove(self._stats_call)
+            self._stats_call = None
+
+        if self._stats_topic:
+            self._schedule_stats()
+
         # Subscribe to the new topics.
         if self.link.connected:
             self._subscribe()
@@ -126,9 +198,55 @@ class Mqtt:
         qos = self.qos if qos is None else qos
         retain = self.retain if retain is None else retain
 
+        if self._publish_policy != "always":
+            if not retain:
+                # The next retained message on this topic is always sent.
+                self._published.pop(topic, None)
+
+            else:
+                t = time.time()
+                last = self._published.get(topic)
+                if (last is not None and last[0] == payload and
+                        (self._publish_policy == "on_change" or
+                         t - last[1] < self._publish_refresh)):
+                    LOG.debug("MQTT publish %s unchanged, skipping", topic)
+                    self.stats.incr("publish_suppressed")
+                    return
+
+                self._published[topic] = (payload, t)
+
         # Pass the message to the network link.
         self.link.publish(topic, payload, qos, retain)
 
+    #-----------------------------------------------------------------------
+    def publish_stats(self):
+        """Publish the Insteon protocol metrics.
+
+        The metrics are published as JSON to the stats topic.  This is
+        called periodically once the stats topic is configured.
+        """
+        if not self._stats_topic:
+            return
+
+        stats = self.modem.protocol.stats.to_dict()
+
+        # Links with their own stats (the Hub request latency).
+        link_stats = getattr(self.modem.protocol.link, "stats", None)
+        if link_stats is not None:
+            stats["link"] = link_stats.to_dict()
+
+        # Publish policy and MQTT link counters.
+        stats["mqtt"] = self.stats.to_dict()
+        mqtt_stats = getattr(self.link, "stats", None)
+        if mqtt_stats is not None:
+            stats["mqtt"]["counters"].update(mqtt_stats.counters)
+
+        if self.loop_monitor is not None:
+            stats["loop"] = self.loop_monitor.to_dict()
+
+        stats["time"] = time.time()
+        self.publish(self._stats_topic, json.dumps(stats), retain=False)
+
     #-----------------------------------------------------------------------
     def close(self):
         """Close the MQTT link.
@@ -152,6 +270,8 @@ class Mqtt:
           connected (bool):  True if connected, False if disconnected.
         """
         if self.link.connected:
+            # The broker may not have the retained messages anymore.
+            self._published.clear()
             self._subscribe()
 
     #-----------------------------------------------------------------------
@@ -338,6 +458,25 @@ class Mqtt:
         for device in self.devices.values():
             device.subscribe(self.link, self.qos)
 
+    #-----------------------------------------------------------------------
+    def _schedule_stats(self):
+        """Schedule the next metrics message.
+        """
+        self._stats_call = self.modem.timed_call.add(
+            time.time() + self._stats_interval, self._stats_timer)
+
+    #-----------------------------------------------------------------------
+    def _stats_timer(self):
+        """Periodic metrics TimedCall callback.
+
+        Publishes the metrics if the link is connected and then schedules the
+        next call.
+        """
+        if self.link.connected:
+            self.publish_stats()
+
+        self._schedule_stats()
+
     #-----------------------------------------------------------------------
     def _unsubscribe(self):
         """Unsubscribe to the command and set topics.
@@ -0,0 +1,374 @@
+#===========================================================================
+#
+# asyncio based network manager.
+#
+#===========================================================================
+import asyncio
+import itertools
+import time
+from .. import log
+
+LOG = log.get_logger(__name__)
+
+
+class AsyncManager:
+    """asyncio based network event loop manager.
+
+    This is an alternative to the poll.Manager event loop that runs the same
+    Link objects on an asyncio event loop.  Link file descriptors are
+    watched with the loop reader and writer callbacks, reconnection attempts
+    use loop timers, and the links are polled after every read or write and
+    at the earliest Link.next_poll_time() deadline.  Other asyncio code
+    (servers, clients, tasks) can run on the same loop without extra
+    threads.
+
+    Create the manager, then the links, then call run() to start the loop.
+
+        mgr = AsyncManager()
+        mgr.add( MyLink(...) )
+        mgr.add_poll( MyPollLink(...) )
+        mgr.run(time_out=1)
+        mgr.close()
+
+    The loop runs until there are no active or unconnected links.  If the
+    manager created the event loop, close() closes it.
+    """
+    # Minimum time out - used to poll links for reconnection and other random
+    # processing.
+    min_time_out = 3  # seconds
+
+    #-----------------------------------------------------------------------
+    def __init__(self, loop=None):
+        """Constructor.
+
+        Args:
+          loop:  The asyncio event loop to use.  If this is None, a new
+                 selector event loop is created (the reader and writer
+                 callbacks need a selector loop).
+        """
+        # The manager owns (and closes) the loop if it creates it.
+        self._own_loop = loop is None
+        self.loop = loop if loop is not None else asyncio.SelectorEventLoop()
+
+        # Map of fileno to Link objects.
+        self.links = {}
+        # Set of filenos with a writer callback.  Links emit the needs write
+        # signal for every message so this is used to skip re-registering
+        # the writer.
+        self.writers = set()
+        # List of links to only call poll() on.
+        self.poll_links = []
+
+        # List of unconnected links.  Each one has a loop timer set to try
+        # connecting it again.
+        self.unconnected = []
+
+        # Maximum time between link polls.  This is set by run().
+        self.time_out = None
+
+        # Timer handle for the next poll of the links and True if the poll
+        # will run on the next loop iteration.
+        self._poll_handle = None
+        self._poll_soon = False
+
+        # Future that is finished when run() should return.
+        self._done = None
+
+    #-----------------------------------------------------------------------
+    def active(self):
+        """Returns non-zero if the link has active links or unconnected links.
+        """
+        return len(self.links) + len(self.unconnected)
+
+    #-----------------------------------------------------------------------
+    def add_poll(self, link):
+        """Add a Link that is only polled.
+
+        The input link does not need a file descriptor and only has to
+        support the poll() and next_poll_time() methods from the Link class.
+        The link closing signal can be used to remove the link from the
+        manager.
+
+        Args:
+          link (Link):  Link object to add to the manager.
+        """
+        LOG.debug("Polling link added: %s", link)
+        self.poll_links.append(link)
+
+        link.signal_closing.connect(self.poll_link_closing)
+        link.signal_connected.emit(link, True)
+        self._schedule_poll()
+
+    #-----------------------------------------------------------------------
+    def add(self, link, connected=True):
+        """Add a Link to the manager.
+
+        To remove a link, call link.close().
+
+        Args:
+          link (Link):  Link object to add to the manager.
+          connected (bool):  True if the link is already connected.  False
+                    if the manager should try and connect the link itself.
+        """
+        LOG.debug("Link added: %s", link)
+
+        if connected:
+            fd = link.fileno()
+            self.loop.add_reader(fd, self._read, link)
+
+            link.signal_closing.connect(self.link_closing)
+            link.signal_needs_write.connect(self.link_needs_write)
+
+            self.links[fd] = link
+
+            # Now that the fd is registered, we can notify others that the
+            # links is ready to read or write.
+            link.signal_connected.emit(link, True)
+            self._schedule_poll()
+
+        # For unconnected links, try to connect on the next loop iteration.
+        else:
+            self.unconnected.append(link)
+            self.loop.call_soon(self._connect, link)
+
+    #-----------------------------------------------------------------------
+    def remove(self, link):
+        """Remove a link from the manager.
+
+        To remove a link, call link.close() - this method should generally
+        not be used to remove the link.
+
+        Args:
+          link (Link):  The link to remove.  If the link isn't in the
+               manager, nothing is done.
+        """
+        fd = link.fileno()
+        if fd not in self.links:
+            return
+
+        link.signal_closing.disconnect(self.link_closing)
+        link.signal_needs_write.disconnect(self.link_needs_write)
+
+        self.loop.remove_reader(fd)
+        self.loop.remove_writer(fd)
+        self.writers.discard(fd)
+        self.links.pop(fd, None)
+
+        LOG.debug("Link removed %s", link)
+
+    #-----------------------------------------------------------------------
+    def close_all(self):
+        """Close all the links in the manager.
+
+        This wlil call Link.close() to shut the links down.
+        """
+        links = list(self.links.values())
+        for link in links:
+            link.close()
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the event loop if the manager created it.
+
+        Call this after run() returns.  A loop that was passed to the
+        constructor is left open for the caller to close.
+        """
+        if self._own_loop and not self.loop.is_closed():
+            self.loop.close()
+
+    #-----------------------------------------------------------------------
+    def run(self, time_out=None):
+        """Run the event loop until there are no links left.
+
+        Args:
+          time_out (float):  Maximum time in seconds between link polls.  If
+                   this is None, min_time_out is used.  The links are also
+                   polled after each read and write and at their
+                   next_poll_time() deadlines.
+        """
+        self.loop.run_until_complete(self.run_async(time_out))
+
+    #-----------------------------------------------------------------------
+    async def run_async(self, time_out=None):
+        """Coroutine that runs until there are no links left.
+
+        Use this instead of run() to start the manager from code that is
+        already running the event loop.
+
+        Args:
+          time_out (float):  Maximum time in seconds between link polls.
+        """
+        self.time_out = time_out
+        self._done = self.loop.create_future()
+        self._schedule_poll()
+        self._check_done()
+        await self._done
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the earliest poll deadline of all the links.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the Unix clock time of the earliest
+           Link.next_poll_time() or None if no link has a deadline.
+        """
+        deadline = None
+        for link in itertools.chain(self.links.values(), self.poll_links):
+            link_time = link.next_poll_time(t)
+            if link_time is not None and (deadline is None or
+                                          link_time < deadline):
+                deadline = link_time
+
+        return deadline
+
+    #-----------------------------------------------------------------------
+    def link_closing(self, link):
+        """Callback when a link is closing.
+
+        This is called when the Link.close() occurs.  It will remove the link
+        from the manager.  If the link.return_connect_dt() returns a time,
+        the link is added to the unconnected list for later re-connection.
+
+        Arg:
+          link (Link):  The link that is closing.
+        """
+        self.remove(link)
+
+        dt = link.retry_connect_dt()
+        if dt and dt > 0:
+            self.unconnected.append(link)
+            self.loop.call_later(dt, self._connect, link)
+
+        # Emit the connected signal to let anyone else know that the link is
+        # no longer connected.
+        link.signal_connected.emit(link, False)
+        self._check_done()
+
+    #-----------------------------------------------------------------------
+    def poll_link_closing(self, link):
+        """Callback when a poll only link is closing.
+
+        Arg:
+          link (Link):  The link that is closing.
+        """
+        self.poll_links.remove(link)
+
+        # Emit the connected signal to let anyone else know that the link is
+        # no longer connected.
+        link.signal_connected.emit(link, False)
+
+    #-----------------------------------------------------------------------
+    def link_needs_write(self, link, needs_write):
+        """Callback when a link write status changes state.
+
+        This adds or removes the loop writer callback for the link.
+
+        Arg:
+          link (Link):  The link changing state.
+          needs_write (bool):  True if the link has data to write.  False
+                      if the link no longer has data to write.
+        """
+        fd = link.fileno()
+        if needs_write:
+            if fd not in self.writers:
+                self.loop.add_writer(fd, self._write, link)
+                self.writers.add(fd)
+        elif fd in self.writers:
+            self.loop.remove_writer(fd)
+            self.writers.discard(fd)
+
+    #-----------------------------------------------------------------------
+    def _connect(self, link):
+        """Loop timer callback to try and connect a link.
+
+        Args:
+          link (Link):  The unconnected link.
+        """
+        if link not in self.unconnected:
+            return
+
+        LOG.debug("Link connection attempt %s", link)
+        if link.connect():
+            LOG.debug("Link connection success %s", link)
+            self.unconnected.remove(link)
+            self.add(link)
+        else:
+            LOG.debug("Link connection failed %s", link)
+            self.loop.call_later(link.retry_connect_dt(), self._connect, link)
+
+    #-----------------------------------------------------------------------
+    def _read(self, link):
+        """Loop reader callback.
+
+        Args:
+          link (Link):  The link that has data to read.
+        """
+        link.read_from_link()
+        self._schedule_poll()
+
+    #-----------------------------------------------------------------------
+    def _write(self, link):
+        """Loop writer callback.
+
+        Args:
+          link (Link):  The link that can be written to.
+        """
+        link.write_to_link(time.time())
+        self._schedule_poll()
+
+    #-----------------------------------------------------------------------
+    def _schedule_poll(self):
+        """Poll the links on the next loop iteration.
+
+        Multiple requests before the poll runs are combined into one poll.
+        """
+        if self._poll_soon:
+            return
+
+        if self._poll_handle is not None:
+            self._poll_handle.cancel()
+
+        self._poll_soon = True
+        self._poll_handle = self.loop.call_soon(self._poll)
+
+    #-----------------------------------------------------------------------
+    def _poll(self):
+        """Poll all the links and schedule the next poll.
+
+        The next poll is at the earliest link deadline or after the time out
+        if that's sooner.
+        """
+        self._poll_soon = False
+        self._poll_handle = None
+
+        # Copy the links before iterating since polling may close a link
+        # which modifies the containers.
+        t = time.time()
+        for link in itertools.chain(list(self.links.values()),
+                                    list(self.poll_links)):
+            link.poll(t)
+
+        time_out = self.min_time_out if self.time_out is None else \
+            self.time_out
+
+        t = time.time()
+        deadline = self.next_poll_time(t)
+        if deadline is not None:
+            time_out = min(time_out, max(deadline - t, 0.0))
+
+        # A poll may have been requested by a link during the poll.
+        if not self._poll_soon:
+            self._poll_handle = self.loop.call_later(time_out, self._poll)
+
+    #-----------------------------------------------------------------------
+    def _check_done(self):
+        """Finish run() if there are no links left.
+        """
+        if self._done is not None and not self._done.done() and \
+           not self.active():
+            self._done.set_result(None)
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,161 @@
+#===========================================================================
+#
+# PLM link traffic capture.
+#
+#===========================================================================
+import struct
+import time
+from .. import log
+
+LOG = log.get_logger(__name__)
+
+#: Capture file header.  The last byte is the format version.
+MAGIC = b"IMCAP\x01"
+
+#: Record header: microseconds since the previous record, direction, and the
+#: number of data bytes.
+RECORD = struct.Struct("<IBH")
+
+#: Record directions.
+READ = 0
+WRITE = 1
+
+# Maximum values that fit in the record header fields.
+_MAX_DT = 0xFFFFFFFF
+_MAX_SIZE = 0xFFFF
+
+
+class Capture:
+    """PLM link traffic recorder.
+
+    This connects to the signal_read and signal_wrote signals of a PLM link
+    (Serial or Hub) and records every block of bytes read from and written to
+    the link with a monotonic time stamp.  The capture can be played back
+    with the Replay link to reproduce problems or benchmark the message
+    processing with real traffic.
+
+    The file is a header (MAGIC) followed by one record per block.  Each
+    record is a RECORD header (microseconds since the previous record,
+    READ/WRITE direction, and the data size) followed by the data.  Gaps
+    longer than ~71 minutes are recorded as the maximum gap.
+    """
+    def __init__(self, link, path):
+        """Constructor
+
+        Args:
+          link:  The PLM link (Serial or Hub) to record.
+          path (str):  The capture file to write.  If it exists, it's
+               overwritten.
+        """
+        self.link = link
+        self.path = path
+
+        # The file stays open while recording and is closed by close().
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+        self._file.write(MAGIC)
+        self._last_time = time.monotonic()
+
+        link.signal_read.connect(self._data_read)
+        link.signal_wrote.connect(self._data_wrote)
+        LOG.info("Capturing %s traffic to %s", link, path)
+
+    #-----------------------------------------------------------------------
+    def record(self, direction, data):
+        """Record a block of data.
+
+        Args:
+          direction (int):  READ or WRITE.
+          data (bytes):  The data that was read or written.
+        """
+        if self._file is None:
+            return
+
+        now = time.monotonic()
+        dt = min(int((now - self._last_time) * 1e6), _MAX_DT)
+        self._last_time = now
+
+        # Very large blocks are split so the size fits in the header.
+        for i in range(0, max(len(data), 1), _MAX_SIZE):
+            block = data[i:i + _MAX_SIZE]
+            self._file.write(RECORD.pack(dt, direction, len(block)))
+            self._file.write(block)
+            dt = 0
+
+        # Flush each record so the capture is complete if the process dies.
+        self._file.flush()
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Stop recording and close the file.
+        """
+        if self._file is None:
+            return
+
+        self.link.signal_read.disconnect(self._data_read)
+        self.link.signal_wrote.disconnect(self._data_wrote)
+        self._file.close()
+        self._file = None
+
+    #-----------------------------------------------------------------------
+    def _data_read(self, link, data):
+        """Link data read callback.
+
+        Args:
+          link:  The PLM link.
+          data (bytes):  The data that was read.
+        """
+        self.record(READ, data)
+
+    #-----------------------------------------------------------------------
+    def _data_wrote(self, link, data):
+        """Link data written callback.
+
+        Args:
+          link:  The PLM link.
+          data (bytes):  The data that was written.
+        """
+        self.record(WRITE, data)
+
+    #-----------------------------------------------------------------------
+
+
+#===========================================================================
+def read_capture(path):
+    """Read a capture file.
+
+    Args:
+      path (str):  The capture file to read.
+
+    Returns:
+      list:  Returns a list of (time, direction, bytes) tuples where time is
+      the number of seconds since the capture started.
+
+    Raises:
+      ValueError:  If the file isn't a capture file or is truncated.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    if not raw.startswith(MAGIC):
+        raise ValueError("%s is not a PLM capture file" % path)
+
+    records = []
+    t = 0.0
+    pos = len(MAGIC)
+    while pos < len(raw):
+        if pos + RECORD.size > len(raw):
+            raise ValueError("Truncated record header in %s" % path)
+
+        dt, direction, size = RECORD.unpack_from(raw, pos)
+        pos += RECORD.size
+        if pos + size > len(raw):
+            raise ValueError("Truncated record data in %s" % path)
+
+        t += dt * 1e-6
+        records.append((t, direction, raw[pos:pos + size]))
+        pos += size
+
+    return records
+
+
+#===========================================================================
@@ -3,7 +3,8 @@
 # Insteon Hub class definition.
 #
 #===========================================================================
-import xml.etree.ElementTree as ET
+import binascii
+import os
 import time
 import threading
 import queue
@@ -11,13 +12,14 @@ import queue
 import requests
 
 from ..Signal import Signal
+from ..Stats import Stats
 from .. import log
-#from .Link import Link
+from .Link import Link
 
 LOG = log.get_logger(__name__)
 
 
-class Hub():
+class Hub(Link):
     """A HTTP Network Interface for using the Insteon Hub as the Modem
 
     Works with the model 2245-222 Hub and likely others.  The Hubs only offer
@@ -26,14 +28,17 @@ class Hub():
     own thread for directly interfacing with the Hub.
 
     This class is merely a bridge between what the PLM interface uses and the
-    HubClient.
+    HubClient.  When the link is added to the network manager as a regular
+    link (not a poll only link), connect() creates a pipe and the HubClient
+    writes to it when it has read data.  The pipe is the link file
+    descriptor so the event loop wakes up as soon as data arrives.
     """
     read_buf_size = 4096
     max_write_queue = 500
 
     def __init__(self, ip=None, port='25105', user=None, password=None):
         """Constructor.  Mostly just defines some attributes that are expected
-        but un-needed.  The HubClient is started in poll().
+        but un-needed.  The HubClient is started in connect() or poll().
 
         Args:
           ip: (str) the ip address of the Hub.
@@ -44,8 +49,6 @@ class Hub():
         # Public signals to connect to for read/write notification.
         self.signal_read = Signal()   # (Hub, bytes)
         self.signal_wrote = Signal()  # (Hub, bytes)
-        self.signal_connected = Signal()
-        self.signal_closing = Signal()
 
         super().__init__()
 
@@ -56,6 +59,10 @@ class Hub():
 
         self.client = None
 
+        # Wake up pipe (read, write) file descriptors.  The HubClient writes
+        # to the pipe when it has read data.
+        self._wake_fds = None
+
         # List of packets to write.  Each is a tuple of (bytes, time) where
         # the time is the time after which to do the write.
         self._write_buf = []
@@ -85,6 +92,74 @@ class Hub():
         assert self._user is not None
         assert self._password is not None
 
+    #-----------------------------------------------------------------------
+    def retry_connect_dt(self):
+        """Return None - the Hub link isn't reconnected.
+
+        The HubClient reconnects to the Hub itself when requests fail.
+        """
+        return None
+
+    #-----------------------------------------------------------------------
+    def connect(self):
+        """Start the HubClient with a wake up pipe.
+
+        The network manager calls this when the link is added as an
+        unconnected link which happens after the config is loaded.
+
+        Returns:
+          bool:  Returns True.
+        """
+        if self._wake_fds is None:
+            self._wake_fds = os.pipe()
+            for fd in self._wake_fds:
+                os.set_blocking(fd, False)
+
+        self._start_client()
+        return True
+
+    #-----------------------------------------------------------------------
+    def fileno(self):
+        """Return the file descriptor to watch for this link.
+
+        Returns:
+          int:  Returns the read end of the wake up pipe.
+        """
+        return self._wake_fds[0]
+
+    #-----------------------------------------------------------------------
+    def read_from_link(self):
+        """Read data from the HubClient.
+
+        This is called by the manager when the HubClient has written to the
+        wake up pipe.
+
+        Returns:
+           int:  Returns 0.
+        """
+        # Empty the pipe first so data the client reads while we're emptying
+        # the queue wakes the loop up again.
+        try:
+            while os.read(self._wake_fds[0], 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        self._read_from_hub()
+        return 0
+
+    #-----------------------------------------------------------------------
+    def write_to_link(self, t):
+        """Write data to the link.
+
+        Writes are passed to the HubClient in poll() so this is never
+        called.
+
+        Args:
+           t (float):  The current time (time.time).
+        """
+        pass  # pragma: no cover
+
     #-----------------------------------------------------------------------
     def write(self, data, next_write_time):
         """Schedule data for writing to the serial device.
@@ -114,23 +189,79 @@ class Hub():
         Pushes the messages to write to the HubClient and checks for incomming
         messages from the HubClient.
 
-        Will spawn the HubClient on the first call.
+        Will spawn the HubClient on the first call if the link is only
+        polled.
 
         Args:
            t (float):  Current Unix clock time tag.
         """
         if self.client is None:
             # To allow config to load, this is run on the first loop
-            self.client = HubClient(self._ip, self._port, self._user,
-                                    self._password)
+            self._start_client()
         self._read_from_hub()
         self._write_to_hub(t)
 
+    #-----------------------------------------------------------------------
+    def _start_client(self):
+        """Start the HubClient thread if it isn't running.
+        """
+        if self.client is None:
+            wake_fd = self._wake_fds[1] if self._wake_fds else None
+            self.client = HubClient(self._ip, self._port, self._user,
+                                    self._password, wake_fd)
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the next permitted write time if there is data
+           waiting to be written.  If the link is only polled (no wake up
+           pipe), the next HubClient read of the Hub buffer is also
+           returned.
+        """
+        # The client is started by the first poll.
+        if self.client is None:
+            return t
+
+        next_time = None
+        if self._wake_fds is None:
+            next_time = t + self.client.poll_interval
+
+        if self._write_buf:
+            write_time = self._write_buf[0][1]()
+            if next_time is None or write_time < next_time:
+                next_time = write_time
+        return next_time
+
+    #-----------------------------------------------------------------------
+    def set_busy(self, busy):
+        """Tell the HubClient if messages are being exchanged.
+
+        The Hub buffer is read faster while busy so replies arrive sooner.
+
+        Args:
+          busy (bool):  True if a reply or more messages are expected.
+        """
+        if self.client is not None:
+            self.client.busy = busy
+
+    #-----------------------------------------------------------------------
+    @property
+    def stats(self):
+        """The HubClient request Stats or None if the client isn't running.
+        """
+        return self.client.stats if self.client is not None else None
+
     #-----------------------------------------------------------------------
     def _read_from_hub(self):
         """Read data from the hub
 
-        This is called by the poll call on every loop.
+        This is called by the poll call on every loop and when the wake up
+        pipe is readable.
         """
         if self.client.has_read_data():
             data = self.client.read()
@@ -169,10 +300,18 @@ class Hub():
         """
         LOG.info("Hib device closing %s", self._ip)
 
-        self.client.close()
+        if self.client is not None:
+            self.client.close()
         self._write_buf = []
         self.signal_closing.emit(self)
 
+        # The manager uses fileno() when the link closes so the pipe is
+        # closed last.
+        if self._wake_fds is not None:
+            for fd in self._wake_fds:
+                os.close(fd)
+            self._wake_fds = None
+
     #-----------------------------------------------------------------------
     def __str__(self):
         return "Hub %s" % str(self._ip)
@@ -181,7 +320,16 @@ class Hub():
 
 
 class HubClient:
-    def __init__(self, ip, port, user, password):
+    # Seconds between reads of the Hub buffer while messages are being
+    # exchanged.  When idle, the time between reads grows by poll_backoff
+    # each read up to idle_poll_interval.  The idle interval sets the
+    # latency of unsolicited messages (switch presses) so it's no longer
+    # than the original fixed interval.
+    busy_poll_interval = 0.15
+    idle_poll_interval = 0.5
+    poll_backoff = 1.5
+
+    def __init__(self, ip, port, user, password, wake_fd=None):
         """Constructor.
 
         Args:
@@ -189,22 +337,28 @@ class HubClient:
           port: (int) the port number of the Hub.
           user: (str) the Hub username
           password: (str) the Hub password
+          wake_fd: (int) Optional non-blocking file descriptor to write to
+                   when data has been read.
         """
         self.ip = ip
         self.port = port
         self.user = user
         self.password = password
+        self.wake_fd = wake_fd
         # Flag for close signal
         self._close = False
         self._read_queue = queue.Queue()
         self._write_queue = queue.Queue()
+        # Set to end the thread sleep early when there is data to write or
+        # the client is closing.
+        self._wake = threading.Event()
         self.read_timeout_count = 0
-        self._prev_bytestring = ''
+        # The hex characters just before the end of the ring buffer and the
+        # end position from the last read.  These are used to find the new
+        # data in the next read.  The ring buffer length (200 characters on
+        # the 2245 Hub) is taken from the response.
+        self._prev_bytestring = None
         self._prev_byte_end = -1
-        # My current hub uses a 200 character buffer, not sure if any other
-        # lengths could or do exists, this would have to adjusted if they
-        # do.
-        self.buff_length = 200
 
         # This is the length of chracters that must be matched for this to be
         # deemed a valid message.  10 characters which results in 5 bytes, is
@@ -214,6 +368,22 @@ class HubClient:
         # usable buffer length
         self.verify_length = 10
 
+        # True if the Protocol expects replies or more messages.  This is
+        # set by the main thread.
+        self.busy = False
+
+        # Current time between buffer reads and the maximum idle time which
+        # is reduced when the buffer overflows.
+        self.poll_interval = self.busy_poll_interval
+        self.max_poll_interval = self.idle_poll_interval
+
+        # Keep alive HTTP session used for all the requests.  It's created on
+        # the first request and after connection errors.
+        self.session = None
+
+        # Request counts and latencies.
+        self.stats = Stats()
+
         # Fire up the Client Thread
         threading.Thread(target=self._thread).start()
 
@@ -221,6 +391,7 @@ class HubClient:
         '''Terminates the HubClient thread on the next loop.
         '''
         self._close = True
+        self._wake.set()
 
     def has_read_data(self):
         '''Returns True if there is incoming data to be read.
@@ -245,6 +416,7 @@ class HubClient:
           bytes (bytearray): This should represent a complete message.
         '''
         self._write_queue.put(bytes)
+        self._wake.set()
 
     def _thread(self):
         '''This runs in its own thread.  It constantly loops until the main
@@ -253,6 +425,10 @@ class HubClient:
         while threading.main_thread().is_alive() and not self._close:
             start_time = time.time()
 
+            # Clear the wake up before the writes are checked so a write
+            # queued after this ends the next sleep early.
+            self._wake.clear()
+
             # Read First, get Buffer Contents
             response = self._get_hub_buffer()
             if not response:
@@ -263,41 +439,121 @@ class HubClient:
             # reset on successful read
             self.read_timeout_count = 0
 
-            (bytestring, byte_end) = self._parse_buffer(response)
-
-            new_string = self._parse_bytes(bytestring, byte_end)
-            if new_string is not None:
-                self._read_queue.put((bytes.fromhex(new_string)))
+            (ring, byte_end) = self._parse_buffer(response.content)
+            new_data = None
+            if ring is None:
+                LOG.warning('Hub %s returned an invalid buffer', self.ip)
+            else:
+                new_data = self._parse_bytes(ring, byte_end)
+                if new_data is not None:
+                    self._put_read(new_data)
 
             # Now write
-            self._perform_write()
-
-            # Only hammering at hub server twice per second.  Seems to result
-            # in the PLM ACK and device message arriving together, but no more
-            # than that. Could consider slowing down, but waiting too long
-            # could cause the buffer to overflow and would slow down our
-            # responses.  Would also need to increase the hub ack_time
-            # accordingly too.  I have done up to 3 requests per second with
-            # good results.
-            sleep_time = (start_time + .5) - time.time()
+            wrote = self._perform_write()
+
+            # Read quickly while messages are being exchanged and back off
+            # when idle.  Waiting too long could cause the buffer to
+            # overflow so overflows lower the idle limit.
+            self._update_poll_interval(new_data is not None or wrote)
+            sleep_time = (start_time + self.poll_interval) - time.time()
             if sleep_time > 0:
-                time.sleep(sleep_time)
+                # Writes and close() end the sleep early.
+                self._wake.wait(sleep_time)
             elif sleep_time < -2:
                 seconds = str(round(abs(sleep_time), 2))
                 LOG.warning('Hub %s loop took %s to complete', self.ip,
                             seconds)
 
+        self._reset_session()
+
+    def _put_read(self, data):
+        '''Queues read data and wakes up the main thread.
+
+        Args:
+          data (bytes):  The data read from the Hub.
+        '''
+        self._read_queue.put(data)
+        if self.wake_fd is not None:
+            try:
+                os.write(self.wake_fd, b'\x00')
+            except (BlockingIOError, OSError):
+                # The pipe is full (the main thread will wake up anyway) or
+                # it's been closed.
+                pass
+
+    def _update_poll_interval(self, active):
+        '''Updates the time between reads of the Hub buffer.
+
+        Args:
+          active (bool):  True if data was read or written in this loop.
+        '''
+        if active or self.busy:
+            self.poll_interval = self.busy_poll_interval
+        else:
+            self.poll_interval = min(self.poll_interval * self.poll_backoff,
+                                     self.max_poll_interval)
+
+    def _get_session(self):
+        '''Returns the keep alive HTTP session, creating it if needed.
+        '''
+        if self.session is None:
+            session = requests.Session()
+            session.auth = requests.auth.HTTPBasicAuth(self.user,
+                                                       self.password)
+
+            # The Hub web server is slow to accept connections so a single
+            # connection is kept open and reused for every request.
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                    pool_maxsize=1)
+            session.mount('http://', adapter)
+            self.session = session
+            self.stats.incr("hub_sessions")
+
+        return self.session
+
+    def _reset_session(self):
+        '''Closes the HTTP session so the next request reconnects.
+        '''
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def _request(self, url, timeout, name):
+        '''Performs a GET request using the keep alive session.
+
+        The request time is recorded in the stats as name_time.  If the
+        request fails, the session is closed so the next request opens a
+        new connection.
+
+        Args:
+          url (str):  The URL to get.
+          timeout (float):  The request time out in seconds.
+          name (str):  The request name used for the stats.
+
+        Returns:
+          requests.Response:  The response.
+
+        Raises:
+          requests.exceptions.RequestException:  If the request fails.
+        '''
+        start = time.perf_counter()
+        try:
+            response = self._get_session().get(url, timeout=timeout)
+        except requests.exceptions.RequestException:
+            self.stats.incr(name + "_errors")
+            self._reset_session()
+            raise
+
+        self.stats.observe(name + "_time", time.perf_counter() - start)
+        return response
+
     def _get_hub_buffer(self):
         '''
         Performs the HTTP call to get the read buffer.
         '''
         try:
-            response = requests.get('http://%s:%s/buffstatus.xml' %
-                                    (self.ip, self.port),
-                                    auth=requests.auth.HTTPBasicAuth(
-                                        self.user,
-                                        self.password),
-                                    timeout=5)
+            response = self._request('http://%s:%s/buffstatus.xml' %
+                                     (self.ip, self.port), 5, "hub_read")
         except requests.exceptions.Timeout:
             # Warn for a bit, this can happen if the hub is overloaded
             LOG.warning('Timeout reading from Hub %s', self.ip)
@@ -308,80 +564,136 @@ class HubClient:
                           self.ip)
                 self.read_timeout_count = 0
             return False
+        except requests.exceptions.RequestException as e:
+            # The connection was dropped or refused.  The next request will
+            # reconnect.
+            LOG.warning('Error reading from Hub %s: %s', self.ip, e)
+            return False
         return response
 
-    def _parse_buffer(self, response):
-        '''
+    def _parse_buffer(self, content):
+        '''Finds the ring buffer in a buffstatus.xml response.
+
         The hub uses a ring buffer passed as a hexadecimal string with the
-        final byte describing the position of the end of the buffer.  This
-        function slices the buffer at the end point and stiches it back
-        together in the proper order.
+        final byte describing the position of the end of the buffer.  The
+        <BS> element is found directly in the raw response so the XML isn't
+        parsed and the ring isn't copied into order.
+
+        Args:
+          content (bytes):  The response body.
+
+        Returns:
+          (bytes, int):  The hex characters of the ring buffer (without the
+          end position byte) and the end position in characters.  Returns
+          (None, -1) if the response doesn't have a valid buffer.
+        '''
+        start = content.find(b'<BS>')
+        end = content.find(b'</BS>', start)
+        if start < 0 or end - start < 7:
+            return (None, -1)
+
+        try:
+            byte_end = int(content[end - 2:end], 16)
+        except ValueError:
+            return (None, -1)
+
+        ring = content[start + 4:end - 2]
+        if byte_end > len(ring):
+            return (None, -1)
+
+        return (ring, byte_end)
+
+    def _ring_slice(self, ring, start, length):
+        '''Returns length characters from the ring buffer.
+
+        Args:
+          ring (bytes):  The ring buffer hex characters.
+          start (int):  The start position.  This may be negative or past
+                the end of the ring and wraps around.
+          length (int):  The number of characters to return.
+
+        Returns:
+          bytes:  The characters from start in ring order.
         '''
-        # This could be done without ElementTree, I wonder if it is overkill
-        root = ET.fromstring(response.text)
-        # This seems overly complex, can this be directly referenced?
-        # for response in root:
-        #     if response.tag == 'BS':
-        #         bytestring = response.text
-        #         break
-        bytestring = root.find('BS').text
-
-        # Place buffer in sequential order
-        # The last byte of the bytestring tells us where the buffer ends
-        byte_end = int(bytestring[-2:], 16)
-        # Get bytes after buffer end and put them first, then add bytes
-        # that come before the buffer end
-        bytestring = bytestring[byte_end:-2] + bytestring[:byte_end]
-
-        return (bytestring, byte_end)
-
-    def _parse_bytes(self, bytestring, byte_end):
+        size = len(ring)
+        start %= size
+        end = start + length
+        if end <= size:
+            return ring[start:end]
+        return ring[start:] + ring[:end - size]
+
+    def _parse_bytes(self, ring, byte_end):
         '''
         This parses out the new bytes out of the buffer.  It also verifies that
-        the buffer has not overflowed
+        the buffer has not overflowed.  Only the characters written since the
+        last read and the verify characters before them are sliced out of
+        the ring.
+
+        Args:
+          ring (bytes):  The ring buffer hex characters.
+          byte_end (int):  The end position of the ring buffer.
+
+        Returns:
+          bytes:  The new data or None if there is no valid new data.
         '''
         ret = None
-        if self._prev_bytestring != '' and self._prev_byte_end >= 0:
-            new_length = byte_end - self._prev_byte_end
-            # fix length if we have looped around on the ring
-            if new_length < 0:
-                new_length = (self.buff_length + new_length)
-
-            verify_start = self.buff_length - self.verify_length - new_length
-            verify_end = self.buff_length - new_length
-            verify_bytestring = bytestring[verify_start : verify_end]
+        size = len(ring)
+        prev_end = self._prev_byte_end
+        if self._prev_bytestring is not None and prev_end >= 0:
+            new_length = (byte_end - prev_end) % size
             if new_length > 0:
-                if self._prev_bytestring == verify_bytestring:
-                    ret = bytestring[-new_length:]
+                # The characters before the new data must be the ones at the
+                # end of the last read.  If new data wrapped around over
+                # them, the buffer overflowed.
+                verify = self._ring_slice(ring, prev_end - self.verify_length,
+                                          self.verify_length)
+                if (new_length <= size - self.verify_length and
+                        verify == self._prev_bytestring):
+                    ret = binascii.unhexlify(
+                        self._ring_slice(ring, prev_end, new_length))
                 else:
                     LOG.error('Read buff overflow Hub %s, prev %s, verify %s',
                               self.ip, self._prev_bytestring,
-                              verify_bytestring)
+                              verify)
+                    self._buffer_overflow()
 
-        self._prev_bytestring = bytestring[-self.verify_length:]
+        self._prev_bytestring = self._ring_slice(
+            ring, byte_end - self.verify_length, self.verify_length)
         self._prev_byte_end = byte_end
         return ret
 
+    def _buffer_overflow(self):
+        '''Handles a Hub buffer overflow.
+
+        Data was lost because the buffer wasn't read often enough so the
+        maximum idle time between reads is halved.
+        '''
+        self.stats.incr("hub_overflows")
+        self.max_poll_interval = max(self.max_poll_interval / 2,
+                                     self.busy_poll_interval)
+        self.poll_interval = self.busy_poll_interval
+        LOG.warning('Hub %s maximum poll interval reduced to %.3f sec',
+                    self.ip, self.max_poll_interval)
+
     def _perform_write(self):
         ''' Writes to the hub if there are messages Waiting
+
+        Returns:
+          bool:  Returns True if a message was written.
         '''
-        if not self._write_queue.empty():
-            command = self._write_queue.get()
-            cmd_str = command.hex()
-            url = 'http://%s:%s/3?%s=I=3' % (self.ip, self.port, cmd_str)
-            try:
-                requests.get(url,
-                             auth=requests.auth.HTTPBasicAuth(self.user,
-                                                              self.password),
-                             timeout=3)
-            except requests.exceptions.Timeout:
-                # Since there are retries built in above this, we don't resend
-                # here on the chance that the message did get through
-                LOG.error('Unable to write to Hub %s', self.ip)
-            # When we write to the Hub, it empties and resets the read buffer
-            if self.verify_length > 0:
-                empty = '0'
-                self._prev_bytestring = empty * self.verify_length
-            else:
-                self._prev_bytestring = ''
-            self._prev_byte_end = 0
+        if self._write_queue.empty():
+            return False
+
+        command = self._write_queue.get()
+        cmd_str = command.hex()
+        url = 'http://%s:%s/3?%s=I=3' % (self.ip, self.port, cmd_str)
+        try:
+            self._request(url, 3, "hub_write")
+        except requests.exceptions.RequestException:
+            # Since there are retries built in above this, we don't resend
+            # here on the chance that the message did get through
+            LOG.error('Unable to write to Hub %s', self.ip)
+        # When we write to the Hub, it empties and resets the read buffer
+        self._prev_bytestring = b'0' * self.verify_length
+        self._prev_byte_end = 0
+        return True
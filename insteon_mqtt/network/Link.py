@@ -80,6 +80,35 @@ class Link:
         """
         pass  # pragma: no cover
 
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        The manager uses the earliest deadline of all the links to limit
+        how long it waits for network activity so that timed work (paced
+        writes, time outs, etc) happens on time.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the Unix clock time of the next deadline or None
+           if the link has nothing scheduled.
+        """
+        return None
+
+    #-----------------------------------------------------------------------
+    def set_busy(self, busy):
+        """Tell the link if messages are being exchanged with the modem.
+
+        The Protocol calls this every poll.  Links that poll the modem for
+        data (the Hub) can poll faster while busy and slower when idle.
+
+        Args:
+          busy (bool):  True if a reply or more messages are expected.
+        """
+        pass
+
     #-----------------------------------------------------------------------
     def read_from_link(self):
         """Read data from the link.
@@ -119,3 +148,49 @@ class Link:
                                   self.__class__)  # pragma: no cover
 
     #-----------------------------------------------------------------------
+
+
+#===========================================================================
+class PollLink(Link):
+    """Network link that is only polled.
+
+    Links that don't have a file descriptor (like a replay or a simulator)
+    are added to the manager with add_poll() and do all of their work in
+    poll().  The manager never calls the file descriptor methods for them so
+    they do nothing.
+    """
+    #-----------------------------------------------------------------------
+    def fileno(self):
+        """Polling only links don't have a file descriptor.
+
+        Returns:
+          Returns None.
+        """
+        return None
+
+    #-----------------------------------------------------------------------
+    def read_from_link(self):
+        """Polling only links have nothing to read.
+
+        Returns:
+           int:  Returns 0.
+        """
+        return 0
+
+    #-----------------------------------------------------------------------
+    def write_to_link(self, t):
+        """Polling only links write their data in poll().
+
+        Args:
+           t (float):  The current time (time.time).
+        """
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the link.
+
+        The manager removes the link when the closing signal is emitted.
+        """
+        self.signal_closing.emit(self)
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,249 @@
+#===========================================================================
+#
+# Event loop lag and slow callback monitor.
+#
+#===========================================================================
+import collections
+import sys
+import threading
+import time
+import traceback
+from .. import log
+from ..Signal import Signal
+from ..Stats import Stats
+from .Link import Link
+
+LOG = log.get_logger(__name__)
+
+
+class LoopMonitor:
+    """Event loop lag and slow callback monitor.
+
+    Everything runs in the single network event loop thread so one slow
+    callback (template rendering, saving a device database, etc) delays all
+    of the modem and MQTT traffic.  This class finds those callbacks.
+
+    The network manager calls the link connect(), read_from_link(),
+    write_to_link(), and poll() methods through call() and once the monitor
+    is started, every Signal slot is called through it as well.  Calls that
+    take longer than slow_time seconds are logged with the link method or
+    slot name.  Only the innermost slow call is logged so a slow slot that
+    was called from read_from_link() is only reported once.
+
+    A watchdog thread samples the stack of the event loop thread when a call
+    has been running for longer than slow_time.  The sampled stack is logged
+    with the slow call so it shows where the time was spent.
+
+    The manager also reports every loop iteration.  The loop lag is how
+    late the links were polled after the time the loop asked to wake up at
+    (a link deadline or the time out).  The lag and iteration time are
+    recorded in histograms and percentiles of the last lag_samples lags are
+    available from percentiles().
+
+        monitor = LoopMonitor(slow_time=0.1).start()
+        mgr = Manager(monitor=monitor)
+        ...
+        monitor.stop()
+    """
+    # Number of recent loop lags to compute percentiles from.
+    lag_samples = 1000
+
+    # Maximum number of stack frames to log.
+    stack_limit = 20
+
+    #-----------------------------------------------------------------------
+    def __init__(self, slow_time=0.1):
+        """Constructor
+
+        Args:
+          slow_time (float):  Calls that take longer than this many seconds
+                    are logged.
+        """
+        self.slow_time = slow_time
+
+        # Counters: slow_calls.  Histograms: loop_lag and loop_time (seconds
+        # of processing per loop iteration).
+        self.stats = Stats()
+        self._lags = collections.deque(maxlen=self.lag_samples)
+
+        # Stack of the calls in progress.  Each is a list of [function,
+        # start time, sampled stack, True if a nested call was slow].
+        self._calls = []
+
+        # The event loop thread and the watchdog thread.
+        self._thread_id = threading.get_ident()
+        self._thread = None
+        self._stop = threading.Event()
+
+    #-----------------------------------------------------------------------
+    def start(self):
+        """Start monitoring.
+
+        This must be called from the event loop thread.  The Signal slots are
+        timed and the stack sampling thread is started.
+
+        Returns:
+          Returns self.
+        """
+        self._thread_id = threading.get_ident()
+        Signal.monitor = self
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    #-----------------------------------------------------------------------
+    def stop(self):
+        """Stop the Signal slot timing and the stack sampling thread.
+        """
+        if Signal.monitor is self:
+            Signal.monitor = None
+
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    #-----------------------------------------------------------------------
+    def call(self, func, *args, **kwargs):
+        """Time a function call.
+
+        Calls from threads other than the event loop thread are not timed.
+
+        Args:
+          func:  The function to call.
+          args:  List of positional arguments to pass.
+          kwargs:  Dictionary of the keyword arguments to pass.
+
+        Returns:
+          Returns the function return value.
+        """
+        if threading.get_ident() != self._thread_id:
+            return func(*args, **kwargs)
+
+        entry = [func, time.perf_counter(), None, False]
+        calls = self._calls
+        calls.append(entry)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            calls.pop()
+            dt = time.perf_counter() - entry[1]
+            if dt >= self.slow_time:
+                self._slow_call(entry, dt)
+
+    #-----------------------------------------------------------------------
+    def iteration(self, lag, dt):
+        """Record a loop iteration.
+
+        This is called by the manager at the end of each iteration.
+
+        Args:
+          lag (float):  Seconds the links were polled after the time the
+              loop asked to wake up at (or 0 if they were polled before).
+          dt (float):  Seconds spent processing the iteration after the loop
+             woke up.
+        """
+        self._lags.append(lag)
+        self.stats.observe("loop_lag", lag)
+        self.stats.observe("loop_time", dt)
+
+    #-----------------------------------------------------------------------
+    def percentiles(self):
+        """Return the recent loop lag percentiles.
+
+        Returns:
+          dict:  Returns the p50, p90, p99, and max lag in seconds of the
+          last lag_samples iterations.  This is empty if there are no
+          samples.
+        """
+        lags = sorted(self._lags)
+        if not lags:
+            return {}
+
+        last = len(lags) - 1
+        return {
+            "p50" : lags[int(0.5 * last)],
+            "p90" : lags[int(0.9 * last)],
+            "p99" : lags[int(0.99 * last)],
+            "max" : lags[last],
+            }
+
+    #-----------------------------------------------------------------------
+    def to_dict(self):
+        """Return the metrics as a JSON compatible dictionary.
+
+        Returns:
+          dict:  Returns the Stats.to_dict() data with the lag percentiles in
+          the lag_percentiles key.
+        """
+        data = self.stats.to_dict()
+        data["lag_percentiles"] = self.percentiles()
+        return data
+
+    #-----------------------------------------------------------------------
+    def _slow_call(self, entry, dt):
+        """Report a slow call.
+
+        Args:
+          entry (list):  The call entry (see self._calls).
+          dt (float):  Seconds the call took.
+        """
+        self.stats.incr("slow_calls")
+
+        # The calling function is slow because of this call so it's not
+        # logged again.
+        if self._calls:
+            self._calls[-1][3] = True
+        if entry[3]:
+            return
+
+        name = self._name(entry[0])
+        if entry[2]:
+            LOG.warning("Slow event loop call %s took %.3f sec.  Stack after "
+                        "%.3f sec:\n%s", name, dt, self.slow_time, entry[2])
+        else:
+            LOG.warning("Slow event loop call %s took %.3f sec", name, dt)
+
+    #-----------------------------------------------------------------------
+    def _name(self, func):
+        """Return the name of a function to log.
+
+        Args:
+          func:  The function or method.
+
+        Returns:
+          str:  Returns the qualified name and the link for link methods.
+        """
+        name = getattr(func, "__qualname__", repr(func))
+        obj = getattr(func, "__self__", None)
+        if isinstance(obj, Link):
+            name = "%s (%s)" % (name, obj)
+        return name
+
+    #-----------------------------------------------------------------------
+    def _run(self):
+        """Stack sampling thread.
+
+        Samples the event loop thread stack for the calls that have been
+        running longer than slow_time.  Each call is only sampled once.
+        """
+        while not self._stop.wait(self.slow_time / 2):
+            t = time.perf_counter()
+            stack = None
+            for entry in list(self._calls):
+                if entry[2] is not None or t - entry[1] < self.slow_time:
+                    continue
+
+                if stack is None:
+                    # pylint: disable=protected-access
+                    frame = sys._current_frames().get(self._thread_id)
+                    if frame is None:
+                        break
+                    stack = "".join(traceback.format_stack(
+                        frame, self.stack_limit))
+
+                entry[2] = stack
+
+    #-----------------------------------------------------------------------
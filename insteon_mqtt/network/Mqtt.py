@@ -3,10 +3,15 @@
 # Network link to an MQTT client class
 #
 #===========================================================================
+import errno
+import socket
+import time
 import paho.mqtt.client as paho
 from .. import log
 from ..Signal import Signal
+from ..Stats import Stats
 from .Link import Link
+from .Resolver import Resolver
 
 LOG = log.get_logger(__name__)
 
@@ -20,6 +25,22 @@ class Mqtt(Link):
     occur.  This also supports delayed connecting (if the broker is down) and
     automatic reconnects.
 
+    Connecting never blocks the event loop.  The broker host name is
+    resolved in a thread (unless it's an IP address), the TCP connection is
+    started with a non-blocking connect, and the socket is given to the
+    paho client once the manager reports it's writable.  Failed attempts are
+    retried with an exponential backoff up to reconnect_dt so other links
+    (the modem) keep being serviced while the broker is unreachable.
+
+    Publishing doesn't write to the socket.  The messages are queued and
+    all of them are written with one socket send when the manager reports
+    the socket as writable, so a burst of publishes (a scene that changes
+    many devices) is sent once per loop iteration.
+
+    This replaces the paho client socket connection so it only works with
+    the paho-mqtt versions in requirements.txt and plain TCP connections
+    (not TLS or websockets).
+
     If an MQTT message arrives, Mqtt.signal_message(Link, Messsage) is
     emitted so the message can be processed.  Message is the paho message
     class with attributes topic, payload, qos, and retain.
@@ -27,6 +48,12 @@ class Mqtt(Link):
     Input fields can be set via the constructor or by loading a configuration
     file (see load_config for details).
     """
+    # Seconds to wait for the TCP connection to the broker.
+    connect_timeout = 10
+
+    # Seconds between connect() attempts while the host name is resolved.
+    resolve_dt = 0.2
+
     def __init__(self, host="127.0.0.1", port=1883, id=None,
                  reconnect_dt=10):
         """Construct an MQTT client.
@@ -39,8 +66,10 @@ class Mqtt(Link):
           port (int):  The broker port to connect to.
           id (str):  Optional connection ID to send.  If not set,
              'insteon-mqtt' is used.
-          reconnect_dt (int):  Time in seconds to attempt reconnections if
-                       the broker is unavailable.
+          reconnect_dt (int):  Maximum time in seconds between attempts to
+                       reconnect if the broker is unavailable.  The first
+                       retry is after 1 second and the time doubles up to
+                       this.
         """
         self.signal_message = Signal()    # (MqttLink, Message msg)
 
@@ -57,14 +86,28 @@ class Mqtt(Link):
         self.keep_alive = 30
 
         self._reconnect_dt = reconnect_dt
+        self._retry_dt = 1
         self._fd = None
 
+        # Socket and time of a connection that was started but hasn't
+        # finished yet.
+        self._sock = None
+        self._connect_time = None
+
+        # Resolves the host name without blocking the event loop.
+        self._resolver = Resolver()
+
+        # Buffer that the MQTT client socket writes go into.
+        self._send_buf = None
+
+        # Link counters: publishes, writes (socket sends), and write_bytes.
+        self.stats = Stats()
+
         # Create the MQTT client and set the callbacks to our methods.
         self.client = paho.Client(client_id=self.id, clean_session=False)
-        self.client.on_connect = self._on_connect
-        self.client.on_disconnect = self._on_disconnect
-        self.client.on_message = self._on_message
-        self.client.on_log = self._on_log
+        self._set_callbacks()
+
+        self.signal_connected.connect(self._connected)
 
     #-----------------------------------------------------------------------
     def load_config(self, config):
@@ -92,6 +135,7 @@ class Mqtt(Link):
         if id is not None:
             self.id = id
             self.client.reinitialise(client_id=self.id, clean_session=False)
+            self._set_callbacks()
 
         username = config.get('username', None)
         if username is not None:
@@ -108,8 +152,9 @@ class Mqtt(Link):
           qos (int): The MQTT QOS level to use (1, 2, or 3).
           retain (bool):  True to mark the message as retained.
         """
+        # The client calls _on_register_write if it needs to write.
         self.client.publish(topic, payload, qos, retain)
-        self.signal_needs_write.emit(self, True)
+        self.stats.incr("publishes")
 
         LOG.debug("MQTT publish %s %s qos=%s ret=%s", topic, payload, qos,
                   retain)
@@ -128,15 +173,12 @@ class Mqtt(Link):
           qos (int): The quality of service level to use (0,1,2).
           callback:  Optional message callback.
         """
-        # Tell the client about it and then notify the manager that we have
-        # messages to send.
+        # The client calls _on_register_write if it needs to write.
         self.client.subscribe(topic, qos)
 
         if callback:
             self.client.message_callback_add(topic, callback)
 
-        self.signal_needs_write.emit(self, True)
-
         LOG.debug("MQTT subscribe %s qos=%s", topic, qos)
 
     #-----------------------------------------------------------------------
@@ -146,10 +188,8 @@ class Mqtt(Link):
         Args:
           topic (str):  The topic to unsubscribe from.
         """
-        # Tell the client about it and then notify the manager that we have
-        # messages to send.
+        # The client calls _on_register_write if it needs to write.
         self.client.unsubscribe(topic)
-        self.signal_needs_write.emit(self, True)
 
         LOG.debug("MQTT unsubscribe %s", topic)
 
@@ -179,45 +219,90 @@ class Mqtt(Link):
             passed in so that all clients receive the same "current" time
             instead of each calling time.time() and getting a different value.
         """
+        # Close a connection that is taking too long.  The socket error is
+        # only reported after the OS time out which can be minutes.
+        if self._sock:
+            if t - self._connect_time > self.connect_timeout:
+                LOG.error("MQTT connection timed out to %s %s", self.host,
+                          self.port)
+                self.close()
+            return
+
         # This is required to handle keepalive messages and detect
         # disconnections.
         rc = self.client.loop_misc()
         if rc == paho.MQTT_ERR_NO_CONN:
             self._on_disconnect(self.client, None, rc)
 
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the connection time out time if a connection is
+           in progress or None otherwise.
+        """
+        if self._sock:
+            return self._connect_time + self.connect_timeout
+        return None
+
     #-----------------------------------------------------------------------
     def retry_connect_dt(self):
         """Return a positive integer (seconds) if the link should reconnect.
 
-        If this returns None, the link will not be reconnected if it closes.
-        Otherwise this is the retry interval in seconds to try and reconnect
-        the link by calling connect().
+        The time doubles after each failed attempt up to the reconnect_dt
+        input.  While the host name is being resolved, a short time is
+        returned so the connection is started soon after it's done.
         """
-        return self._reconnect_dt
+        if self._resolver.busy():
+            return self.resolve_dt
+
+        dt = self._retry_dt
+        self._retry_dt = min(2 * self._retry_dt, self._reconnect_dt)
+        return dt
 
     #-----------------------------------------------------------------------
     def connect(self):
         """Connect the link to the device.
 
-        This will try and connect to the MQTT broker.
+        This starts a non-blocking connection to the MQTT broker.  When the
+        socket is writable, the connection is checked and given to the MQTT
+        client which sends the MQTT connect message (see _finish_connect).
+        If the connection fails later, the link is closed which schedules
+        another attempt.
 
         Returns:
-          bool:  Returns True if the connection was successful or False it
-          it failed.
+          bool:  Returns True if the connection was started or False if it
+          failed or the host name is still being resolved.
         """
-        try:
-            self.client.connect(self.host, self.port,
-                                keepalive=self.keep_alive)
-            self._fd = self.client.socket().fileno()
+        addr = self._address()
+        if addr is None:
+            return False
 
-            LOG.info("MQTT device opened %s %s with keepalive=%s", self.host,
-                     self.port, self.keep_alive)
-            return True
-        except:
+        try:
+            sock = socket.socket(addr[0], addr[1], addr[2])
+        except OSError:
             LOG.exception("MQTT connection error to %s %s", self.host,
                           self.port)
             return False
 
+        sock.setblocking(False)
+        err = sock.connect_ex(addr[4])
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            LOG.error("MQTT connection error to %s %s: %s", self.host,
+                      self.port, errno.errorcode.get(err, err))
+            sock.close()
+            return False
+
+        self._sock = sock
+        self._fd = sock.fileno()
+        self._connect_time = time.time()
+        LOG.info("MQTT connecting to %s %s", self.host, self.port)
+        return True
+
     #-----------------------------------------------------------------------
     def read_from_link(self):
         """Read data from the link.
@@ -229,6 +314,10 @@ class Mqtt(Link):
            int:  Return -1 if the link should be closed.  Or any other
            integer to indicate success.
         """
+        # Errors during the connection are reported as readable.
+        if self._sock:
+            return 0 if self._finish_connect() else -1
+
         # Tell the MQTT client that it ca read.
         status = self.client.loop_read()
 
@@ -253,14 +342,37 @@ class Mqtt(Link):
         Args:
            t (float):  The current time (time.time).
         """
+        # The socket is writable once the connection has finished.
+        if self._sock:
+            self._finish_connect()
+            return
+
         LOG.debug("MQTT writing")
 
-        # Tell the MQTT client that it can write.
+        # Tell the MQTT client that it can write.  This moves all of the
+        # queued messages into the send buffer.
+        send_buf = self._send_buf
         self.client.loop_write()
 
+        # Writing the disconnect message closes the socket.
+        if self.client.socket() is not send_buf:
+            return
+
+        try:
+            num = send_buf.flush()
+        except OSError as e:
+            LOG.error("MQTT write error to %s %s: %s", self.host, self.port,
+                      e)
+            self._on_disconnect(self.client, None, paho.MQTT_ERR_CONN_LOST)
+            return
+
+        if num:
+            self.stats.incr("writes")
+            self.stats.incr("write_bytes", num)
+
         # If there is no more data to write, remove us from the write
         # watching.
-        if not self.client.want_write():
+        if not send_buf.buf and not self.client.want_write():
             self.signal_needs_write.emit(self, False)
 
     #-----------------------------------------------------------------------
@@ -269,11 +381,112 @@ class Mqtt(Link):
 
         The link will call self.signal_closing.emit() after closing.
         """
+        if not self._fd:
+            return
+
         LOG.info("MQTT device closing %s %s", self.host, self.port)
 
+        # A connection that hasn't finished is closed right away.  The
+        # manager uses fileno() when the link closes so the socket is closed
+        # after the signal.
+        if self._sock:
+            self.signal_closing.emit(self)
+            self._sock.close()
+            self._sock = None
+            self._fd = None
+            return
+
         self.client.disconnect()
         self.signal_needs_write.emit(self, True)
 
+    #-----------------------------------------------------------------------
+    def _address(self):
+        """Return the broker address to connect to.
+
+        Host names are resolved in a thread (see Resolver) since a slow DNS
+        server would block the event loop.
+
+        Returns:
+          Returns the socket.getaddrinfo() address tuple or None if the host
+          name is being resolved or couldn't be resolved.
+        """
+        try:
+            return self._resolver.address(self.host, self.port)
+        except OSError as e:
+            LOG.error("MQTT can't resolve broker %s: %s", self.host, e)
+            return None
+
+    #-----------------------------------------------------------------------
+    def _finish_connect(self):
+        """Finish a non-blocking connection.
+
+        This is called when the connecting socket is readable or writable.
+        If the connection worked, the socket is given to the MQTT client
+        which sends the MQTT connect message.  Otherwise the link is closed.
+
+        Returns:
+          bool:  Returns True if the connection worked.
+        """
+        err = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            LOG.error("MQTT connection error to %s %s: %s", self.host,
+                      self.port, errno.errorcode.get(err, err))
+            self.close()
+            return False
+
+        # paho connects with a blocking socket.create_connection() call so
+        # it's replaced to use the connected socket instead.  paho before
+        # 1.5 doesn't have that hook and would make a second, blocking
+        # connection (and before 1.6, it writes each message right away
+        # instead of calling _on_register_write).
+        if not hasattr(self.client, "_create_socket_connection"):
+            LOG.error("MQTT connection to %s %s requires paho-mqtt 1.6.0 or "
+                      "later", self.host, self.port)
+            self.close()
+            return False
+
+        # The connected socket is given to paho as is.  A client set up for
+        # TLS would wrap it in an SSL socket that the send buffer bypasses
+        # and a websocket client would wrap it in its own framing so neither
+        # is supported.
+        if (getattr(self.client, "_ssl", False) or
+                getattr(self.client, "_transport", "tcp") != "tcp"):
+            LOG.error("MQTT connection to %s %s doesn't support TLS or "
+                      "websockets", self.host, self.port)
+            self.close()
+            return False
+
+        sock, self._sock = self._sock, None
+        try:
+            self.client.connect_async(self.host, self.port,
+                                      keepalive=self.keep_alive)
+            send_buf = self._send_buf = _SendBuffer(sock)
+            # pylint: disable=protected-access
+            self.client._create_socket_connection = lambda: send_buf
+            self.client.reconnect()
+        except:
+            LOG.exception("MQTT connection error to %s %s", self.host,
+                          self.port)
+            self._sock = sock
+            self.close()
+            return False
+
+        LOG.info("MQTT device opened %s %s with keepalive=%s", self.host,
+                 self.port, self.keep_alive)
+        return True
+
+    #-----------------------------------------------------------------------
+    def _set_callbacks(self):
+        """Set the MQTT client callbacks to our methods.
+
+        This is needed after the client is re-initialized.
+        """
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.on_log = self._on_log
+        self.client.on_socket_register_write = self._on_register_write
+
     #-----------------------------------------------------------------------
     def _on_connect(self, client, data, flags, result):
         """MQTT connection callback.
@@ -290,6 +503,7 @@ class Mqtt(Link):
         """
         if result == 0:
             self.connected = True
+            self._retry_dt = 1
             self.signal_connected.emit(self, True)
         else:
             LOG.error("MQTT connection refused %s %s %s", self.host, self.port,
@@ -312,6 +526,22 @@ class Mqtt(Link):
 
         self.connected = False
         self.signal_closing.emit(self)
+        self._fd = None
+
+    #-----------------------------------------------------------------------
+    def _on_register_write(self, client, data, sock):
+        """MQTT client needs to write callback.
+
+        This is called by the MQTT client when it queues a message to send.
+        Setting this callback stops the client from writing to the socket
+        right away so every queued message is written in write_to_link().
+
+        Args:
+          client (paho.Client):  The paho mqtt client (self.client).
+          data:  Optional user data (unused).
+          sock:  The client socket.
+        """
+        self.signal_needs_write.emit(self, True)
 
     #-----------------------------------------------------------------------
     def _on_message(self, client, data, message):
@@ -342,8 +572,98 @@ class Mqtt(Link):
         # client.
         LOG.log(5, buf)
 
+    #-----------------------------------------------------------------------
+    def _connected(self, link, connected):
+        """Connected callback.
+
+        This is called after the connecting socket is added to the manager.
+        The manager is told to watch for writes which is when the connection
+        has finished.
+
+        Args:
+          link (Link):  Ourselves.
+          connected (bool):  True if the device is connected.
+        """
+        if connected and self._sock:
+            self.signal_needs_write.emit(self, True)
+
     #-----------------------------------------------------------------------
     def __str__(self):
         return "MQTT %s:%d" % (self.host, self.port)
 
     #-----------------------------------------------------------------------
+
+
+#===========================================================================
+class _SendBuffer:
+    """Socket wrapper that buffers the MQTT client writes.
+
+    paho sends each queued message with its own socket send call.  The sends
+    are added to a buffer instead and the Mqtt link writes the buffer with
+    flush().  All other socket calls are passed to the socket.
+    """
+    def __init__(self, sock):
+        """Constructor
+
+        Args:
+          sock (socket.socket):  The connected socket.
+        """
+        self.sock = sock
+        self.buf = bytearray()
+
+    #-----------------------------------------------------------------------
+    def send(self, data):
+        """Add data to the buffer.
+
+        Args:
+          data (bytes):  The data to send.
+
+        Returns:
+          int:  Returns the number of bytes added which is all of them.
+        """
+        self.buf += data
+        return len(data)
+
+    #-----------------------------------------------------------------------
+    def flush(self):
+        """Write as much of the buffer to the socket as possible.
+
+        Returns:
+          int:  Returns the number of bytes written.
+        """
+        if not self.buf:
+            return 0
+
+        try:
+            num = self.sock.send(self.buf)
+        except (BlockingIOError, InterruptedError):
+            return 0
+
+        del self.buf[:num]
+        return num
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Write what's left in the buffer and close the socket.
+
+        The MQTT client closes the socket right after it sends the disconnect
+        message.  The socket isn't waited on so anything that can't be
+        written right away is dropped and logged.
+        """
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+        if self.buf:
+            LOG.warning("MQTT socket closed with %d bytes not written",
+                        len(self.buf))
+            self.buf.clear()
+
+        self.sock.close()
+
+    #-----------------------------------------------------------------------
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,175 @@
+#===========================================================================
+#
+# PLM capture replay link.
+#
+#===========================================================================
+from .. import log
+from ..Signal import Signal
+from .Capture import READ, read_capture
+from .Link import PollLink
+
+LOG = log.get_logger(__name__)
+
+
+class Replay(PollLink):
+    """PLM link that plays back a capture file.
+
+    This is used in place of the Serial or Hub link to feed the bytes read
+    in a Capture file to the Protocol.  It's a polling only link (add it to
+    the network manager with add_poll()).  Each poll() call emits the
+    recorded reads that are due based on the time since the first poll and
+    the playback speed.  A speed of 1 replays at the recorded rate, larger
+    values replay faster, and a speed of 0 plays everything on the first
+    poll.
+
+    Recorded writes are not replayed.  Messages written to this link are
+    accepted as if a modem wrote them and signal_wrote is emitted for them
+    on the next poll.
+    """
+    def __init__(self, path=None, speed=1.0):
+        """Constructor
+
+        Args:
+          path (str):  The capture file to play.  This can also be set via
+               load_config().
+          speed (float):  The playback speed multiplier.  0 to play
+                everything as fast as possible.
+        """
+        # Public signals to connect to for read/write notification.
+        self.signal_read = Signal()   # (Replay, bytes)
+        self.signal_wrote = Signal()  # (Replay, bytes)
+
+        super().__init__()
+
+        self.speed = speed
+
+        # List of (time, bytes) reads to play, the index of the next one,
+        # and the time of the first poll.
+        self._reads = []
+        self._next = 0
+        self._start_time = None
+
+        # Data written to the link waiting to be reported as written.
+        self._write_buf = []
+
+        # Number of bytes played and written.
+        self.num_read = 0
+        self.num_written = 0
+
+        if path:
+            self.load(path)
+
+    #-----------------------------------------------------------------------
+    def load_config(self, config):
+        """Load a configuration dictionary.
+
+        The input configuration dictionary can contain:
+        - replay (str):  The capture file to play.
+        - replay_speed (float):  The playback speed multiplier.
+
+        Args:
+          config (dict):  Configuration data to load.
+        """
+        self.speed = config.get('replay_speed', self.speed)
+        if 'replay' in config:
+            self.load(config['replay'])
+
+    #-----------------------------------------------------------------------
+    def load(self, path):
+        """Load a capture file to play.
+
+        Playback starts over with the next poll() call.
+
+        Args:
+          path (str):  The capture file to play.
+        """
+        self._reads = [(t, data) for t, direction, data in
+                       read_capture(path) if direction == READ]
+        self._next = 0
+        self._start_time = None
+        LOG.info("Loaded %d reads from capture %s", len(self._reads), path)
+
+    #-----------------------------------------------------------------------
+    @property
+    def is_finished(self):
+        """True if all of the reads have been played.
+        """
+        return self._next >= len(self._reads)
+
+    #-----------------------------------------------------------------------
+    def write(self, data, next_write_time):
+        """Write data to the link.
+
+        The data isn't sent anywhere.  It's reported as written on the next
+        poll.
+
+        Args:
+          data (bytes):  The data to write.
+          next_write_time (function):  A function that returns the timestamp
+               of the next permitted write time.  Unused.
+        """
+        self._write_buf.append(data)
+
+    #-----------------------------------------------------------------------
+    def poll(self, t):
+        """Periodic poll callback.
+
+        Reports any written data and then plays the reads that are due.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+        """
+        if self._start_time is None:
+            self._start_time = t
+
+        while self._write_buf:
+            data = self._write_buf.pop(0)
+            self.num_written += len(data)
+            self.signal_wrote.emit(self, data)
+
+        # Play everything that is due at the replay speed.
+        elapsed = (t - self._start_time) * self.speed
+        reads = self._reads
+        while self._next < len(reads):
+            record_time, data = reads[self._next]
+            if self.speed and record_time > elapsed:
+                break
+
+            self._next += 1
+            self.num_read += len(data)
+            self.signal_read.emit(self, data)
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the time the next read is due or None if there is
+           nothing left to play.
+        """
+        if self._write_buf or self._start_time is None:
+            return t
+        elif self.is_finished:
+            return None
+        elif not self.speed:
+            return t
+
+        record_time = self._reads[self._next][0]
+        return self._start_time + record_time / self.speed
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the link.
+        """
+        self._next = len(self._reads)
+        self._write_buf = []
+        self.signal_closing.emit(self)
+
+    #-----------------------------------------------------------------------
+    def __str__(self):
+        return "Replay %d/%d" % (self._next, len(self._reads))
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,104 @@
+#===========================================================================
+#
+# Non-blocking host name resolver.
+#
+#===========================================================================
+import socket
+import threading
+
+
+class Resolver:
+    """Host name resolver for links that connect from the event loop.
+
+    socket.getaddrinfo() blocks until the DNS server answers which would
+    stall every link in the event loop.  IP addresses are converted right
+    away and host names are resolved in a thread.  The link's connect()
+    calls address() until the thread has finished and the result is
+    returned.
+
+        addr = resolver.address(host, port)
+        if addr is None:
+            return False  # Still resolving, try again soon.
+    """
+    #-----------------------------------------------------------------------
+    def __init__(self):
+        """Constructor
+        """
+        # Thread resolving the host name and the result: an address tuple
+        # from socket.getaddrinfo() or the exception.
+        self._thread = None
+        self._result = None
+
+    #-----------------------------------------------------------------------
+    def busy(self):
+        """Return True if a host name is being resolved.
+
+        This is also True if the thread has finished but the result hasn't
+        been returned by address() yet.
+        """
+        return self._thread is not None
+
+    #-----------------------------------------------------------------------
+    def join(self, timeout=None):
+        """Wait for the host name resolution to finish.
+
+        Args:
+          timeout (float):  Maximum time to wait in seconds or None to wait
+                  until it's done.
+        """
+        if self._thread:
+            self._thread.join(timeout)
+
+    #-----------------------------------------------------------------------
+    def address(self, host, port):
+        """Return the address to connect to.
+
+        Args:
+          host (str):  The host name or IP address.
+          port (int):  The port to connect to.
+
+        Returns:
+          Returns the socket.getaddrinfo() address tuple or None if the host
+          name is being resolved.
+
+        Raises:
+          OSError:  If the host name couldn't be resolved.
+        """
+        # The thread sets _result before it finishes so it must be checked
+        # after the thread.
+        if self._thread:
+            if self._thread.is_alive():
+                return None
+
+            self._thread = None
+            result, self._result = self._result, None
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        try:
+            return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM, 0,
+                                      socket.AI_NUMERICHOST)[0]
+        except OSError:
+            pass
+
+        self._thread = threading.Thread(target=self._resolve,
+                                        args=(host, port), daemon=True)
+        self._thread.start()
+        return None
+
+    #-----------------------------------------------------------------------
+    def _resolve(self, host, port):
+        """Host name resolver thread.
+
+        Args:
+          host (str):  The host name to resolve.
+          port (int):  The port to connect to.
+        """
+        try:
+            self._result = socket.getaddrinfo(host, port, 0,
+                                              socket.SOCK_STREAM)[0]
+        except OSError as e:
+            self._result = e
+
+    #-----------------------------------------------------------------------
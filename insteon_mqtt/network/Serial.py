@@ -3,10 +3,13 @@
 # Network link to a Serial device class
 #
 #===========================================================================
+import collections
+import os
 import sys
 import serial
 from .. import log
 from ..Signal import Signal
+from ..Stats import Stats
 from .Link import Link
 
 LOG = log.get_logger(__name__)
@@ -22,7 +25,9 @@ class Serial(Link):
 
     Data reading and writing is handled via the Signal clsas.  When data is
     read, Serial.signal_read(Serial, bytes) will be emitted with the link and
-    the data that was read.  When data is successfully written,
+    the data that was read.  The data is a memoryview of a buffer that is
+    reused for every read so it must be copied if it's kept after the
+    callback returns.  When data is successfully written,
     Serial.signal_write(Serial, bytes) will be called with the data that was
     written.
 
@@ -61,9 +66,20 @@ class Serial(Link):
         self._reconnect_dt = reconnect_dt
         self._fd = None
 
-        # List of packets to write.  Each is a tuple of (bytes, time) where
+        # Buffer that every read is placed in.  For local serial ports, the
+        # port file descriptor is read directly into the buffer instead of
+        # using the pyserial read() call which allocates several objects.
+        self._read_buf = bytearray(self.read_buf_size)
+        self._read_view = memoryview(self._read_buf)
+        self._read_direct = False
+
+        # Queue of packets to write.  Each is a tuple of (bytes, time) where
         # the time is the time after which to do the write.
-        self._write_buf = []
+        self._write_buf = collections.deque()
+
+        # Link counters: reads, read_bytes, writes, write_dropped (packets
+        # dropped because the write queue was full).
+        self.stats = Stats()
 
         # Create the serial client but don't open it yet.  We'll wait for a
         # connection call to do that.
@@ -126,7 +142,10 @@ class Serial(Link):
         # up a infinite number of packets to write.
         if (Serial.max_write_queue and
                 len(self._write_buf) > Serial.max_write_queue):
-            self._write_buf.pop(0)
+            dropped = self._write_buf.popleft()[0]
+            self.stats.incr("write_dropped")
+            LOG.warning("Serial write queue full on %s, dropped %s",
+                        self._port, dropped.hex())
 
     #-----------------------------------------------------------------------
     def retry_connect_dt(self):
@@ -152,6 +171,8 @@ class Serial(Link):
             # Try and open the client and get the file descriptor.
             self.client.open()
             self._fd = self.client.fileno()
+            self._read_direct = (os.name == "posix" and
+                                 isinstance(self.client, serial.Serial))
 
             LOG.info("Serial device opened %s", self.client.port)
             return True
@@ -171,16 +192,48 @@ class Serial(Link):
            integer to indicate success.
         """
         try:
-            # Read from the file descriptor.
-            data = self.client.read(self.read_buf_size)
-            if data:
-                #LOG.debug("Read %s bytes from serial %s: %s", len(data),
-                #               self.client.port, data)
-
-                # Send the data out via signal call.
-                self.signal_read.emit(self, data)
+            # Read into the buffer.
+            if self._read_direct:
+                num = os.readv(self._fd, [self._read_view])
+            else:
+                num = self.client.readinto(self._read_view)
+        except BlockingIOError:
+            return 0
         except:
             LOG.exception("Serial read error from %s", self.client.port)
+            return 0
+
+        if not num and self._read_direct:
+            # The port reports data to read but there is none when the
+            # device has been disconnected.
+            LOG.error("Serial device disconnected %s", self.client.port)
+            self.close()
+            return -1
+
+        if num:
+            #LOG.debug("Read %s bytes from serial %s: %s", num,
+            #               self.client.port, self._read_view[:num].hex())
+            self.stats.incr("reads")
+            self.stats.incr("read_bytes", num)
+
+            # Send the data out via signal call.
+            self.signal_read.emit(self, self._read_view[:num])
+        return num
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the next permitted write time if there is data
+           waiting to be written or None otherwise.
+        """
+        if self._write_buf:
+            return self._write_buf[0][1]()
+        return None
 
     #-----------------------------------------------------------------------
     def write_to_link(self, t):
@@ -200,39 +253,45 @@ class Serial(Link):
             self.signal_needs_write.emit(self, False)
             return
 
-        # Get the next data packet to write from the write queue and see if
-        # enough time has elapsed to write the message.
-        data, next_write_time = self._write_buf[0]
-        if t < next_write_time():
-            #LOG.debug("Waiting to write %f < %f", t, next_write_time())
-            return
+        # Write every packet that is allowed to be written now.  The next
+        # write time is checked for each packet since writing a packet can
+        # change it.
+        write_buf = self._write_buf
+        while write_buf:
+            data, next_write_time = write_buf[0]
+            if t < next_write_time():
+                #LOG.debug("Waiting to write %f < %f", t, next_write_time())
+                return
+
+            try:
+                # Write as much of that data as possible.
+                num = self.client.write(data)
+            except:
+                e = sys.exc_info()[0]
+                LOG.exception("Serial write error from %s, %s",
+                              self.client.port, e)
+                return
 
-        try:
-            # Write as much of that data as possible.
-            num = self.client.write(data)
-        except:
-            e = sys.exc_info()[0]
-            LOG.exception("Serial write error from %s, %s", self.client.port,
-                          e)
-        else:
             LOG.debug("Wrote %s bytes to serial %s", num, self.client.port)
+            self.stats.incr("writes")
 
-            if num == len(data):
-                # If we wrote the whole packet, pop it off the queue.
-                self._write_buf.pop(0)
+            if num != len(data):
+                # Still data to write - remove the written data from the
+                # buffer and wait until the port can be written again.
+                if num:
+                    write_buf[0] = (data[num:], next_write_time)
+                return
 
-                # Remove us from the write watcher if there is no more data
-                # to write.
-                if len(self._write_buf) == 0:
-                    self.signal_needs_write.emit(self, False)
+            # If we wrote the whole packet, pop it off the queue.
+            write_buf.popleft()
 
-                # Signal that the packet was written.
-                self.signal_wrote.emit(self, data)
+            # Remove us from the write watcher if there is no more data to
+            # write.
+            if not write_buf:
+                self.signal_needs_write.emit(self, False)
 
-            elif num:
-                # Still data to write - remove the written data from the
-                # buffer.
-                self._write_buf[0] = (data[num:], next_write_time)
+            # Signal that the packet was written.
+            self.signal_wrote.emit(self, data)
 
     #-----------------------------------------------------------------------
     def close(self):
@@ -245,10 +304,12 @@ class Serial(Link):
 
         LOG.info("Serial device closing %s", self.client.port)
 
+        # The manager uses fileno() when the link closes so the port is
+        # closed after the signal.
+        self.signal_closing.emit(self)
         self.client.close()
         self._fd = None
-        self._write_buf = []
-        self.signal_closing.emit(self)
+        self._write_buf.clear()
 
     #-----------------------------------------------------------------------
     def _open_client(self):
@@ -0,0 +1,488 @@
+#===========================================================================
+#
+# Virtual Insteon network link.
+#
+#===========================================================================
+import heapq
+import itertools
+import random
+from .. import log
+from ..Address import Address
+from ..Signal import Signal
+from .. import message as Msg
+from .Link import PollLink
+
+LOG = log.get_logger(__name__)
+
+# Insteon device commands that the virtual devices understand.
+CMD_ON = 0x11
+CMD_ON_FAST = 0x12
+CMD_OFF = 0x13
+CMD_OFF_FAST = 0x14
+CMD_ID_REQUEST = 0x10
+CMD_STATUS = 0x19
+CMD_DB_GET = 0x2f
+CMD_CLEANUP_REPORT = 0x06
+
+
+class SimDevice:
+    """Virtual Insteon device used by the Simulator.
+
+    The device has an on level, an all link database that links it to the
+    modem, and a kind which controls what it does:
+
+    - switch:  On/off responder (level is 0 or 0xff).
+    - dimmer:  Dimmable responder.
+    - keypad_linc:  Dimmable responder with 8 button groups.
+    - motion:  Battery device that never answers direct commands (it's
+      asleep) and only sends broadcasts.
+    """
+    #: Number of broadcast groups for each kind.
+    num_groups = {"keypad_linc" : 8, "keypad_linc_sw" : 8, "motion" : 3}
+
+    #: Device (category, sub category) reported for each kind.  Other kinds
+    #: report as a switch.
+    models = {"dimmer" : (0x01, 0x20), "keypad_linc" : (0x01, 0x41),
+              "keypad_linc_sw" : (0x02, 0x2c), "motion" : (0x10, 0x01)}
+
+    def __init__(self, addr, kind, modem_addr):
+        """Constructor
+
+        Args:
+          addr (Address):  The device address.
+          kind (str):  The device kind (see above).
+          modem_addr (Address):  The modem address used in the database.
+        """
+        self.addr = addr
+        self.kind = kind
+        self.level = 0x00
+
+        # Database records: (mem_loc, DbFlags, group, Address, data).  The
+        # device is a controller of the modem for every group and a
+        # responder to the modem group 1.
+        self.db = []
+        mem_loc = 0x0fff
+        for group in range(1, self.groups + 1):
+            flags = Msg.DbFlags(in_use=True, is_controller=True,
+                                is_last_rec=False)
+            self.db.append((mem_loc, flags, group, modem_addr,
+                            bytes([0x03, 0x00, group])))
+            mem_loc -= 8
+
+        flags = Msg.DbFlags(in_use=True, is_controller=False,
+                            is_last_rec=False)
+        self.db.append((mem_loc, flags, 0x01, modem_addr,
+                        bytes([0xff, 0x1f, 0x01])))
+
+    #-----------------------------------------------------------------------
+    @property
+    def groups(self):
+        """The number of broadcast groups the device has.
+        """
+        return self.num_groups.get(self.kind, 1)
+
+    #-----------------------------------------------------------------------
+    @property
+    def model(self):
+        """The (category, sub category, firmware) of the device.
+        """
+        return self.models.get(self.kind, (0x02, 0x2a)) + (0x45,)
+
+    #-----------------------------------------------------------------------
+    @property
+    def is_asleep(self):
+        """True if the device doesn't answer direct commands.
+        """
+        return self.kind == "motion"
+
+    #-----------------------------------------------------------------------
+    def command(self, cmd1, cmd2):
+        """Process a direct command.
+
+        Args:
+          cmd1 (int):  The command.
+          cmd2 (int):  The command argument.
+
+        Returns:
+          (int, int):  Returns the cmd1, cmd2 values of the ACK.
+        """
+        if cmd1 in (CMD_ON, CMD_ON_FAST):
+            self.level = cmd2 if self.kind != "switch" else 0xff
+        elif cmd1 in (CMD_OFF, CMD_OFF_FAST):
+            self.level = 0x00
+        elif cmd1 == CMD_STATUS:
+            # Status replies put the database delta in cmd1.
+            return 0x00, self.level
+
+        return cmd1, self.level
+
+
+#===========================================================================
+class Simulator(PollLink):
+    """Virtual PLM modem and Insteon network link.
+
+    This is used in place of the Serial or Hub link to run the Protocol,
+    Modem, and MQTT code against a population of virtual devices (see
+    SimDevice) without any hardware.  It's a polling only link (add it to
+    the network manager with add_poll()).
+
+    The simulated PLM ACKs every message written to it (modem info requests
+    return the modem address, the modem database is empty).  Standard and
+    extended messages to a virtual device get a direct ACK after a delay
+    based on the hop count.  All link database requests stream the device
+    database records.  Devices can be made to send broadcasts (with the
+    repeated copies, cleanup, and cleanup report that a real device sends)
+    either directly with broadcast() or randomly using broadcast_rate.
+
+    Errors can be injected: nak_rate is the fraction of device commands that
+    are NAK'ed and timeout_rate is the fraction that never get a reply.
+
+    The time used for all the replies is the time passed to poll().
+    Messages are only written after the next write time passed to write()
+    like the Serial link does.
+    """
+    def __init__(self, modem_addr=None, seed=None):
+        """Constructor
+
+        Args:
+          modem_addr (Address):  The modem address.  If this is None,
+                     44.85.11 is used.
+          seed:  Optional random number generator seed.
+        """
+        # Public signals to connect to for read/write notification.
+        self.signal_read = Signal()   # (Simulator, bytes)
+        self.signal_wrote = Signal()  # (Simulator, bytes)
+
+        super().__init__()
+
+        self.modem_addr = Address(modem_addr or "44.85.11")
+        self.rand = random.Random(seed)
+
+        # Address ID to SimDevice.
+        self.devices = {}
+
+        # Error injection rates (0-1) and broadcasts per second sent by
+        # random devices.
+        self.nak_rate = 0.0
+        self.timeout_rate = 0.0
+        self.broadcast_rate = 0.0
+
+        # Time in seconds for a message to travel one hop.
+        self.hop_time = 0.087
+
+        # List of (data, next_write_time) messages to write.
+        self._write_buf = []
+
+        # Heap of (time, count, bytes) messages to be read.  The count keeps
+        # messages with the same time in order.
+        self._reads = []
+        self._count = itertools.count()
+
+        # Last poll time and the fractional number of random broadcasts to
+        # send.
+        self._time = None
+        self._broadcast_due = 0.0
+
+        # Number of messages written to and read from the link.
+        self.num_written = 0
+        self.num_read = 0
+
+    #-----------------------------------------------------------------------
+    def load_config(self, config):
+        """Load a configuration dictionary.
+
+        Virtual devices are created for every device in the insteon devices
+        configuration (see config.yaml).  The input configuration dictionary
+        can also contain:
+        - address (str):  The modem address.
+        - sim_seed (int):  Random number generator seed.
+        - sim_nak_rate (float):  Fraction of commands to NAK.
+        - sim_timeout_rate (float):  Fraction of commands with no reply.
+        - sim_broadcast_rate (float):  Random broadcasts per second.
+
+        Args:
+          config (dict):  Configuration data to load.
+        """
+        if 'address' in config:
+            self.modem_addr = Address(config['address'])
+        if 'sim_seed' in config:
+            self.rand.seed(config['sim_seed'])
+
+        self.nak_rate = config.get('sim_nak_rate', self.nak_rate)
+        self.timeout_rate = config.get('sim_timeout_rate', self.timeout_rate)
+        self.broadcast_rate = config.get('sim_broadcast_rate',
+                                         self.broadcast_rate)
+
+        for kind, values in (config.get('devices') or {}).items():
+            for value in values or []:
+                # Entries are either an address or {address: name}.
+                if isinstance(value, dict):
+                    value = next(iter(value))
+                self.add_device(value, kind)
+
+    #-----------------------------------------------------------------------
+    def add_device(self, addr, kind="switch"):
+        """Add a virtual device.
+
+        Args:
+          addr:  The device address (Address or anything Address accepts).
+          kind (str):  The device kind (see SimDevice).
+
+        Returns:
+          SimDevice:  Returns the created device.
+        """
+        addr = Address(addr)
+        device = SimDevice(addr, kind, self.modem_addr)
+        self.devices[addr.id] = device
+        return device
+
+    #-----------------------------------------------------------------------
+    def broadcast(self, addr, group=1, cmd1=CMD_ON, t=None):
+        """Have a virtual device send a broadcast.
+
+        The broadcast is received once for each hop, followed by the cleanup
+        to the modem and the cleanup report.
+
+        Args:
+          addr (Address):  The device sending the broadcast.
+          group (int):  The group to broadcast.
+          cmd1 (int):  The broadcast command.
+          t (float):  The time to send the broadcast.  If this is None, the
+            last poll time is used.
+        """
+        t = self._now(t)
+        device = self.devices[Address(addr).id]
+        cmd2 = 0x00
+
+        # The original broadcast and the copies repeated by each hop.
+        hops = self.rand.randint(1, 3)
+        for hops_left in range(hops, -1, -1):
+            flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False,
+                              hops_left, 3)
+            self._push(t, self._std(device.addr, Address(0, 0, group), flags,
+                                    cmd1, cmd2))
+            t += self.hop_time
+
+        # The cleanup to the modem and the final report.
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_CLEANUP, False, hops, 3)
+        self._push(t, self._std(device.addr, self.modem_addr, flags, cmd1,
+                                group))
+        t += 2 * (4 - hops) * self.hop_time
+
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False, hops, 3)
+        self._push(t, self._std(device.addr, Address(cmd1, 0x01, group),
+                                flags, CMD_CLEANUP_REPORT, 0x00))
+
+    #-----------------------------------------------------------------------
+    def write(self, data, next_write_time):
+        """Schedule data for writing to the virtual modem.
+
+        Args:
+          data (bytes):  The message to write.
+          next_write_time (function):  A function that returns the timestamp
+               of the next permitted write time
+        """
+        self._write_buf.append((data, next_write_time))
+
+    #-----------------------------------------------------------------------
+    def poll(self, t):
+        """Periodic poll callback.
+
+        Writes the next message if it's allowed, sends random broadcasts,
+        and then reads the replies that are due.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+        """
+        if self._time is not None and self.broadcast_rate and self.devices:
+            self._broadcast_due += (t - self._time) * self.broadcast_rate
+            while self._broadcast_due >= 1:
+                self._broadcast_due -= 1
+                device = self.rand.choice(list(self.devices.values()))
+                group = self.rand.randint(1, device.groups)
+                cmd1 = self.rand.choice((CMD_ON, CMD_OFF))
+                self.broadcast(device.addr, group, cmd1, t)
+        self._time = t
+
+        if self._write_buf:
+            data, next_write_time = self._write_buf[0]
+            if t >= next_write_time():
+                self._write_buf.pop(0)
+                self.num_written += 1
+                self.signal_wrote.emit(self, data)
+                self._process(data, t)
+
+        reads = self._reads
+        while reads and reads[0][0] <= t:
+            data = heapq.heappop(reads)[2]
+            self.num_read += 1
+            self.signal_read.emit(self, data)
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the earliest of the next permitted write, the
+           next reply, and the next random broadcast times or None if
+           nothing is scheduled.
+        """
+        times = []
+        if self._write_buf:
+            times.append(self._write_buf[0][1]())
+        if self._reads:
+            times.append(self._reads[0][0])
+        if self.broadcast_rate and self.devices:
+            last = t if self._time is None else self._time
+            times.append(last + (1 - self._broadcast_due) /
+                         self.broadcast_rate)
+
+        return min(times) if times else None
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the link.
+        """
+        self._write_buf = []
+        self._reads = []
+        self.signal_closing.emit(self)
+
+    #-----------------------------------------------------------------------
+    def _process(self, data, t):
+        """Create the replies to a written message.
+
+        Args:
+          data (bytes):  The message that was written.
+          t (float):  The current time.
+        """
+        code = data[1]
+
+        # Modem info: the reply has the modem address, category, and
+        # firmware.
+        if code == Msg.OutModemInfo.msg_code:
+            self._push(t, data + self.modem_addr.to_bytes() +
+                       bytes([0x03, 0x15, 0x9b, 0x06]))
+            return
+
+        # Modem database reads NAK since the database is empty.
+        elif code in (Msg.OutAllLinkGetFirst.msg_code,
+                      Msg.OutAllLinkGetNext.msg_code):
+            self._push(t, data + b"\x15")
+            return
+
+        # Other modem commands are ACK'ed.
+        elif code != Msg.OutStandard.msg_code:
+            self._push(t, data + b"\x06")
+            return
+
+        # Standard and extended messages are ACK'ed by the PLM and then
+        # answered by the device.
+        self._push(t, data + b"\x06")
+        addr = Address.from_bytes(data, 2)
+        flags = Msg.Flags.from_bytes(data, 5)
+        cmd1, cmd2 = data[6], data[7]
+
+        device = self.devices.get(addr.id, None)
+        if device is None or device.is_asleep:
+            return
+
+        roll = self.rand.random()
+        if roll < self.timeout_rate:
+            return
+
+        # Reply after the message travels to the device and back.
+        hops_used = self.rand.randint(0, flags.max_hops)
+        t += 2 * (1 + hops_used) * self.hop_time
+        reply_flags = (Msg.Flags.Type.DIRECT_NAK
+                       if roll < self.timeout_rate + self.nak_rate else
+                       Msg.Flags.Type.DIRECT_ACK)
+        hops_left = flags.max_hops - hops_used
+
+        if reply_flags == Msg.Flags.Type.DIRECT_NAK:
+            ack = Msg.Flags(reply_flags, False, hops_left, flags.max_hops)
+            self._push(t, self._std(addr, self.modem_addr, ack, cmd1,
+                                    Msg.InpStandard.NakType.ILLEGAL_VALUE))
+            return
+
+        ack = Msg.Flags(reply_flags, False, hops_left, flags.max_hops)
+        if flags.is_ext and cmd1 == CMD_DB_GET:
+            self._push(t, self._std(addr, self.modem_addr, ack, cmd1, 0x00))
+            self._push_db(device, t, hops_left, flags.max_hops)
+            return
+
+        ack_cmd1, ack_cmd2 = device.command(cmd1, cmd2)
+        self._push(t, self._std(addr, self.modem_addr, ack, ack_cmd1,
+                                ack_cmd2))
+
+        # The model is sent in a broadcast after the ACK.
+        if cmd1 == CMD_ID_REQUEST:
+            bcast = Msg.Flags(Msg.Flags.Type.BROADCAST, False, hops_left,
+                              flags.max_hops)
+            self._push(t + self.hop_time,
+                       self._std(addr, Address(*device.model), bcast, 0x01,
+                                 0x00))
+
+    #-----------------------------------------------------------------------
+    def _push_db(self, device, t, hops_left, max_hops):
+        """Stream the device database records.
+
+        Args:
+          device (SimDevice):  The device to read.
+          t (float):  The time of the first record.
+          hops_left (int):  The reply hops left.
+          max_hops (int):  The reply max hops.
+        """
+        flags = Msg.Flags(Msg.Flags.Type.DIRECT, True, hops_left, max_hops)
+        records = list(device.db)
+
+        # The last record is an empty record with the last record flag.
+        last = Msg.DbFlags(in_use=False, is_controller=False,
+                           is_last_rec=True)
+        records.append((records[-1][0] - 8, last, 0x00, Address(0, 0, 0),
+                        bytes(3)))
+
+        for mem_loc, db_flags, group, addr, data in records:
+            t += 2 * self.hop_time
+            ext = bytes([0x00, 0x01, mem_loc >> 8, mem_loc & 0xff, 0x00,
+                         db_flags.to_bytes()[0], group]) + \
+                addr.to_bytes() + data + b"\x00"
+            self._push(t, b"\x02\x51" + device.addr.to_bytes() +
+                       self.modem_addr.to_bytes() + flags.to_bytes() +
+                       bytes([CMD_DB_GET, 0x00]) + ext)
+
+    #-----------------------------------------------------------------------
+    def _std(self, from_addr, to_addr, flags, cmd1, cmd2):
+        """Build a standard input message.
+
+        Returns:
+          bytes:  Returns the InpStandard message bytes.
+        """
+        return (b"\x02\x50" + from_addr.to_bytes() + to_addr.to_bytes() +
+                flags.to_bytes() + bytes([cmd1, cmd2]))
+
+    #-----------------------------------------------------------------------
+    def _push(self, t, data):
+        """Schedule a message to be read.
+
+        Args:
+          t (float):  The time to read the message.
+          data (bytes):  The message bytes.
+        """
+        heapq.heappush(self._reads, (t, next(self._count), data))
+
+    #-----------------------------------------------------------------------
+    def _now(self, t):
+        """Return the input time or the last poll time if it's None.
+        """
+        if t is not None:
+            return t
+        return self._time if self._time is not None else 0.0
+
+    #-----------------------------------------------------------------------
+    def __str__(self):
+        return "Simulator %d devices" % len(self.devices)
+
+    #-----------------------------------------------------------------------
@@ -1,146 +1,222 @@
-#===========================================================================
-#
-# Stack class definition.
-#
-#===========================================================================
-from ..Signal import Signal
-from .. import log
-
-LOG = log.get_logger(__name__)
-
-
-class Stack:
-    """A Fake Network Interface for Queueing and 'Asynchronously' Running
-    Functional Calls
-
-    This is a polling only network "link".  Unlike regular links that do read
-    and write operations when they report they are ready, this class is
-    designed to only be polled during the event loop.
-
-    This is like a network link for reading and writing but  that is handled
-    my the network manager.  But in reality it is just a wrapper for inserting
-    function calls into the network loop.  This allows long functional calls
-    to be broken up into multiple sub calls that can be called on seperate
-    iterations of the main loop.
-
-    This isn't true asynchronous functionality, but it prevents the main loop
-    from halting for too long.
-
-    At the moment, and as best I can currently envision, this class is only
-    necessary for the import_scenes functionality.  I can't imagine any other
-    process that would require such complex and long running functions.
-    """
-
-    def __init__(self):
-        """Constructor.  Mostly just defines some attributes that are expected
-        but un-needed.
-        """
-        # Sent when the link is going down.  signature: (Link link)
-        self.signal_closing = Signal()
-
-        # The manager will emit this after the connection has been
-        # established and everything is ready.  Links should usually not emit
-        # this directly.  signature: (Link link, bool connected)
-        self.signal_connected = Signal()
-
-        # The list of groups of functions to call.  Each item should be a
-        # StackGroup
-        self.groups = []
-
-    #-----------------------------------------------------------------------
-    def poll(self, t):
-        """Periodic poll callback.
-
-        The manager will call this at recurring intervals in case the link
-        needs to do some periodic manual processing.
-
-        This is where we inject the function calls.  One call is made for each
-        instance of this call.  Essentially we make one function call per loop.
-        Then if other read or writing of other network items needs to take
-        place they will be called before the next function call is made.
-
-        If there is an exception raised during the function call, if error_stop
-        is True, the entire group of function calls is cancelled.
-
-        Args:
-           t (float):  Current Unix clock time tag.
-        """
-        if len(self.groups) > 0:
-            group = self.groups[0]
-            entry = group.get_next()
-            if entry is None:
-                # If no more function entries, then delete this group
-                self.groups.pop(0)
-            else:
-                try:
-                    entry[0](*entry[1], **entry[2])
-                except:
-                    if group.error_stop:
-                        LOG.exception("Error in executing stack function, "
-                                      "stopping all remaining functions in "
-                                      "the group")
-                        self.groups.pop(0)
-                    else:
-                        LOG.exception("Error in executing stack function, "
-                                      "continuing on to next function.")
-
-    #-----------------------------------------------------------------------
-    def new(self, error_stop=True):
-        """Initialize and create a new group of functional calls`
-
-        Args:
-          error_stop (bool): If True, if an exception is raised during any of
-                             the function calls, the remainder of the calls
-                             are skipped.
-
-        Returns:
-          StackGroup"""
-        new_stack = StackGroup(error_stop)
-        self.groups.append(new_stack)
-        return new_stack
-
-    #-----------------------------------------------------------------------
-    def close(self):
-        """Close the link.
-
-        The link must call self.signal_closing.emit() after closing.
-        """
-        self.signal_closing.emit()
-
-    #-----------------------------------------------------------------------
-
-
-#===========================================================================
-class StackGroup:
-    """A Simple Class for Grouping Functional Calls
-
-    Essentially just a list of functional calls to make, with an attribute that
-    defines what happens if an exception is raised during a call.
-    """
-
-    def __init__(self, error_stop=True):
-        """Constructor
-
-        Args:
-          error_stop (bool): If True, will skip the remaining funciton calls
-                             if any function call raises an exception.
-        """
-        self.error_stop = error_stop
-        self.funcs = []
-
-    def add(self, func, *args, **kwargs):
-        """ Appends a function call to the list of calls to make
-        """
-        self.funcs.append([func, args, kwargs])
-
-    def get_next(self):
-        """ Pops the next function call off of the start of the list.
-
-        Returns:
-          The next functional call as a list of len 3.  Otherwise None if there
-          are no more calls
-        """
-        if len(self.funcs) > 0:
-            return self.funcs.pop(0)
-        else:
-            return None
+#===========================================================================
+#
+# Stack class definition.
+#
+#===========================================================================
+import collections
+import time
+from ..Signal import Signal
+from .. import log
+
+LOG = log.get_logger(__name__)
+
+
+class Stack:
+    """A Fake Network Interface for Queueing and 'Asynchronously' Running
+    Functional Calls
+
+    This is a polling only network "link".  Unlike regular links that do read
+    and write operations when they report they are ready, this class is
+    designed to only be polled during the event loop.
+
+    This is like a network link for reading and writing but  that is handled
+    my the network manager.  But in reality it is just a wrapper for inserting
+    function calls into the network loop.  This allows long functional calls
+    to be broken up into multiple sub calls that can be called on seperate
+    iterations of the main loop.
+
+    This isn't true asynchronous functionality, but it prevents the main loop
+    from halting for too long.
+
+    At the moment, and as best I can currently envision, this class is only
+    necessary for the import_scenes functionality.  I can't imagine any other
+    process that would require such complex and long running functions.
+
+    Each poll runs calls until time_budget seconds have been used (at least
+    one call is always run) so long jobs finish quickly without blocking
+    the modem and MQTT traffic.  When there are multiple groups, the calls
+    are taken from each group in turn.  Groups with a name log their
+    progress every progress_interval seconds.
+    """
+    #: Seconds between progress messages for named groups.
+    progress_interval = 10
+
+    def __init__(self, time_budget=0.005):
+        """Constructor.  Mostly just defines some attributes that are expected
+        but un-needed.
+
+        Args:
+          time_budget (float):  The maximum number of seconds to spend
+                      running calls in each poll.
+        """
+        # Sent when the link is going down.  signature: (Link link)
+        self.signal_closing = Signal()
+
+        # The manager will emit this after the connection has been
+        # established and everything is ready.  Links should usually not emit
+        # this directly.  signature: (Link link, bool connected)
+        self.signal_connected = Signal()
+
+        # The queue of groups of functions to call.  Each item should be a
+        # StackGroup.  The group to call next is first.
+        self.groups = collections.deque()
+        self.time_budget = time_budget
+
+    #-----------------------------------------------------------------------
+    def poll(self, t):
+        """Periodic poll callback.
+
+        The manager will call this at recurring intervals in case the link
+        needs to do some periodic manual processing.
+
+        This is where we inject the function calls.  Calls are made until
+        the time budget is used, taking one call from each group in turn.
+        Then if other read or writing of other network items needs to take
+        place they will be called before the next calls are made.
+
+        If there is an exception raised during the function call, if error_stop
+        is True, the entire group of function calls is cancelled.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+        """
+        start = time.perf_counter()
+        groups = self.groups
+        while groups:
+            group = groups[0]
+            entry = group.get_next()
+            if entry is None:
+                # If no more function entries, then delete this group
+                groups.popleft()
+                continue
+
+            # Move the group to the end so the groups take turns.
+            groups.rotate(-1)
+            try:
+                entry[0](*entry[1], **entry[2])
+            except:
+                if group.error_stop:
+                    LOG.exception("Error in executing stack function, "
+                                  "stopping all remaining functions in "
+                                  "the group")
+                    groups.remove(group)
+                else:
+                    LOG.exception("Error in executing stack function, "
+                                  "continuing on to next function.")
+
+            self._report_progress(group)
+            if time.perf_counter() - start >= self.time_budget:
+                break
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns t if there are calls waiting to run or None if
+           there are no calls.
+        """
+        return t if self.groups else None
+
+    #-----------------------------------------------------------------------
+    def new(self, error_stop=True, name=None):
+        """Initialize and create a new group of functional calls`
+
+        Args:
+          error_stop (bool): If True, if an exception is raised during any of
+                             the function calls, the remainder of the calls
+                             are skipped.
+          name (str):  Optional name of the group.  If set, the progress of
+                       the group is logged.
+
+        Returns:
+          StackGroup"""
+        new_stack = StackGroup(error_stop, name)
+        self.groups.append(new_stack)
+        return new_stack
+
+    #-----------------------------------------------------------------------
+    def _report_progress(self, group):
+        """Log the progress of a named group.
+
+        Progress is logged when the group is finished or when
+        progress_interval seconds have passed since the last message.
+
+        Args:
+          group (StackGroup):  The group that just ran a call.
+        """
+        if group.name is None:
+            return
+
+        now = time.monotonic()
+        if group.funcs and now - group.report_time < self.progress_interval:
+            return
+
+        group.report_time = now
+        LOG.ui("%s: %d of %d steps done", group.name, group.num_done,
+               group.total)
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the link.
+
+        The link must call self.signal_closing.emit() after closing.
+        """
+        self.signal_closing.emit()
+
+    #-----------------------------------------------------------------------
+
+
+#===========================================================================
+class StackGroup:
+    """A Simple Class for Grouping Functional Calls
+
+    Essentially just a list of functional calls to make, with an attribute that
+    defines what happens if an exception is raised during a call.
+    """
+
+    def __init__(self, error_stop=True, name=None):
+        """Constructor
+
+        Args:
+          error_stop (bool): If True, will skip the remaining funciton calls
+                             if any function call raises an exception.
+          name (str):  Optional name of the group used for progress messages.
+        """
+        self.error_stop = error_stop
+        self.name = name
+        self.funcs = collections.deque()
+
+        # Number of calls added and taken from the group and the last time
+        # the progress was reported.
+        self.total = 0
+        self.num_done = 0
+        self.report_time = time.monotonic()
+
+    @property
+    def progress(self):
+        """The fraction (0-1) of the calls that have been taken.
+        """
+        return self.num_done / self.total if self.total else 1.0
+
+    def add(self, func, *args, **kwargs):
+        """ Appends a function call to the list of calls to make
+        """
+        self.funcs.append([func, args, kwargs])
+        self.total += 1
+
+    def get_next(self):
+        """ Pops the next function call off of the start of the list.
+
+        Returns:
+          The next functional call as a list of len 3.  Otherwise None if there
+          are no more calls
+        """
+        if self.funcs:
+            self.num_done += 1
+            return self.funcs.popleft()
+        else:
+            return None
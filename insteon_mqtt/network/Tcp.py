@@ -0,0 +1,374 @@
+#===========================================================================
+#
+# Network link to a PLM modem over a raw TCP socket.
+#
+#===========================================================================
+import collections
+import errno
+import socket
+from .. import log
+from ..Signal import Signal
+from .Link import Link
+from .Resolver import Resolver
+
+LOG = log.get_logger(__name__)
+
+
+class Tcp(Link):
+    """Raw TCP PLM modem network link.
+
+    This class reads and writes PLM messages over a TCP socket.  This is
+    used for modems that are exposed as a raw TCP port like the original
+    Insteon Hub (port 9761) or a serial to TCP bridge (ser2net, etc).  The
+    bytes sent over the socket are the same as the bytes sent over a serial
+    port so replies arrive as soon as the modem sends them instead of when
+    the Hub buffer is polled.
+
+    The socket is non-blocking (including the connection) and uses
+    TCP_NODELAY so the short PLM messages aren't delayed and TCP keep alive
+    so a dead connection is detected and reconnected.  Messages that are
+    waiting to be written when the connection drops are kept and written
+    after it reconnects.
+
+    Data reading and writing is handled via the Signal class.  When data is
+    read, Tcp.signal_read(Tcp, bytes) will be emitted with the link and the
+    data that was read.  When data is successfully written,
+    Tcp.signal_wrote(Tcp, bytes) will be called with the data that was
+    written.
+
+    Input fields can be set via the constructor or by loading a configuration
+    file (see load_config for details).
+    """
+    # The longest PLM message is 25 bytes (extended message received).  Read
+    # enough for a burst of messages (all link database dumps, etc) in one
+    # call.
+    read_buf_size = 25 * 64
+    max_write_queue = 500
+
+    # TCP keep alive idle time, probe interval, and probe count.
+    keep_alive = (10, 5, 3)
+
+    # Seconds between connect() attempts while the host name is resolved.
+    resolve_dt = 0.2
+
+    #-----------------------------------------------------------------------
+    def __init__(self, host=None, port=9761, reconnect_dt=10):
+        """Constructor.
+
+        The client will not be connected until connect() is called.
+        Either manually or by the network manager.
+
+        Args:
+          host (str):  The host name or IP address to connect to.
+          port (int):  The port to connect to.
+          reconnect_dt (int):  Maximum time in seconds between attempts to
+                       reconnect if the connection drops.  The first retry
+                       is after 1 second and the time doubles up to this.
+        """
+        # Public signals to connect to for read/write notification.
+        self.signal_read = Signal()   # (Tcp, bytes)
+        self.signal_wrote = Signal()  # (Tcp, bytes)
+
+        super().__init__()
+
+        self._host = host
+        self._port = port
+        self._reconnect_dt = reconnect_dt
+        self._retry_dt = 1
+        self._sock = None
+        self._fd = None
+
+        # Resolves the host name without blocking the event loop.
+        self._resolver = Resolver()
+
+        # Queue of packets to write.  Each is a tuple of (bytes, time) where
+        # the time is the time after which to do the write.  If the head
+        # packet has been partially written, _write_partial is True.
+        self._write_buf = collections.deque()
+        self._write_partial = False
+
+        self.signal_connected.connect(self._connected)
+
+    #-----------------------------------------------------------------------
+    def load_config(self, config):
+        """Load a configuration dictionary.
+
+        Configuration inputs will override any set in the constructor.
+
+        The input configuration dictionary can contain:
+        - tcp_host (str):  The host name or IP address of the modem.
+        - tcp_port (int):  The port to connect to (optional).
+
+        Args:
+          config (dict):  Configuration data to load.
+        """
+        assert self._fd is None
+
+        self._host = config.get('tcp_host', self._host)
+        self._port = config.get('tcp_port', self._port)
+
+        # Go ahead and crash now, otherwise we will crash in a more confusing
+        # place
+        assert self._host is not None
+
+    #-----------------------------------------------------------------------
+    def fileno(self):
+        """Return the file descriptor to watch for this link.
+
+        Returns:
+          int:  Returns the socket descriptor.
+        """
+        assert self._fd
+        return self._fd
+
+    #-----------------------------------------------------------------------
+    def write(self, data, next_write_time):
+        """Schedule data for writing to the modem.
+
+        This pushes the data into a queue for writing to the modem.  Only
+        after the network event loop flags the socket for writing will it
+        actually be written.
+
+        Args:
+          next_write_time (function):  A function that returns the timestamp
+               of the next permitted write time
+        """
+        # Save the input data to the write queue.
+        self._write_buf.append((data, next_write_time))
+        self.signal_needs_write.emit(self, True)
+
+        # if we have exceed the max queue size, pop the oldest packet off.
+        # This way if the link goes down for a long time, we don't just build
+        # up a infinite number of packets to write.
+        if (Tcp.max_write_queue and
+                len(self._write_buf) > Tcp.max_write_queue):
+            self._write_buf.popleft()
+            self._write_partial = False
+
+    #-----------------------------------------------------------------------
+    def retry_connect_dt(self):
+        """Return a positive integer (seconds) if the link should reconnect.
+
+        The time doubles after each failed attempt up to the reconnect_dt
+        input.  While the host name is being resolved, a short time is
+        returned so the connection is started soon after it's done.
+        """
+        if self._resolver.busy():
+            return self.resolve_dt
+
+        dt = self._retry_dt
+        self._retry_dt = min(2 * self._retry_dt, self._reconnect_dt)
+        return dt
+
+    #-----------------------------------------------------------------------
+    def connect(self):
+        """Connect the link to the modem.
+
+        This starts a non-blocking connection to the modem.  If the
+        connection fails later, the manager sees an error on the socket and
+        closes the link which schedules another attempt.
+
+        Host names are resolved in a thread (see Resolver) since a slow DNS
+        server would block the event loop.
+
+        Returns:
+          bool:  Returns True if the connection was started or False if it
+          failed or the host name is still being resolved.
+        """
+        try:
+            addr = self._resolver.address(self._host, self._port)
+        except OSError as e:
+            LOG.error("TCP modem can't resolve %s: %s", self, e)
+            return False
+
+        if addr is None:
+            return False
+
+        try:
+            sock = socket.socket(addr[0], addr[1], addr[2])
+        except OSError:
+            LOG.exception("TCP modem connection error to %s", self)
+            return False
+
+        sock.setblocking(False)
+        self._set_options(sock)
+
+        err = sock.connect_ex(addr[4])
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            LOG.error("TCP modem connection error to %s: %s", self,
+                      errno.errorcode.get(err, err))
+            sock.close()
+            return False
+
+        self._sock = sock
+        self._fd = sock.fileno()
+        LOG.info("TCP modem connecting %s", self)
+        return True
+
+    #-----------------------------------------------------------------------
+    def read_from_link(self):
+        """Read data from the link.
+
+        This will be called by the manager when there is data available on
+        the file descriptor for reading.
+
+        Returns:
+           int:  Return -1 if the link was closed.  Or any other integer to
+           indicate success.
+        """
+        try:
+            data = self._sock.recv(self.read_buf_size)
+        except (BlockingIOError, InterruptedError):
+            return 0
+        except OSError as e:
+            LOG.error("TCP modem read error from %s: %s", self, e)
+            self.close()
+            return -1
+
+        # An empty read means the other side closed the connection.
+        if not data:
+            LOG.error("TCP modem connection closed by %s", self)
+            self.close()
+            return -1
+
+        self._retry_dt = 1
+        self.signal_read.emit(self, data)
+        return len(data)
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the next permitted write time if there is data
+           waiting to be written or None otherwise.
+        """
+        if self._write_buf:
+            return self._write_buf[0][1]()
+        return None
+
+    #-----------------------------------------------------------------------
+    def write_to_link(self, t):
+        """Write data from the link.
+
+        This will be called by the manager when the file descriptor can be
+        written to.  It will only be called after the link as emitted the
+        signal_needs_write(True).  Once all the data has been written, the
+        link should call self.signal_needs_write.emit(False).
+
+        Args:
+           t (float:  The current time (time.time).
+        """
+        # If there is no more data to write, remove us from the write
+        # watching.
+        if not self._write_buf:
+            self.signal_needs_write.emit(self, False)
+            return
+
+        # Get the next data packet to write from the write queue and see if
+        # enough time has elapsed to write the message.
+        data, next_write_time = self._write_buf[0]
+        if t < next_write_time():
+            return
+
+        try:
+            num = self._sock.send(data)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            LOG.error("TCP modem write error to %s: %s", self, e)
+            self.close()
+            return
+
+        LOG.debug("Wrote %s bytes to %s", num, self)
+        self._retry_dt = 1
+
+        if num == len(data):
+            # If we wrote the whole packet, pop it off the queue.
+            self._write_buf.popleft()
+            self._write_partial = False
+
+            # Remove us from the write watcher if there is no more data to
+            # write.
+            if not self._write_buf:
+                self.signal_needs_write.emit(self, False)
+
+            # Signal that the packet was written.
+            self.signal_wrote.emit(self, data)
+
+        elif num:
+            # Still data to write - remove the written data from the buffer.
+            self._write_buf[0] = (data[num:], next_write_time)
+            self._write_partial = True
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the link.
+
+        The link will call self.signal_closing.emit() after closing.  The
+        packets waiting to be written are kept and written after the link
+        reconnects.
+        """
+        if not self._fd:
+            return
+
+        LOG.info("TCP modem closing %s", self)
+
+        # The rest of a partially written packet would be garbage to the
+        # modem so it's dropped.  The protocol will time out and resend it.
+        if self._write_partial:
+            self._write_buf.popleft()
+            self._write_partial = False
+
+        # The manager uses fileno() when the link closes so the socket is
+        # closed after the signal.
+        self.signal_closing.emit(self)
+        self._sock.close()
+        self._sock = None
+        self._fd = None
+
+    #-----------------------------------------------------------------------
+    def _set_options(self, sock):
+        """Set the TCP socket options.
+
+        Args:
+          sock (socket.socket):  The socket to set the options on.
+        """
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+        # The keep alive times are only available on some platforms.
+        idle, interval, count = self.keep_alive
+        for name, value in (("TCP_KEEPIDLE", idle),
+                            ("TCP_KEEPINTVL", interval),
+                            ("TCP_KEEPCNT", count)):
+            if hasattr(socket, name):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name),
+                                value)
+
+    #-----------------------------------------------------------------------
+    def _connected(self, link, connected):
+        """Connected callback.
+
+        This is called after the socket is added to the manager.  If we have
+        data remaining to write, we'll notify the manager of that.  This way
+        data can be written before the link is connected or while it's
+        reconnecting and it will get written later.
+
+        Args:
+          link (Link):  Ourselves.
+          connected (bool):  True if the device is connected.
+        """
+        assert self == link
+
+        if connected and self._write_buf:
+            self.signal_needs_write.emit(self, True)
+
+    #-----------------------------------------------------------------------
+    def __str__(self):
+        return "Tcp %s:%s" % (self._host, self._port)
+
+    #-----------------------------------------------------------------------
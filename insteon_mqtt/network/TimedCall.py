@@ -1,134 +1,231 @@
-#===========================================================================
-#
-# TimedCall class definition.
-#
-#===========================================================================
-from ..Signal import Signal
-from .. import log
-
-LOG = log.get_logger(__name__)
-
-
-class TimedCall:
-    """A Fake Network Interface for Queueing and 'Asynchronously' Running
-    Functional Calls at Specific Times
-
-    This is a polling only network "link".  Unlike regular links that do read
-    and write operations when they report they are ready, this class is
-    designed to only be polled during the event loop.
-
-    This is like a network link for reading and writing but  that is handled
-    by the network manager.  But in reality it is just a wrapper for inserting
-    function calls into the network loop near specific time.  This allows
-    function calls to be scheduled to run at specific times.
-
-    This isn't true asynchronous functionality, there is no gaurantee that the
-    call will run at the time specified, only that it will run at some point
-    after the specified time.  In general, this lag is minimal, likely tens of
-    milliseconds.  However, as a result, this class should not be used for
-    time critical functions.
-
-    This class was originally created to handle the reverting of the relay
-    state for momentary switching on the IOLinc.  Other time based objects
-    may also benefit from this.
-    """
-
-    def __init__(self):
-        """Constructor.  Mostly just defines some attributes that are expected
-        but un-needed.
-        """
-        # Sent when the link is going down.  signature: (Link link)
-        self.signal_closing = Signal()
-
-        # The manager will emit this after the connection has been
-        # established and everything is ready.  Links should usually not emit
-        # this directly.  signature: (Link link, bool connected)
-        self.signal_connected = Signal()
-
-        # The list of functions to call.  Each item should be a
-        # CallObject
-        self.calls = []
-
-    #-----------------------------------------------------------------------
-    def poll(self, t):
-        """Periodic poll callback.
-
-        The manager will call this at recurring intervals in case the link
-        needs to do some periodic manual processing.
-
-        This is where we inject the function calls.  The main loop calls this
-        once per loop.  This checks to see if the time associated with any of
-        the CallObjects has elapsed.  If it has, call the function.
-
-        Only a single call is performed each loop.  Currently, there is no
-        reason to think that multiple calls would be necessary.
-
-        Args:
-           t (float):  Current Unix clock time tag.
-        """
-        if len(self.calls) > 0:
-            if self.calls[0].time < t:
-                entry = self.calls.pop(0)
-                try:
-                    entry.func(*entry.args, **entry.kwargs)
-                except:
-                    LOG.error("Error in executing TimedCall function")
-
-    #-----------------------------------------------------------------------
-    def add(self, time, func, *args, **kwargs):
-        """Adds a call to the calls list and sorts the list
-
-        Args:
-          time (float):  The Unix clock time tag at which the call should run
-          func (function): The function to run
-          ars & kwargs: Passed to the function when run
-        Returns:
-          The created (CallObject)
-         """
-        new_call = CallObject(time, func, *args, **kwargs)
-        self.calls.append(new_call)
-        self.calls.sort(key=lambda call: call.time)
-        return new_call
-
-    #-----------------------------------------------------------------------
-    def remove(self, call):
-        """Removes a call from the calls list
-
-        Args:
-          call (CallObject):  The CallObject to delete, from add()
-        Returns:
-          True if a call was removed, False otherwise
-        """
-        ret = False
-        if call in self.calls:
-            self.calls.remove(call)
-            ret = True
-        return ret
-
-    #-----------------------------------------------------------------------
-    def close(self):
-        """Close the link.
-
-        The link must call self.signal_closing.emit() after closing.
-        """
-        self.signal_closing.emit()
-
-    #-----------------------------------------------------------------------
-
-
-#===========================================================================
-class CallObject:
-    """A Simple Class for Associating a Time with a Call
-    """
-
-    def __init__(self, time, func, *args, **kwargs):
-        """Constructor
-
-        Args:
-          error_stop (bool): If True, will skip the remaining funciton calls
-                             if any function call raises an exception.
-        """
-        self.time = time
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
+#===========================================================================
+#
+# TimedCall class definition.
+#
+#===========================================================================
+import heapq
+import itertools
+from ..Signal import Signal
+from .. import log
+
+LOG = log.get_logger(__name__)
+
+
+class TimedCall:
+    """A Fake Network Interface for Queueing and 'Asynchronously' Running
+    Functional Calls at Specific Times
+
+    This is a polling only network "link".  Unlike regular links that do read
+    and write operations when they report they are ready, this class is
+    designed to only be polled during the event loop.
+
+    This is like a network link for reading and writing but  that is handled
+    by the network manager.  But in reality it is just a wrapper for inserting
+    function calls into the network loop near specific time.  This allows
+    function calls to be scheduled to run at specific times.
+
+    This isn't true asynchronous functionality, there is no gaurantee that the
+    call will run at the time specified, only that it will run at some point
+    after the specified time.  In general, this lag is minimal, likely tens of
+    milliseconds.  However, as a result, this class should not be used for
+    time critical functions.
+
+    This class was originally created to handle the reverting of the relay
+    state for momentary switching on the IOLinc.  Other time based objects
+    may also benefit from this.
+
+    The calls are stored in a heap sorted by time.  Removed calls are
+    flagged as cancelled and left in the heap until they come due (or until
+    they make up half the heap) so removal doesn't have to search the heap.
+    The heap is never rebuilt while poll() is running the calls.
+    """
+
+    def __init__(self):
+        """Constructor.  Mostly just defines some attributes that are expected
+        but un-needed.
+        """
+        # Sent when the link is going down.  signature: (Link link)
+        self.signal_closing = Signal()
+
+        # The manager will emit this after the connection has been
+        # established and everything is ready.  Links should usually not emit
+        # this directly.  signature: (Link link, bool connected)
+        self.signal_connected = Signal()
+
+        # Heap of CallObject functions to call and the number of cancelled
+        # calls still in the heap.
+        self.calls = []
+        self._cancelled = 0
+
+        # True while poll() is running the calls that are due.
+        self._polling = False
+
+    #-----------------------------------------------------------------------
+    def poll(self, t):
+        """Periodic poll callback.
+
+        The manager will call this at recurring intervals in case the link
+        needs to do some periodic manual processing.
+
+        This is where we inject the function calls.  The main loop calls this
+        once per loop.  Every call that is due is run.  Calls that are added
+        by those functions are run on the next loop at the earliest.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+        """
+        # Calls added by the functions being run are set aside and put back
+        # for the next loop so a function that schedules another call that
+        # is already due can't keep this loop running.  Older calls that are
+        # due behind them are still run.
+        calls = self.calls
+        limit = CallObject.next_seq()
+        added = []
+        self._polling = True
+        try:
+            while calls and calls[0].time <= t:
+                entry = heapq.heappop(calls)
+                if entry.seq >= limit:
+                    added.append(entry)
+                    continue
+
+                if entry.is_cancelled:
+                    self._cancelled -= 1
+                    continue
+
+                entry.is_done = True
+                try:
+                    entry.func(*entry.args, **entry.kwargs)
+                except:
+                    LOG.error("Error in executing TimedCall function")
+        finally:
+            for entry in added:
+                heapq.heappush(calls, entry)
+            self._polling = False
+
+        # Calls removed by the functions may need to be cleaned up.
+        self._compact()
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the time the link next needs poll() to be called.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the time of the next call or None if there are no
+           calls.
+        """
+        calls = self.calls
+        while calls and calls[0].is_cancelled:
+            heapq.heappop(calls)
+            self._cancelled -= 1
+
+        return calls[0].time if calls else None
+
+    #-----------------------------------------------------------------------
+    def add(self, time, func, *args, **kwargs):
+        """Adds a call to the calls heap.
+
+        Args:
+          time (float):  The Unix clock time tag at which the call should run
+          func (function): The function to run
+          ars & kwargs: Passed to the function when run
+        Returns:
+          The created (CallObject)
+         """
+        new_call = CallObject(time, func, *args, **kwargs)
+        heapq.heappush(self.calls, new_call)
+        return new_call
+
+    #-----------------------------------------------------------------------
+    def remove(self, call):
+        """Removes a call from the calls heap
+
+        The call is flagged as cancelled and skipped when it comes due.  If
+        cancelled calls make up half or more of the heap, they are removed
+        and the heap is rebuilt.
+
+        Args:
+          call (CallObject):  The CallObject to delete, from add()
+        Returns:
+          True if a call was removed, False if the call has already run or
+          was already removed.
+        """
+        if call.is_cancelled or call.is_done:
+            return False
+
+        call.is_cancelled = True
+        self._cancelled += 1
+        self._compact()
+        return True
+
+    #-----------------------------------------------------------------------
+    def close(self):
+        """Close the link.
+
+        The link must call self.signal_closing.emit() after closing.
+        """
+        self.signal_closing.emit()
+
+    #-----------------------------------------------------------------------
+    def _compact(self):
+        """Rebuild the heap if cancelled calls make up half or more of it.
+
+        Nothing is done while poll() is running the calls since it's popping
+        calls off of the current heap.
+        """
+        if self._polling or self._cancelled * 2 < len(self.calls):
+            return
+
+        self.calls = [i for i in self.calls if not i.is_cancelled]
+        heapq.heapify(self.calls)
+        self._cancelled = 0
+
+    #-----------------------------------------------------------------------
+
+
+#===========================================================================
+class CallObject:
+    """A Simple Class for Associating a Time with a Call
+
+    CallObjects sort by time (and then by creation order) so they can be
+    stored in a heapq.
+    """
+    # Creation counter used to keep calls with the same time in FIFO order
+    # in the heap.
+    _count = itertools.count()
+
+    def __init__(self, time, func, *args, **kwargs):
+        """Constructor
+
+        Args:
+          time (float):  The Unix clock time tag at which the call should run
+          func (function): The function to run
+          ars & kwargs: Passed to the function when run
+        """
+        self.time = time
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.is_cancelled = False
+        self.is_done = False
+        self.seq = next(CallObject._count)
+
+    @classmethod
+    def next_seq(cls):
+        """Return a creation order number later than every existing call.
+
+        Returns:
+          int:  The number.  Calls created after this have a larger seq.
+        """
+        return next(cls._count)
+
+    def __lt__(self, rhs):
+        """Heap ordering by time and then creation order.
+
+        Args:
+          rhs (CallObject):  The CallObject to compare to.
+        """
+        return (self.time, self.seq) < (rhs.time, rhs.seq)
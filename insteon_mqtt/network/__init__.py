@@ -18,12 +18,19 @@ for maximum robustness.
 
 #===========================================================================
 
-from .Link import Link
+from .Link import Link, PollLink
+from .Resolver import Resolver
 from .Serial import Serial
+from .Tcp import Tcp
 from .Hub import Hub
+from .Capture import Capture
+from .Replay import Replay
+from .Simulator import Simulator
 from .Stack import Stack
 from .Mqtt import Mqtt
 from .TimedCall import TimedCall
+from .AsyncManager import AsyncManager
+from .LoopMonitor import LoopMonitor
 
 # Use Poll on non-windows systems - For windows we have to use select.
 import platform  # pylint: disable=wrong-import-order
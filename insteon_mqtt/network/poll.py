@@ -5,6 +5,7 @@
 #===========================================================================
 import errno
 import itertools
+import math
 import select
 import time
 from .. import log
@@ -12,6 +13,12 @@ from .. import log
 LOG = log.get_logger(__name__)
 
 
+def _call(func, *args):
+    """Call a link method when there is no loop monitor.
+    """
+    return func(*args)
+
+
 class Manager:
     """Poll based network event loop manager.
 
@@ -51,13 +58,23 @@ class Manager:
     EVENT_ERROR = select.POLLERR
 
     #-----------------------------------------------------------------------
-    def __init__(self):
+    def __init__(self, monitor=None):
         """Constructor.
+
+        Args:
+          monitor (LoopMonitor):  Optional monitor to time the link calls and
+                  the loop iterations with.
         """
+        self.monitor = monitor
+
         self.poll = select.poll()
 
         # Map of fileno to Link objects.
         self.links = {}
+        # Map of fileno to the registered poll event mask.  Links emit the
+        # needs write signal for every message so this is used to skip
+        # modify() calls that wouldn't change anything.
+        self.masks = {}
         # List of links to only call poll() on.
         self.poll_links = []
 
@@ -112,6 +129,7 @@ class Manager:
         if connected:
             fd = link.fileno()
             self.poll.register(fd, self.READ)
+            self.masks[fd] = self.READ
 
             # Connect the link signals so we know when it closes or needs to
             # write data.
@@ -149,6 +167,7 @@ class Manager:
 
         self.poll.unregister(fd)
         self.links.pop(fd, None)
+        self.masks.pop(fd, None)
 
         LOG.debug("Link removed %s", link)
 
@@ -176,15 +195,33 @@ class Manager:
 
         Arg:
            time_out (int):  Time out to use in seconds.  The actual time out
-                    value is is the minimum of this, the manager reconnect
-                    time out and the unconnected retry time out.
+                    value is is the minimum of this, the unconnected retry time
+                    out, and the time until the earliest link deadline (see
+                    Link.next_poll_time).
         """
-        # Get the actual time out to use.
+        # Get the actual time out to use.  Wake up in time for the earliest
+        # link deadline so timed calls, message time outs, and paced writes
+        # aren't delayed until the next network activity.
         time_out = Manager.min_time_out if time_out is None else time_out
         if self.unconnected:
             time_out = min(time_out, self.unconnected_time_out)
 
-        time_out *= 1000  # sec->msec
+        t = time.time()
+        deadline = self.next_poll_time(t)
+        if deadline is not None:
+            time_out = min(time_out, max(deadline - t, 0.0))
+
+        # Time the loop should wake up at - used for the loop lag.  A
+        # deadline that has already passed counts from the deadline.  Link
+        # calls are made through the monitor to time them.
+        due = t + time_out if deadline is None else min(t + time_out,
+                                                        deadline)
+        monitor = self.monitor
+        call = _call if monitor is None else monitor.call
+
+        # sec->msec.  Round up so we don't wake up just before a deadline
+        # and then spin until it arrives.
+        time_out = math.ceil(time_out * 1000)
 
         # Keep polling until we get a successfull call with events.
         while True:
@@ -208,7 +245,7 @@ class Manager:
             # If we're after the reconnect time, try and connect the linkn.
             if t >= next_time:
                 LOG.debug("Link connection attempt %s", link)
-                if link.connect():
+                if call(link.connect):
                     # Connection success - add the link to the manager.
                     LOG.debug("Link connection success %s", link)
                     self.add(link)
@@ -226,12 +263,12 @@ class Manager:
             # Link has data to read.  If reading has an error, clear the
             # action flag so nothing else happens.
             if flag & self.EVENT_READ:
-                if link.read_from_link() == -1:
+                if call(link.read_from_link) == -1:
                     flag = 0
 
             # Link has data to write.
             if flag & self.EVENT_WRITE:
-                link.write_to_link(t)
+                call(link.write_to_link, t)
 
             # File/socket is shutting down - close the link.
             if flag & self.EVENT_CLOSE:
@@ -247,9 +284,33 @@ class Manager:
         # user reports.  So copy the links before iterating since closing the
         # link mods the dict which isn't allowed.  This isn't ideal but the
         # number of links should be small so it probably doesn't matter.
+        t_poll = time.time()
         for link in itertools.chain(list(self.links.values()),
                                     self.poll_links):
-            link.poll(t)
+            call(link.poll, t)
+
+        if monitor is not None:
+            monitor.iteration(max(t_poll - due, 0.0), time.time() - t)
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the earliest poll deadline of all the links.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the Unix clock time of the earliest
+           Link.next_poll_time() or None if no link has a deadline.
+        """
+        deadline = None
+        for link in itertools.chain(self.links.values(), self.poll_links):
+            link_time = link.next_poll_time(t)
+            if link_time is not None and (deadline is None or
+                                          link_time < deadline):
+                deadline = link_time
+
+        return deadline
 
     #-----------------------------------------------------------------------
     def link_closing(self, link):
@@ -301,9 +362,10 @@ class Manager:
           needs_write (bool):  True if the link has data to write.  False
                       if the link no longer has data to write.
         """
-        if needs_write:
-            self.poll.modify(link.fileno(), self.READ_WRITE)
-        else:
-            self.poll.modify(link.fileno(), self.READ)
+        fd = link.fileno()
+        mask = self.READ_WRITE if needs_write else self.READ
+        if self.masks.get(fd) != mask:
+            self.poll.modify(fd, mask)
+            self.masks[fd] = mask
 
     #-----------------------------------------------------------------------
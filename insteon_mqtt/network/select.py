@@ -15,6 +15,12 @@ from .. import log
 LOG = log.get_logger(__name__)
 
 
+def _call(func, *args):
+    """Call a link method when there is no loop monitor.
+    """
+    return func(*args)
+
+
 class Manager:
     """Select based network event loop manager.
 
@@ -42,9 +48,15 @@ class Manager:
     min_time_out = 3  # seconds
 
     #-----------------------------------------------------------------------
-    def __init__(self):
+    def __init__(self, monitor=None):
         """Constructor.
+
+        Args:
+          monitor (LoopMonitor):  Optional monitor to time the link calls and
+                  the loop iterations with.
         """
+        self.monitor = monitor
+
         # List of file descriptors to look at for reading, writing, and
         # errors.
         self.read = []
@@ -175,14 +187,30 @@ class Manager:
 
         Arg:
           time_out (int):  Time out to use in seconds.  The actual time out
-                   value is is the minimum of this, the manager reconnect
-                   time out and the unconnected retry time out.
+                   value is is the minimum of this, the unconnected retry time
+                   out, and the time until the earliest link deadline (see
+                   Link.next_poll_time).
         """
-        # Get the actual time out to use.
+        # Get the actual time out to use.  Wake up in time for the earliest
+        # link deadline so timed calls, message time outs, and paced writes
+        # aren't delayed until the next network activity.
         time_out = Manager.min_time_out if time_out is None else time_out
         if self.unconnected:
             time_out = min(time_out, self.unconnected_time_out)
 
+        t = time.time()
+        deadline = self.next_poll_time(t)
+        if deadline is not None:
+            time_out = min(time_out, max(deadline - t, 0.0))
+
+        # Time the loop should wake up at - used for the loop lag.  A
+        # deadline that has already passed counts from the deadline.  Link
+        # calls are made through the monitor to time them.
+        due = t + time_out if deadline is None else min(t + time_out,
+                                                        deadline)
+        monitor = self.monitor
+        call = _call if monitor is None else monitor.call
+
         # If nothing is reading for checking, skip the select call.
         run = self.read or self.write or self.error
         if not run:
@@ -210,7 +238,7 @@ class Manager:
             # If we're after the reconnect time, try and connect the linkn.
             if t >= next_time:
                 LOG.debug("Link connection attempt %s", link)
-                if link.connect():
+                if call(link.connect):
                     # Connection success - add the link to the manager.
                     LOG.debug("Link connection success %s", link)
                     self.add(link)
@@ -229,12 +257,12 @@ class Manager:
         for fd in reads:
             link = self.links.get(fd, None)
             if link:
-                link.read_from_link()
+                call(link.read_from_link)
 
         for fd in writes:
             link = self.links.get(fd, None)
             if link:
-                link.write_to_link(t)
+                call(link.write_to_link, t)
 
         # Poll the links in case they need to do brute force processing of
         # any kind.  There are some cases where the MQTT client poll can
@@ -242,9 +270,33 @@ class Manager:
         # user reports.  So copy the links before iterating since closing the
         # link mods the dict which isn't allowed.  This isn't ideal but the
         # number of links should be small so it probably doesn't matter.
+        t_poll = time.time()
         for link in itertools.chain(list(self.links.values()),
                                     self.poll_links):
-            link.poll(t)
+            call(link.poll, t)
+
+        if monitor is not None:
+            monitor.iteration(max(t_poll - due, 0.0), time.time() - t)
+
+    #-----------------------------------------------------------------------
+    def next_poll_time(self, t):
+        """Return the earliest poll deadline of all the links.
+
+        Args:
+           t (float):  Current Unix clock time tag.
+
+        Returns:
+           float:  Returns the Unix clock time of the earliest
+           Link.next_poll_time() or None if no link has a deadline.
+        """
+        deadline = None
+        for link in itertools.chain(self.links.values(), self.poll_links):
+            link_time = link.next_poll_time(t)
+            if link_time is not None and (deadline is None or
+                                          link_time < deadline):
+                deadline = link_time
+
+        return deadline
 
     #-----------------------------------------------------------------------
     def link_closing(self, link):
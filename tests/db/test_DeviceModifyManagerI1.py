@@ -190,7 +190,8 @@ class MockProto:
     def __init__(self):
         self.msgs = []
 
-    def send(self, msg, handler, high_priority=False, after=None):
+    def send(self, msg, handler, high_priority=False, after=None,
+             supersede=None):
         self.msgs.append(msg)
 
 class MockModem():
@@ -134,3 +134,25 @@ class Test_Base_Config():
         assert len(test_device.protocol.sent) == 1
         assert len(test_device._send_queue) == 0
         assert msg_handler._num_retry > 0
+
+    def test_send_supersede(self, test_device):
+        test_device.supersede_cmds = True
+        msg = Msg.OutStandard.direct(test_device.addr, 0x11, 0xff)
+        msg_handler = IM.handler.StandardCmd(msg, None, None)
+        with mock.patch.object(test_device.protocol, 'send') as mocked:
+            # The supersede key is queued with the message while the device
+            # is asleep.
+            assert test_device.send(msg, msg_handler, supersede="state") \
+                is None
+            mocked.assert_not_called()
+            test_device.awake(lambda *args: None)
+            mocked.assert_called_once_with(msg, msg_handler, False, None,
+                                           "state")
+
+            # The timed handle is returned when the device is awake.
+            mocked.reset_mock()
+            mocked.return_value = "timed"
+            assert test_device.send(msg, msg_handler, after=1,
+                                    supersede="state") == "timed"
+            mocked.assert_called_once_with(msg, msg_handler, False, 1,
+                                           "state")
@@ -352,7 +352,8 @@ class MockProto:
     def add_handler(self, *args):
         pass
 
-    def send(self, msg, msg_handler, high_priority=False, after=None):
+    def send(self, msg, msg_handler, high_priority=False, after=None,
+             supersede=None):
         self.msgs.append(msg)
 
     def set_wait_time(self, time):
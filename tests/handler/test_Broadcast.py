@@ -5,6 +5,7 @@
 # pylint: disable=protected-access
 #===========================================================================
 import time
+from unittest import mock
 import insteon_mqtt as IM
 import insteon_mqtt.message as Msg
 
@@ -85,22 +86,25 @@ class Test_Broadcast:
         pre_success_time = proto.wait_time
         flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
         success_report_to_addr = IM.Address(0x11, 1, 0x1)
-        msg = Msg.InpStandard(addr, addr, flags, 0x06, 0x00)
+        msg = Msg.InpStandard(addr, success_report_to_addr, flags, 0x06, 0x00)
         r = handler.msg_received(proto, msg)
 
         assert r == Msg.CONTINUE
         assert len(calls) == 3
         # wait time should be cleared
         assert proto.wait_time < pre_success_time
+        assert proto.stats.counters["hold_off"] == 2
+        assert proto.stats.counters["hold_off_released"] == 1
+        assert proto.stats.histograms["hold_off_saved"].sum > 5
 
         # Failure Report Broadcast
         pre_success_time = proto.wait_time
         flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
         success_report_to_addr = IM.Address(0x11, 1, 0x1)
-        msg = Msg.InpStandard(addr, addr, flags, 0x06, 0x01)
+        msg = Msg.InpStandard(addr, success_report_to_addr, flags, 0x06, 0x01)
         r = handler.msg_received(proto, msg)
 
-        assert 'Cleanup report for 0a.12.34, grp 52 had 1 fails.' in caplog.text
+        assert 'Cleanup report for 0a.12.34, grp 1 had 1 fails.' in caplog.text
         assert r == Msg.CONTINUE
         assert len(calls) == 4
 
@@ -115,17 +119,118 @@ class Test_Broadcast:
         assert len(calls) == 5
 
     #-----------------------------------------------------------------------
+    def test_modem_cleanup(self, tmpdir):
+        proto = MockProto()
+        modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+        modem.save_path = str(tmpdir)
+        modem.addr = IM.Address('44.85.11')
+        handler = IM.handler.Broadcast(modem)
+
+        addr = IM.Address('0a.12.34')
+        device = IM.device.Base(proto, modem, addr, "foo")
+        device.handle_broadcast = lambda msg: None
+        modem.add(device)
+
+        # 10 responders with the modem in the middle.  The database is
+        # scanned from the top so 4 responders are after the modem.
+        db_flags = Msg.DbFlags(in_use=True, is_controller=True,
+                               is_last_rec=False)
+        for count in range(10):
+            e_addr = modem.addr if count == 4 else IM.Address(0x10, 0xab,
+                                                               count)
+            entry = IM.db.DeviceEntry(e_addr, 0x01, count, db_flags,
+                                      bytes([0x01, 0x02, 0x03]))
+            device.db.add_entry(entry)
+
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
+        msg = Msg.InpStandard(addr, IM.Address('00.00.01'), flags, 0x11, 0x01)
+        handler.msg_received(proto, msg)
+        assert proto.wait_time - time.time() > 5
+
+        # Cleanup report for a different group doesn't change the hold off.
+        start_wait = proto.wait_time
+        msg = Msg.InpStandard(addr, IM.Address(0x11, 0x00, 0x02), flags,
+                              0x06, 0x00)
+        handler.msg_received(proto, msg)
+        assert proto.wait_time == start_wait
+
+        # Cleanup for the group ends the hold off after the remaining 4
+        # responders and the cleanup report.
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_CLEANUP, False)
+        msg = Msg.InpStandard(addr, modem.addr, flags, 0x11, 0x01)
+        r = handler.msg_received(proto, msg)
+        assert r == Msg.CONTINUE
+        assert proto.wait_time - time.time() < 5 * .522 + .01
+        assert proto.stats.counters["hold_off_released"] == 1
+        assert proto.stats.histograms["hold_off_saved"].sum > 2.5
+
+        # A later release for the same hold off does nothing.
+        end = proto.wait_time
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
+        msg = Msg.InpStandard(addr, IM.Address(0x11, 0x00, 0x01), flags,
+                              0x06, 0x00)
+        handler.msg_received(proto, msg)
+        assert proto.wait_time == end
+        assert proto.stats.counters["hold_off_released"] == 1
+
+    #-----------------------------------------------------------------------
+    def test_overlapping_hold_offs(self, tmpdir):
+        proto = MockProto()
+        modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+        modem.save_path = str(tmpdir)
+        handler = IM.handler.Broadcast(modem)
+
+        # Device A has 10 responders and device B has 1.
+        db_flags = Msg.DbFlags(in_use=True, is_controller=True,
+                               is_last_rec=False)
+        devices = []
+        for addr, num in (('0a.12.34', 10), ('0a.12.35', 1)):
+            device = IM.device.Base(proto, modem, IM.Address(addr), addr)
+            device.handle_broadcast = lambda msg: None
+            for count in range(num):
+                entry = IM.db.DeviceEntry(IM.Address(0x10, 0xab, count), 0x01,
+                                          count, db_flags, bytes(3))
+                device.db.add_entry(entry)
+            modem.add(device)
+            devices.append(device)
+
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
+        for device in devices:
+            msg = Msg.InpStandard(device.addr, IM.Address('00.00.01'), flags,
+                                  0x11, 0x01)
+            handler.msg_received(proto, msg)
+        end_a = proto.wait_time
+        assert end_a - time.time() > 5
+
+        # A PLM busy pause while the hold offs are active.
+        busy_end = time.time() + 0.3
+        proto.set_wait_time(busy_end)
+
+        # B's cleanup report ends B's hold off but not A's.
+        msg = Msg.InpStandard(devices[1].addr, IM.Address(0x11, 0x00, 0x01),
+                              flags, 0x06, 0x00)
+        handler.msg_received(proto, msg)
+        assert proto.stats.counters["hold_off_released"] == 1
+        assert proto.wait_time == end_a
+
+        # A's cleanup report ends the hold off but the PLM busy pause is
+        # kept.
+        msg = Msg.InpStandard(devices[0].addr, IM.Address(0x11, 0x00, 0x01),
+                              flags, 0x06, 0x00)
+        handler.msg_received(proto, msg)
+        assert proto.stats.counters["hold_off_released"] == 2
+        assert proto.wait_time >= busy_end
+        assert proto.wait_time < end_a
+
+    #-----------------------------------------------------------------------
 
 #===========================================================================
 
 
-class MockProto:
+class MockProto(IM.Protocol):
     def __init__(self):
-        self.signal_received = IM.Signal()
-        self.wait_time = 0
-
-    def add_handler(self, *args):
-        pass
+        super().__init__(mock.Mock())
 
-    def set_wait_time(self, wait_time):
-        self.wait_time = wait_time
+    @property
+    def wait_time(self):
+        return self.get_next_write_time()
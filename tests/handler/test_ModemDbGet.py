@@ -125,7 +125,8 @@ class Test_ModemDbGet:
 
 
 class MockProtocol:
-    def send(self, msg, handler, high_priority=False, after=None):
+    def send(self, msg, handler, high_priority=False, after=None,
+             supersede=None):
         self.sent = msg
         self.handler = handler
 
@@ -18,6 +18,19 @@ class Test_Timed:
         assert obj.is_active(t0 + 0.1) is True
         assert obj.is_active(t0 - 0.1) is False
 
+    #-----------------------------------------------------------------------
+    def test_order(self):
+        a = IM.message.Timed("msg", "handler", False, 1000)
+        b = IM.message.Timed("msg", "handler", False, 999)
+        c = IM.message.Timed("msg", "handler", False, 1000)
+
+        assert b < a
+        assert a < c
+        assert sorted([c, a, b]) == [b, a, c]
+
+        a.cancel()
+        assert a.is_cancelled is True
+
     #-----------------------------------------------------------------------
     def test_send(self):
         t0 = 1000
@@ -30,6 +43,7 @@ class Test_Timed:
         protocol = IM.Protocol(link)
 
         obj.send(protocol)
+        assert obj.is_sent is True
 
         last = link.mock_calls[-1]
         assert last == mock.call.write(msg.to_bytes(),
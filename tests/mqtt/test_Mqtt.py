@@ -0,0 +1,166 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/mqtt/Mqtt.py
+#
+# pylint: disable=redefined-outer-name,protected-access
+#===========================================================================
+import json
+import time
+import pytest
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+import helpers as H
+
+
+@pytest.fixture
+def setup(mock_paho_mqtt, tmpdir):
+    proto = IM.Protocol(IM.network.Serial())
+    modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+    modem.save_path = str(tmpdir)
+
+    link = IM.network.Mqtt()
+    mqtt = IM.mqtt.Mqtt(link, modem)
+    return H.Data(mqtt=mqtt, link=link, modem=modem, proto=proto)
+
+
+#===========================================================================
+class Test_Mqtt:
+    #-----------------------------------------------------------------------
+    def test_stats(self, setup):
+        mqtt, link, modem, proto = setup.getAll(['mqtt', 'link', 'modem',
+                                                 'proto'])
+        config = {'broker' : 'localhost', 'port' : 1883,
+                  'cmd_topic' : 'insteon/command'}
+
+        # No topic - nothing is scheduled.
+        mqtt.load_config(config)
+        assert modem.timed_call.calls == []
+        mqtt.publish_stats()
+        assert link.client.pub == []
+
+        config['stats_topic'] = 'insteon/stats'
+        config['stats_interval'] = 10
+        mqtt.load_config(config)
+        assert len(modem.timed_call.calls) == 1
+
+        # Reloading the config replaces the scheduled call.
+        mqtt.load_config(config)
+        assert len(modem.timed_call.calls) == 1
+
+        proto.stats.incr("read")
+        link.connected = True
+        call = modem.timed_call.calls[0]
+        modem.timed_call.poll(call.time + 1)
+        assert len(link.client.pub) == 1
+        pub = link.client.pub[0]
+        assert pub['topic'] == 'insteon/stats'
+        assert pub['retain'] is False
+        assert json.loads(pub['payload'])['counters'] == {"read" : 1}
+
+        # The next call is scheduled.
+        assert len(modem.timed_call.calls) == 1
+        assert modem.timed_call.calls[0] is not call
+
+        # Event loop metrics are added if there is a loop monitor.
+        mqtt.loop_monitor = IM.network.LoopMonitor()
+        mqtt.loop_monitor.iteration(0.5, 0.1)
+        mqtt.publish_stats()
+        loop = json.loads(link.client.pub[-1]['payload'])['loop']
+        assert loop['histograms']['loop_lag']['count'] == 1
+        assert loop['lag_percentiles']['max'] == 0.5
+
+    #-----------------------------------------------------------------------
+    def test_stats_hold_off(self, setup):
+        mqtt, link, modem, proto = setup.getAll(['mqtt', 'link', 'modem',
+                                                 'proto'])
+        config = {'broker' : 'localhost', 'port' : 1883,
+                  'cmd_topic' : 'insteon/command',
+                  'stats_topic' : 'insteon/stats'}
+        mqtt.load_config(config)
+        link.connected = True
+
+        addr = IM.Address('0a.12.34')
+        device = IM.device.Base(proto, modem, addr, "foo")
+        device.handle_broadcast = lambda msg: None
+        db_flags = Msg.DbFlags(in_use=True, is_controller=True,
+                               is_last_rec=False)
+        for i in range(5):
+            device.db.add_entry(IM.db.DeviceEntry(
+                IM.Address(0x10, 0xab, i), 0x01, i, db_flags, bytes(3)))
+        modem.add(device)
+
+        # A scene broadcast holds off writes until the cleanup report.
+        handler = IM.handler.Broadcast(modem)
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
+        handler.msg_received(proto, Msg.InpStandard(
+            addr, IM.Address('00.00.01'), flags, 0x11, 0x01))
+        handler.msg_received(proto, Msg.InpStandard(
+            addr, IM.Address(0x11, 0x00, 0x01), flags, 0x06, 0x00))
+
+        mqtt.publish_stats()
+        stats = json.loads(link.client.pub[-1]['payload'])
+        assert stats['counters']['hold_off'] == 1
+        assert stats['counters']['hold_off_released'] == 1
+        assert stats['histograms']['hold_off_saved']['sum'] > 2
+
+    #-----------------------------------------------------------------------
+    def test_publish_policy(self, setup, monkeypatch, caplog):
+        mqtt, link = setup.getAll(['mqtt', 'link'])
+        config = {'broker' : 'localhost', 'port' : 1883,
+                  'cmd_topic' : 'insteon/command'}
+
+        # Default - everything is published.
+        mqtt.load_config(config)
+        mqtt.publish("a/state", "on")
+        mqtt.publish("a/state", "on")
+        assert len(link.client.pub) == 2
+
+        config['publish_policy'] = 'on_change'
+        mqtt.load_config(config)
+        link.client.clear()
+        mqtt.publish("a/state", "on")
+        mqtt.publish("a/state", "on")
+        mqtt.publish("b/state", "on")
+        mqtt.publish("a/state", "off")
+        mqtt.publish("a/state", "on")
+        assert [(i.topic, i.payload) for i in link.client.pub] == [
+            ("a/state", "on"), ("b/state", "on"), ("a/state", "off"),
+            ("a/state", "on")]
+        assert mqtt.stats.counters["publish_suppressed"] == 1
+
+        # Messages that aren't retained are always sent and the next
+        # retained message is too.
+        link.client.clear()
+        mqtt.publish("a/state", "on", retain=False)
+        mqtt.publish("a/state", "on", retain=False)
+        mqtt.publish("a/state", "on")
+        mqtt.publish("a/state", "on")
+        assert len(link.client.pub) == 3
+
+        # Everything is published after connecting.
+        link.client.clear()
+        link.connected = True
+        mqtt.handle_connected(link, True)
+        mqtt.publish("a/state", "on")
+        assert len(link.client.pub) == 1
+        link.connected = False
+
+        config['publish_policy'] = 'refresh'
+        config['publish_refresh'] = 10
+        mqtt.load_config(config)
+        link.client.clear()
+        t = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: t[0])
+        mqtt.publish("a/state", "on")
+        t[0] += 5
+        mqtt.publish("a/state", "on")
+        t[0] += 6
+        mqtt.publish("a/state", "on")
+        assert len(link.client.pub) == 2
+
+        config['publish_policy'] = 'bad'
+        mqtt.load_config(config)
+        assert "Invalid MQTT publish_policy 'bad'" in caplog.text
+        assert mqtt._publish_policy == "always"
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,146 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/AsyncManager.py
+#
+#===========================================================================
+import asyncio
+import socket
+import time
+import insteon_mqtt as IM
+
+
+class SockLink(IM.network.Link):
+    def __init__(self, sock, connect_ok=True):
+        super().__init__()
+        self.sock = sock
+        self.connect_ok = connect_ok
+        self.reads = []
+        self.buf = []
+        self.num_poll = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def connect(self):
+        return self.connect_ok
+
+    def retry_connect_dt(self):
+        return 0.01
+
+    def read_from_link(self):
+        self.reads.append(self.sock.recv(100))
+
+    def write(self, data):
+        self.buf.append(data)
+        self.signal_needs_write.emit(self, True)
+
+    def write_to_link(self, t):
+        self.sock.send(self.buf.pop(0))
+        if not self.buf:
+            self.signal_needs_write.emit(self, False)
+
+    def poll(self, t):
+        self.num_poll += 1
+
+    def close(self):
+        self.signal_closing.emit(self)
+        self.sock.close()
+
+
+#===========================================================================
+class Test_AsyncManager:
+    #-----------------------------------------------------------------------
+    def test_read_write(self):
+        mgr = IM.network.AsyncManager()
+        timed = IM.network.TimedCall()
+        a, b = socket.socketpair()
+        link = SockLink(a)
+        link.retry_connect_dt = lambda: None
+
+        mgr.add(link)
+        mgr.add_poll(timed)
+        assert mgr.active() == 1
+
+        b.send(b"hello")
+        link.write(b"world")
+        timed.add(time.time() + 0.1, link.close)
+        mgr.run(time_out=5)
+
+        assert link.reads == [b"hello"]
+        assert b.recv(100) == b"world"
+        assert link.num_poll > 0
+        assert mgr.active() == 0
+        b.close()
+        mgr.close()
+
+    #-----------------------------------------------------------------------
+    def test_connect(self):
+        mgr = IM.network.AsyncManager()
+        timed = IM.network.TimedCall()
+        a, b = socket.socketpair()
+        link = SockLink(a, connect_ok=False)
+        connected = []
+
+        def on_connected(link, is_connected):
+            connected.append(is_connected)
+            if is_connected:
+                link.retry_connect_dt = lambda: None
+                link.close()
+
+        link.signal_connected.connect(on_connected)
+
+        # The connection is retried until it works.
+        mgr.add(link, connected=False)
+        mgr.add_poll(timed)
+        timed.add(time.time() + 0.05, setattr, link, "connect_ok", True)
+        mgr.run(time_out=5)
+
+        assert connected == [True, False]
+        b.close()
+        mgr.close()
+
+    #-----------------------------------------------------------------------
+    def test_deadline(self):
+        mgr = IM.network.AsyncManager()
+        timed = IM.network.TimedCall()
+        a, b = socket.socketpair()
+        link = SockLink(a)
+        link.retry_connect_dt = lambda: None
+        mgr.add(link)
+        mgr.add_poll(timed)
+        late = []
+
+        def call(sched_time):
+            late.append(time.time() - sched_time)
+            if len(late) == 3:
+                link.close()
+            else:
+                t = time.time() + 0.02
+                timed.add(t, call, t)
+
+        # The timed calls run on time even with a long poll time out.
+        t0 = time.time() + 0.02
+        timed.add(t0, call, t0)
+        mgr.run(time_out=5)
+
+        assert len(late) == 3
+        assert max(late) < 0.5
+        b.close()
+        mgr.close()
+
+    #-----------------------------------------------------------------------
+    def test_close(self):
+        # The manager closes the loop it created.
+        mgr = IM.network.AsyncManager()
+        mgr.close()
+        assert mgr.loop.is_closed()
+        mgr.close()
+
+        # A loop that was passed in is left open.
+        loop = asyncio.SelectorEventLoop()
+        mgr = IM.network.AsyncManager(loop)
+        mgr.close()
+        assert not loop.is_closed()
+        loop.close()
+
+    #-----------------------------------------------------------------------
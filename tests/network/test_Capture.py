@@ -0,0 +1,59 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/Capture.py
+#
+#===========================================================================
+import pytest
+import insteon_mqtt as IM
+from insteon_mqtt.network.Capture import MAGIC, READ, WRITE, read_capture
+
+
+class MockLink:
+    def __init__(self):
+        self.signal_read = IM.Signal()
+        self.signal_wrote = IM.Signal()
+
+
+#===========================================================================
+class Test_Capture:
+    #-----------------------------------------------------------------------
+    def test_record(self, tmpdir):
+        path = str(tmpdir.join("plm.cap"))
+        link = MockLink()
+        capture = IM.network.Capture(link, path)
+
+        link.signal_read.emit(link, b"\x02\x50\x01")
+        link.signal_wrote.emit(link, b"\x02\x62")
+        link.signal_read.emit(link, b"")
+        capture.close()
+        capture.close()
+
+        # Nothing is recorded after closing.
+        link.signal_read.emit(link, b"\x02")
+
+        records = read_capture(path)
+        assert [i[1:] for i in records] == [(READ, b"\x02\x50\x01"),
+                                            (WRITE, b"\x02\x62"),
+                                            (READ, b"")]
+
+        # Time stamps are relative to the start and increasing.
+        times = [i[0] for i in records]
+        assert times == sorted(times)
+        assert 0 <= times[0] < 1
+
+    #-----------------------------------------------------------------------
+    def test_bad_file(self, tmpdir):
+        path = tmpdir.join("bad.cap")
+        path.write_binary(b"junk")
+        with pytest.raises(ValueError):
+            read_capture(str(path))
+
+        path.write_binary(MAGIC + b"\x00\x00")
+        with pytest.raises(ValueError):
+            read_capture(str(path))
+
+        path.write_binary(MAGIC + b"\x00\x00\x00\x00\x00\x05\x00\x01")
+        with pytest.raises(ValueError):
+            read_capture(str(path))
+
+    #-----------------------------------------------------------------------
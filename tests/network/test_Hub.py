@@ -39,7 +39,7 @@ BUFFSTATUS = b"""
 <BS>190006025C3B98C14B759823190002625058200519000602505058204B75982618000262221A9A1F2E02000000000000000000000000929606025C221A9A4B7598232E02027F0206027F0006027F0206027F00060006027F0206027F000602623B98C105A8</BS>
 </response>"""
 
-ORDEREDSTRING = "0006027F0206027F000602623B98C105190006025C3B98C14B759823190002625058200519000602505058204B75982618000262221A9A1F2E02000000000000000000000000929606025C221A9A4B7598232E02027F0206027F0006027F0206027F0006"
+RING = b"190006025C3B98C14B759823190002625058200519000602505058204B75982618000262221A9A1F2E02000000000000000000000000929606025C221A9A4B7598232E02027F0206027F0006027F0206027F00060006027F0206027F000602623B98C105"
 
 class Test_Hub:
     def test_config(self, test_hub):
@@ -67,14 +67,59 @@ class Test_Hub:
             test_hub.poll(time.time())
             assert test_hub.client is not None
 
+    #-----------------------------------------------------------------------
+    def test_next_poll_time(self, test_hub):
+        assert test_hub.next_poll_time(10) == 10
+        with patch.object(threading, 'Thread'):
+            test_hub.poll(10)
+
+        # Follows the client read rate.
+        test_hub.client.poll_interval = 0.5
+        assert test_hub.next_poll_time(10) == 10.5
+
+        test_hub.write(bytes([0x02]), lambda: 10.2)
+        assert test_hub.next_poll_time(10) == 10.2
+
+        test_hub.set_busy(True)
+        assert test_hub.client.busy is True
+
+    #-----------------------------------------------------------------------
+    def test_wake(self, test_hub):
+        mgr = IM.network.Manager()
+        read = []
+
+        def on_read(link, data):
+            read.append(data)
+
+        test_hub.signal_read.connect(on_read)
+        with patch.object(threading, 'Thread'):
+            mgr.add(test_hub, connected=False)
+            mgr.select(time_out=0)
+        assert test_hub.client.wake_fd is not None
+
+        # Only writes have deadlines so the loop can block.
+        assert test_hub.next_poll_time(10) is None
+
+        # Data from the client thread wakes the loop up.
+        test_hub.client._put_read(bytes([0x01]))
+        test_hub.client._put_read(bytes([0x02]))
+        t0 = time.time()
+        mgr.select(time_out=5)
+        assert time.time() - t0 < 1
+        assert read == [bytes([0x01, 0x02])]
+
+        test_hub.close()
+        assert mgr.active() == 0
+        assert test_hub._wake_fds is None
+
     #-----------------------------------------------------------------------
     @pytest.mark.parametrize("read,expected,calls", [
         (None, None, 0),
         (bytes([0x01]), bytes([0x01]), 1)
     ])
-    def test_read(self, test_hub, read, expected, calls):
+    def test_read(self, test_hub, read, expected, calls, monkeypatch):
         # necessary to stop client from running
-        threading.Thread = mock.Mock()
+        monkeypatch.setattr(threading, 'Thread', mock.Mock())
         with patch.object(test_hub.signal_read, 'emit'):
             test_hub.poll(time.time())
             if read is not None:
@@ -91,9 +136,10 @@ class Test_Hub:
         (bytes([0x00]), time.time(), bytes([0x00]), 0, 1),
         (bytes([0x00]), time.time() + 10, None, 1, 0),
     ])
-    def test_write(self, test_hub, write, t, expected, buffer, calls):
+    def test_write(self, test_hub, write, t, expected, buffer, calls,
+                   monkeypatch):
         # necessary to stop client from running
-        threading.Thread = mock.Mock()
+        monkeypatch.setattr(threading, 'Thread', mock.Mock())
         with mock.patch.object(test_hub.signal_wrote, 'emit'):
             test_hub.poll(time.time())
             mock.patch.object(test_hub.client, 'write')
@@ -109,9 +155,9 @@ class Test_Hub:
                 assert args_list[0][0][1] == expected
 
     #-----------------------------------------------------------------------
-    def test_close(self, test_hub):
+    def test_close(self, test_hub, monkeypatch):
         # necessary to stop client from running
-        threading.Thread = mock.Mock()
+        monkeypatch.setattr(threading, 'Thread', mock.Mock())
         with mock.patch.object(test_hub.signal_closing, 'emit'):
             # Starts the HubClient
             test_hub.poll(time.time())
@@ -132,7 +178,7 @@ class Test_HubClient:
         test_response = Response()
         test_response.status_code = 200
         test_response._content = BUFFSTATUS
-        with patch.object(requests, 'get', return_value=test_response):
+        with patch.object(requests.Session, 'get', return_value=test_response):
             response = test_hubclient._get_hub_buffer()
             assert response
 
@@ -140,7 +186,7 @@ class Test_HubClient:
         test_response = Response()
         test_response.status_code = 200
         test_response._content = BUFFSTATUS
-        with patch.object(requests, 'get', side_effect=requests.exceptions.Timeout):
+        with patch.object(requests.Session, 'get', side_effect=requests.exceptions.Timeout):
             response = test_hubclient._get_hub_buffer()
             assert test_hubclient.read_timeout_count == 1
             assert not response
@@ -150,39 +196,145 @@ class Test_HubClient:
         test_response.status_code = 200
         test_response._content = BUFFSTATUS
         test_hubclient.read_timeout_count = 6
-        with patch.object(requests, 'get', side_effect=requests.exceptions.Timeout):
+        with patch.object(requests.Session, 'get', side_effect=requests.exceptions.Timeout):
             response = test_hubclient._get_hub_buffer()
             assert test_hubclient.read_timeout_count == 0
 
     def test_parse_buffer(self, test_hubclient):
-        test_response = Response()
-        test_response.status_code = 200
-        test_response._content = BUFFSTATUS
-        (bytestring, byte_end) = test_hubclient._parse_buffer(test_response)
-        assert bytestring == ORDEREDSTRING
+        (ring, byte_end) = test_hubclient._parse_buffer(BUFFSTATUS)
+        assert ring == RING
+        assert len(ring) == 200
         assert byte_end == 168
 
-    @pytest.mark.parametrize("bytestring,byte_end,expected,prev_str,prev_end", [
-        (ORDEREDSTRING, 168, None, '', 0),
-        (ORDEREDSTRING, 168, '0206027F0006', '7F0006027F', 156),
+    @pytest.mark.parametrize("content", [
+        b"", b"<response></response>", b"<BS>A</BS>", b"<BS>00ZZ</BS>",
+        b"<BS>00FF</BS>",
+    ])
+    def test_parse_buffer_invalid(self, test_hubclient, content):
+        assert test_hubclient._parse_buffer(content) == (None, -1)
+
+    @pytest.mark.parametrize("ring,byte_end,expected,prev_str,prev_end", [
+        (RING, 168, None, None, 0),
+        (RING, 168, bytes.fromhex('0206027F0006'), b'7F0006027F', 156),
+        (RING, 156, None, b'7F0006027F', 156),
     ])
-    def test_parse_bytes(self, test_hubclient, bytestring, byte_end, expected,
+    def test_parse_bytes(self, test_hubclient, ring, byte_end, expected,
                          prev_str, prev_end):
         test_hubclient._prev_bytestring = prev_str
         test_hubclient._prev_byte_end = prev_end
-        ret = test_hubclient._parse_bytes(bytestring, byte_end)
+        ret = test_hubclient._parse_bytes(ring, byte_end)
         assert ret == expected
 
+    def test_parse_bytes_wrap(self, test_hubclient):
+        # New data that wraps around the end of the ring.
+        ring = b'5566' + b'0' * 182 + b'AABBCCDDEE' + b'1122'
+        test_hubclient._prev_bytestring = b'AABBCCDDEE'
+        test_hubclient._prev_byte_end = 196
+        ret = test_hubclient._parse_bytes(ring, 4)
+        assert ret == bytes.fromhex('11225566')
+        assert test_hubclient._prev_bytestring == b'EE11225566'
+        assert test_hubclient._prev_byte_end == 4
+
     def test_perform_write(self, test_hubclient):
-        with patch.object(requests, 'get'):
+        with patch.object(requests.Session, 'get'):
             test_hubclient.write(bytes([0x02,0x06]))
             test_hubclient._perform_write()
-            args = requests.get.call_args
+            args = requests.Session.get.call_args
             assert args[0][0] == 'http://192.168.1.1:25105/3?0206=I=3'
 
     def test_perform_write_timeout(self, test_hubclient):
-        with patch.object(requests, 'get', side_effect=requests.exceptions.Timeout):
+        with patch.object(requests.Session, 'get', side_effect=requests.exceptions.Timeout):
             test_hubclient.write(bytes([0x02,0x06]))
             test_hubclient._perform_write()
-            args = requests.get.call_args
+            args = requests.Session.get.call_args
             assert args[0][0] == 'http://192.168.1.1:25105/3?0206=I=3'
+
+    def test_session_reuse(self, test_hubclient):
+        test_response = Response()
+        test_response.status_code = 200
+        test_response._content = BUFFSTATUS
+        with patch.object(requests.Session, 'get', return_value=test_response):
+            test_hubclient._get_hub_buffer()
+            session = test_hubclient.session
+            test_hubclient._get_hub_buffer()
+            assert test_hubclient.session is session
+            assert session.auth.username == 'user'
+
+        stats = test_hubclient.stats.to_dict()
+        assert stats["counters"]["hub_sessions"] == 1
+        assert stats["histograms"]["hub_read_time"]["count"] == 2
+
+    def test_session_reset(self, test_hubclient):
+        with patch.object(requests.Session, 'get',
+                          side_effect=requests.exceptions.ConnectionError):
+            response = test_hubclient._get_hub_buffer()
+            assert not response
+            assert test_hubclient.session is None
+
+            test_hubclient.write(bytes([0x02,0x06]))
+            test_hubclient._perform_write()
+            assert test_hubclient.session is None
+
+        stats = test_hubclient.stats.to_dict()
+        assert stats["counters"]["hub_sessions"] == 2
+        assert stats["counters"]["hub_read_errors"] == 1
+        assert stats["counters"]["hub_write_errors"] == 1
+
+    def test_poll_interval(self, test_hubclient):
+        busy = HubClient.busy_poll_interval
+        test_hubclient._update_poll_interval(True)
+        assert test_hubclient.poll_interval == busy
+
+        # Backs off when idle up to the idle interval.
+        for i in range(20):
+            test_hubclient._update_poll_interval(False)
+        assert test_hubclient.poll_interval == HubClient.idle_poll_interval
+
+        test_hubclient.busy = True
+        test_hubclient._update_poll_interval(False)
+        assert test_hubclient.poll_interval == busy
+
+    def test_poll_interval_overflow(self, test_hubclient):
+        test_hubclient._prev_bytestring = b'FFFFFFFFFF'
+        test_hubclient._prev_byte_end = 156
+        ret = test_hubclient._parse_bytes(RING, 168)
+        assert ret is None
+
+        # The overflow lowers the idle interval.
+        assert test_hubclient.max_poll_interval == \
+            HubClient.idle_poll_interval / 2
+        stats = test_hubclient.stats.to_dict()
+        assert stats["counters"]["hub_overflows"] == 1
+        for i in range(20):
+            test_hubclient._update_poll_interval(False)
+        assert test_hubclient.poll_interval == \
+            HubClient.idle_poll_interval / 2
+
+    def test_write_wake(self, test_hubclient):
+        assert not test_hubclient._wake.is_set()
+        test_hubclient.write(bytes([0x02, 0x06]))
+        assert test_hubclient._wake.is_set()
+
+    def test_thread_wake(self, test_hubclient, monkeypatch):
+        client = test_hubclient
+        response = mock.MagicMock(content=BUFFSTATUS)
+        monkeypatch.setattr(client, "_get_hub_buffer", lambda: response)
+        client.busy_poll_interval = 5
+        client.max_poll_interval = 5
+
+        # A write queued after the writes were checked ends the sleep so
+        # it's sent right away.
+        written = []
+        def perform_write():
+            if client._write_queue.empty():
+                client.write(bytes([0x02, 0x06]))
+                return False
+            written.append(client._write_queue.get())
+            client.close()
+            return True
+
+        monkeypatch.setattr(client, "_perform_write", perform_write)
+        start = time.time()
+        client._thread()
+        assert written == [bytes([0x02, 0x06])]
+        assert time.time() - start < 1
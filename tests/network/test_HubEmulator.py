@@ -0,0 +1,103 @@
+#===========================================================================
+#
+# Tests for: tests/util/helpers/hub.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import threading
+import time
+from unittest import mock
+import pytest
+import requests
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+import helpers as H
+from insteon_mqtt.network.Hub import HubClient
+
+
+@pytest.fixture
+def hub():
+    emulator = H.hub.HubEmulator().start()
+    yield emulator
+    emulator.stop()
+
+
+#===========================================================================
+class Test_HubEmulator:
+    #-----------------------------------------------------------------------
+    def test_requests(self, hub):
+        url = "http://127.0.0.1:%d" % hub.port
+        auth = ("user", "password")
+
+        r = requests.get(url + "/buffstatus.xml", auth=("user", "bad"),
+                         timeout=5)
+        assert r.status_code == 401
+        assert hub.num_auth_errors == 1
+
+        r = requests.get(url + "/buffstatus.xml", auth=auth, timeout=5)
+        assert r.status_code == 200
+        assert r.content == b"<response><BS>" + b"0" * 200 + \
+            b"00</BS></response>"
+
+        # Modem info request - the reply goes in the ring buffer.
+        r = requests.get(url + "/3?0260=I=3", auth=auth, timeout=5)
+        assert r.status_code == 200
+        r = requests.get(url + "/buffstatus.xml", auth=auth, timeout=5)
+        assert r.content.startswith(b"<response><BS>0260448511")
+        assert r.content.endswith(b"12</BS></response>")
+        assert hub.num_writes == 1
+        assert hub.num_reads == 2
+
+        r = requests.get(url + "/3?ZZ=I=3", auth=auth, timeout=5)
+        assert r.status_code == 400
+        r = requests.get(url + "/bad", auth=auth, timeout=5)
+        assert r.status_code == 404
+
+    #-----------------------------------------------------------------------
+    def test_overflow(self):
+        hub = H.hub.HubEmulator(buff_length=40)
+        hub.sim.add_device("aa.bb.cc")
+        with mock.patch.object(threading, 'Thread'):
+            client = HubClient("127.0.0.1", 0, "user", "password")
+
+        hub.buffstatus()
+        hub.sim.broadcast("aa.bb.cc", t=0)
+        hub.sim.poll(100)
+
+        # The broadcasts are more than the ring holds.
+        ring, end = client._parse_buffer(hub.buffstatus())
+        assert len(ring) == 40
+        assert hub.num_overflows == 1
+
+        hub.buffstatus()
+        assert hub.num_overflows == 1
+        hub.server.server_close()
+
+    #-----------------------------------------------------------------------
+    def test_hub_link(self, hub):
+        hub.sim.add_device("aa.bb.cc", "dimmer")
+        mgr = IM.network.Manager()
+        link = IM.network.Hub("127.0.0.1", hub.port, "user", "password")
+        proto = IM.Protocol(link)
+        mgr.add(link, connected=False)
+        done = []
+
+        def callback(msg, on_done):
+            on_done(True, "done", None)
+
+        def on_done(success, msg, data):
+            done.append(success)
+
+        addr = IM.Address("aa.bb.cc")
+        msg = Msg.OutStandard.direct(addr, 0x11, 0xff)
+        proto.send(msg, IM.handler.StandardCmd(msg, callback, on_done))
+
+        t0 = time.time()
+        while not done and time.time() - t0 < 5:
+            mgr.select(time_out=0.1)
+
+        link.close()
+        assert done == [True]
+        assert hub.sim.devices[addr.id].level == 0xff
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,119 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/LoopMonitor.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import threading
+import time
+import pytest
+import insteon_mqtt as IM
+
+
+@pytest.fixture
+def monitor():
+    monitor = IM.network.LoopMonitor(slow_time=0.05)
+    yield monitor
+    monitor.stop()
+
+
+def slow_func(dt):
+    time.sleep(dt)
+    return dt
+
+
+#===========================================================================
+class Test_LoopMonitor:
+    #-----------------------------------------------------------------------
+    def test_call(self, monitor, caplog):
+        assert monitor.call(slow_func, 0) == 0
+        assert "slow_calls" not in monitor.stats.counters
+
+        assert monitor.call(slow_func, 0.06) == 0.06
+        assert monitor.stats.counters["slow_calls"] == 1
+        assert "Slow event loop call slow_func took" in caplog.text
+        assert not monitor._calls
+
+        # Exceptions are passed through.
+        with pytest.raises(ZeroDivisionError):
+            monitor.call(lambda: 1 / 0)
+        assert not monitor._calls
+
+    #-----------------------------------------------------------------------
+    def test_nested(self, monitor, caplog):
+        def outer():
+            return monitor.call(slow_func, 0.06)
+
+        # Only the innermost slow call is logged.
+        monitor.call(outer)
+        assert monitor.stats.counters["slow_calls"] == 2
+        assert caplog.text.count("Slow event loop call") == 1
+        assert "slow_func" in caplog.text
+
+    #-----------------------------------------------------------------------
+    def test_thread(self, monitor):
+        # Calls from other threads aren't timed.
+        thread = threading.Thread(target=monitor.call, args=(slow_func, 0.06))
+        thread.start()
+        thread.join()
+        assert "slow_calls" not in monitor.stats.counters
+
+    #-----------------------------------------------------------------------
+    def test_stack(self, monitor, caplog):
+        signal = IM.Signal()
+        calls = []
+
+        def slot(value):
+            calls.append(value)
+            time.sleep(0.2)
+
+        signal.connect(slot)
+
+        # Signal slots are timed once the monitor is started.
+        monitor.start()
+        assert IM.Signal.monitor is monitor
+        signal.emit(5)
+        assert calls == [5]
+        assert "Slow event loop call " in caplog.text
+        assert "slot took" in caplog.text
+        assert "time.sleep(0.2)" in caplog.text
+
+        monitor.stop()
+        assert IM.Signal.monitor is None
+        assert monitor._thread is None
+
+    #-----------------------------------------------------------------------
+    def test_manager(self, monitor, caplog):
+        mgr = IM.network.Manager(monitor=monitor)
+        timed = IM.network.TimedCall()
+        mgr.add_poll(timed)
+
+        mgr.select(time_out=0)
+        assert monitor.stats.histograms["loop_lag"].count == 1
+        assert monitor.stats.histograms["loop_time"].count == 1
+
+        # A slow timed call is logged with the link and makes the next
+        # deadline late.
+        timed.add(time.time(), slow_func, 0.06)
+        timed.add(time.time() + 0.01, print)
+        mgr.select(time_out=0)
+        assert "TimedCall.poll" in caplog.text
+        mgr.select(time_out=0)
+        assert monitor.percentiles()["max"] >= 0.04
+
+        data = monitor.to_dict()
+        assert data["counters"]["slow_calls"] == 1
+        assert data["histograms"]["loop_lag"]["count"] == 3
+        assert set(data["lag_percentiles"]) == {"p50", "p90", "p99", "max"}
+
+    #-----------------------------------------------------------------------
+    def test_percentiles(self, monitor):
+        assert monitor.percentiles() == {}
+
+        for i in range(101):
+            monitor.iteration(i / 100, 0)
+
+        assert monitor.percentiles() == {"p50" : 0.5, "p90" : 0.9,
+                                         "p99" : 0.99, "max" : 1.0}
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,233 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/Mqtt.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import socket
+import sys
+import time
+import pytest
+import insteon_mqtt as IM
+
+
+@pytest.fixture
+def server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1)
+    yield sock
+    sock.close()
+
+
+def read_packets(conn, num):
+    # Returns the MQTT packet types of num packets read from the socket.
+    conn.settimeout(2)
+    buf = b""
+    types = []
+    while len(types) < num:
+        buf += conn.recv(4096)
+        while len(buf) >= 2:
+            # Remaining length is a 7 bit varint.
+            size, shift, i = 0, 0, 1
+            while buf[i] & 0x80:
+                size += (buf[i] & 0x7f) << shift
+                shift += 7
+                i += 1
+            size += buf[i] << shift
+            end = i + 1 + size
+            if len(buf) < end:
+                break
+            types.append(buf[0] >> 4)
+            buf = buf[end:]
+    return types
+
+
+def connect(mgr, link, server):
+    mgr.add(link, connected=False)
+    mgr.select(time_out=0)
+    conn = server.accept()[0]
+    run(mgr, lambda: link.stats.counters.get("writes"))
+    assert read_packets(conn, 1) == [1]
+    conn.send(b"\x20\x02\x00\x00")
+    run(mgr, lambda: link.connected)
+    return conn
+
+
+def run(mgr, check, time_out=2):
+    t0 = time.time()
+    while not check() and time.time() - t0 < time_out:
+        mgr.select(time_out=0.05)
+    assert check()
+
+
+#===========================================================================
+class Test_Mqtt:
+    #-----------------------------------------------------------------------
+    def test_connect(self, server):
+        mgr = IM.network.Manager()
+        link = IM.network.Mqtt("127.0.0.1", server.getsockname()[1])
+        mgr.add(link, connected=False)
+
+        # The connection is started without waiting for it.
+        mgr.select(time_out=0)
+        assert link._sock is not None
+        assert len(mgr.links) == 1
+        conn = server.accept()[0]
+
+        # Once the socket is writable, the client sends the connect message.
+        run(mgr, lambda: link._sock is None)
+        run(mgr, lambda: link.stats.counters.get("writes"))
+        conn.settimeout(2)
+        assert conn.recv(100)[0] == 0x10
+
+        # Connection ack.
+        link._retry_dt = 8
+        conn.send(b"\x20\x02\x00\x00")
+        run(mgr, lambda: link.connected)
+        assert link._retry_dt == 1
+
+        conn.close()
+        run(mgr, lambda: not mgr.links)
+
+    #-----------------------------------------------------------------------
+    def test_paho_socket(self, server):
+        link = IM.network.Mqtt("127.0.0.1", server.getsockname()[1])
+        link._sock = socket.create_connection(server.getsockname())
+        conn = server.accept()[0]
+
+        # The installed paho reconnect() uses the connected socket instead of
+        # opening another connection.
+        assert link._finish_connect()
+        assert link.client.socket() is link._send_buf
+        server.settimeout(0.1)
+        with pytest.raises(socket.timeout):
+            server.accept()
+
+        link.write_to_link(time.time())
+        assert read_packets(conn, 1) == [1]
+        link.close()
+        conn.close()
+
+    #-----------------------------------------------------------------------
+    def test_paho_old(self, server, monkeypatch, caplog):
+        link = IM.network.Mqtt("127.0.0.1", server.getsockname()[1])
+        link._sock = socket.create_connection(server.getsockname())
+        link._fd = link._sock.fileno()
+        monkeypatch.delattr(type(link.client), "_create_socket_connection")
+
+        # paho versions without the socket hook are an error.
+        assert not link._finish_connect()
+        assert "requires paho-mqtt 1.6.0" in caplog.text
+        assert link._sock is None
+
+    #-----------------------------------------------------------------------
+    @pytest.mark.parametrize("attr,value", [("_ssl", True),
+                                            ("_transport", "websockets")])
+    def test_paho_tls(self, server, monkeypatch, caplog, attr, value):
+        link = IM.network.Mqtt("127.0.0.1", server.getsockname()[1])
+        link._sock = socket.create_connection(server.getsockname())
+        link._fd = link._sock.fileno()
+        monkeypatch.setattr(link.client, attr, value)
+
+        # TLS and websocket clients are an error.
+        assert not link._finish_connect()
+        assert "doesn't support TLS or websockets" in caplog.text
+        assert link._sock is None
+
+    #-----------------------------------------------------------------------
+    def test_refused(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        mgr = IM.network.Manager()
+        link = IM.network.Mqtt("127.0.0.1", port, reconnect_dt=4)
+        mgr.add(link, connected=False)
+        mgr.select(time_out=0)
+        run(mgr, lambda: not mgr.links)
+
+        # The link is scheduled to reconnect with a backoff.
+        assert len(mgr.unconnected) == 1
+        assert link._fd is None
+        assert link.retry_connect_dt() == 2
+        assert link.retry_connect_dt() == 4
+        assert link.retry_connect_dt() == 4
+
+    #-----------------------------------------------------------------------
+    def test_timeout(self, server):
+        mgr = IM.network.Manager()
+        link = IM.network.Mqtt("127.0.0.1", server.getsockname()[1])
+        mgr.add(link, connected=False)
+        mgr.select(time_out=0)
+        assert len(mgr.links) == 1
+
+        deadline = link._connect_time + link.connect_timeout
+        assert link.next_poll_time(time.time()) == deadline
+
+        link.poll(deadline - 1)
+        assert len(mgr.links) == 1
+        link.poll(deadline + 1)
+        assert not mgr.links
+        assert link._sock is None
+
+    #-----------------------------------------------------------------------
+    def test_resolve(self, server):
+        link = IM.network.Mqtt("localhost", server.getsockname()[1])
+
+        # Host names are resolved in a thread.
+        assert link.connect() is False
+        assert link.retry_connect_dt() == link.resolve_dt
+        link._resolver.join()
+        assert link.connect() is True
+        link.close()
+
+        link = IM.network.Mqtt("bad host name.invalid")
+        assert link.connect() is False
+        link._resolver.join()
+        assert link.connect() is False
+        assert link.retry_connect_dt() == 1
+
+    #-----------------------------------------------------------------------
+    def test_publish(self, server):
+        mgr = IM.network.Manager()
+        link = IM.network.Mqtt("127.0.0.1", server.getsockname()[1])
+        conn = connect(mgr, link, server)
+        fd = link.fileno()
+        writes = link.stats.counters["writes"]
+
+        # Publishing only queues the messages.
+        for i in range(20):
+            link.publish("insteon/%d/state" % i, "on")
+        assert link.stats.counters["writes"] == writes
+        assert link.stats.counters["publishes"] == 20
+        assert mgr.masks[fd] == mgr.READ_WRITE
+
+        # All of them are written with one send.
+        mgr.select(time_out=1)
+        assert link.stats.counters["writes"] == writes + 1
+        assert mgr.masks[fd] == mgr.READ
+        assert read_packets(conn, 20) == [3] * 20
+
+        # The disconnect message is written before the socket is closed.
+        link.close()
+        run(mgr, lambda: not mgr.links)
+        assert read_packets(conn, 1) == [14]
+        conn.close()
+
+    #-----------------------------------------------------------------------
+    def test_close_backed_up(self, caplog):
+        send_buf_class = sys.modules["insteon_mqtt.network.Mqtt"]._SendBuffer
+        sock, peer = socket.socketpair()
+        sock.setblocking(False)
+        send_buf = send_buf_class(sock)
+
+        # What the socket can't take when it's closed is dropped and logged.
+        send_buf.send(bytes(10000000))
+        send_buf.close()
+        assert "MQTT socket closed with" in caplog.text
+        assert not send_buf.buf
+        peer.close()
+
+    #-----------------------------------------------------------------------
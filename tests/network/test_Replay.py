@@ -0,0 +1,99 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/Replay.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+from insteon_mqtt.network.Capture import MAGIC, RECORD, READ, WRITE
+
+
+def write_capture(path, records):
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for dt, direction, data in records:
+            f.write(RECORD.pack(int(dt * 1e6), direction, len(data)))
+            f.write(data)
+
+
+#===========================================================================
+class Test_Replay:
+    #-----------------------------------------------------------------------
+    def test_play(self, tmpdir):
+        path = str(tmpdir.join("plm.cap"))
+        write_capture(path, [(0, READ, b"\x01"), (1, WRITE, b"\x02"),
+                             (1, READ, b"\x03"), (2, READ, b"\x04")])
+
+        link = IM.network.Replay(path, speed=2)
+        reads = []
+
+        def read(link, data):
+            reads.append(data)
+
+        link.signal_read.connect(read)
+        assert not link.is_finished
+
+        # Recorded writes are skipped and the times are scaled by speed.
+        assert link.next_poll_time(99) == 99
+        link.poll(100)
+        assert reads == [b"\x01"]
+        assert link.next_poll_time(100) == 101
+        link.poll(100.5)
+        assert reads == [b"\x01"]
+        link.poll(101)
+        assert reads == [b"\x01", b"\x03"]
+        link.poll(102)
+        assert reads == [b"\x01", b"\x03", b"\x04"]
+        assert link.is_finished
+        assert link.next_poll_time(102) is None
+        assert link.num_read == 3
+
+        # Loading from the config restarts and speed 0 plays everything.
+        link.load_config({'replay' : path, 'replay_speed' : 0})
+        link.poll(0)
+        assert len(reads) == 6
+
+    #-----------------------------------------------------------------------
+    def test_manager(self, tmpdir):
+        path = str(tmpdir.join("plm.cap"))
+        write_capture(path, [(0, READ, b"\x01")])
+        link = IM.network.Replay(path, speed=0)
+        assert isinstance(link, IM.network.PollLink)
+        assert link.fileno() is None
+
+        # Polling only links are removed from the manager when closed.
+        mgr = IM.network.Manager()
+        mgr.add_poll(link)
+        mgr.select(time_out=0)
+        assert link.is_finished
+        link.close()
+        assert mgr.poll_links == []
+
+    #-----------------------------------------------------------------------
+    def test_protocol(self, tmpdir):
+        path = str(tmpdir.join("plm.cap"))
+        addr = IM.Address('0a.12.33')
+        msg = Msg.OutStandard.direct(addr, 0x11, 0xff)
+        reply = bytes([0x02, 0x50, 0x0a, 0x12, 0x33, 0x44, 0x85, 0x11,
+                       0x2b, 0x11, 0xff])
+        write_capture(path, [(0, READ, msg.to_bytes() + b"\x06"),
+                             (0.1, READ, reply)])
+
+        link = IM.network.Replay(path, speed=0)
+        proto = IM.Protocol(link)
+        handler = IM.handler.StandardCmd(msg, lambda *x, **y: None)
+        proto.send(msg, handler)
+        assert proto._write_queue.head is not None
+
+        # Protocol polls the link which reports the write and then plays
+        # the replies which finish the message.
+        proto._poll(0)
+        assert link.num_written == len(msg.to_bytes())
+        assert proto._write_queue.head is None
+        assert proto.stats.counters["finished"] == 1
+
+        link.close()
+        assert link.is_finished
+
+    #-----------------------------------------------------------------------
@@ -3,6 +3,7 @@
 # Tests for: insteont_mqtt/network/Serial.py
 #
 #===========================================================================
+import os
 import time
 import serial
 import pytest
@@ -88,3 +89,123 @@ class Test_Serial():
         t = time.time()
         test_device.write_to_link(t)
         assert "Serial write error" in caplog.text
+
+    def test_write_to_link_drain(self, test_device):
+        msg_time = time.time()
+        def call_time():
+            return msg_time
+        def later():
+            return msg_time + 5
+        test_device._write_buf.append((bytes(2), call_time))
+        test_device._write_buf.append((bytes(3), call_time))
+        test_device._write_buf.append((bytes(4), later))
+        t = time.time()
+        with patch.object(test_device.signal_wrote, 'emit') as wrote_emit:
+            # Writes everything that is allowed in one call.
+            test_device.write_to_link(t)
+            assert test_device.client.written == [bytes(2), bytes(3)]
+            assert wrote_emit.call_count == 2
+            assert len(test_device._write_buf) == 1
+            assert test_device.stats.counters["writes"] == 2
+
+            with patch.object(test_device.signal_needs_write,
+                              'emit') as needs_emit:
+                test_device.write_to_link(msg_time + 5)
+                needs_emit.assert_called_once_with(test_device, False)
+            assert test_device.client.written[-1] == bytes(4)
+
+    def test_write_queue_full(self, test_device, monkeypatch, caplog):
+        monkeypatch.setattr(IM_Serial, 'max_write_queue', 2)
+        for i in range(4):
+            test_device.write(bytes([i]), time.time)
+
+        # The oldest packets are dropped and counted.
+        assert [i[0] for i in test_device._write_buf] == [bytes([2]),
+                                                          bytes([3])]
+        assert test_device.stats.counters["write_dropped"] == 2
+        assert "Serial write queue full" in caplog.text
+
+    def test_read_from_link(self, test_device):
+        def readinto(buf):
+            buf[:3] = b"\x02\x50\x01"
+            return 3
+        test_device.client.readinto = readinto
+        read = []
+
+        def on_read(link, data):
+            read.append(bytes(data))
+
+        test_device.signal_read.connect(on_read)
+        assert test_device.read_from_link() == 3
+        assert read == [b"\x02\x50\x01"]
+        assert test_device.stats.counters["read_bytes"] == 3
+
+    def test_read_from_link_direct(self):
+        master, slave = os.openpty()
+        device = IM_Serial()
+        device.load_config({'port': os.ttyname(slave)})
+        assert device.connect()
+        assert device._read_direct
+        read = []
+
+        def on_read(link, data):
+            # The data is a view of the reused read buffer.
+            assert isinstance(data, memoryview)
+            read.append(bytes(data))
+
+        device.signal_read.connect(on_read)
+        os.write(master, b"\x02\x60")
+        assert device.read_from_link() == 2
+        os.write(master, b"\x06")
+        assert device.read_from_link() == 1
+        assert read == [b"\x02\x60", b"\x06"]
+        assert device.stats.counters["reads"] == 2
+
+        # No data when the port was readable means it was disconnected.
+        assert device.read_from_link() == -1
+        assert device._fd is None
+        os.close(master)
+        os.close(slave)
+
+    def test_disconnect_manager(self):
+        # A disconnected pty reports an error and a hang up to poll.
+        master, slave = os.openpty()
+        device = IM_Serial(reconnect_dt=10)
+        device.load_config({'port': os.ttyname(slave)})
+        assert device.connect()
+        fd = device.fileno()
+
+        closed = []
+
+        def on_connected(link, connected):
+            closed.append(connected)
+
+        device.signal_connected.connect(on_connected)
+        mgr = IM.network.Manager()
+        mgr.add(device)
+        os.close(master)
+        mgr.select(time_out=1)
+
+        # The link is removed and scheduled to reconnect.
+        assert closed == [True, False]
+        assert fd not in mgr.links
+        assert fd not in mgr.masks
+        assert mgr.unconnected[0][0] is device
+        os.close(slave)
+
+    def test_disconnect_read(self, test_device):
+        # A read of no data after poll reports the port as readable.
+        read_fd, write_fd = os.pipe()
+        test_device.client.close = mock.Mock()
+        test_device._fd = read_fd
+        test_device._read_direct = True
+
+        mgr = IM.network.Manager()
+        mgr.add(test_device)
+        os.close(write_fd)
+        mgr.select(time_out=1)
+
+        test_device.client.close.assert_called_once_with()
+        assert read_fd not in mgr.links
+        assert mgr.unconnected[0][0] is test_device
+        os.close(read_fd)
@@ -0,0 +1,153 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/Simulator.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import time
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+
+
+def run(proto, t, dt=0.05, num=200):
+    for i in range(num):
+        t += dt
+        proto._poll(t)
+    return t
+
+
+#===========================================================================
+class Test_Simulator:
+    #-----------------------------------------------------------------------
+    def test_config(self):
+        sim = IM.network.Simulator()
+        sim.load_config({'address' : '11.22.33', 'sim_seed' : 5,
+                         'sim_nak_rate' : 0.1, 'sim_timeout_rate' : 0.2,
+                         'sim_broadcast_rate' : 3,
+                         'devices' : {'dimmer' : ['aa.bb.01',
+                                                  {'aa.bb.02' : 'foo'}],
+                                      'keypad_linc' : ['aa.bb.03'],
+                                      'switch' : None}})
+        assert sim.modem_addr == IM.Address('11.22.33')
+        assert sim.nak_rate == 0.1
+        assert sim.timeout_rate == 0.2
+        assert sim.broadcast_rate == 3
+        assert len(sim.devices) == 3
+
+        keypad = sim.devices[IM.Address('aa.bb.03').id]
+        assert keypad.groups == 8
+        assert len(keypad.db) == 9
+
+        # Polling only link.
+        assert isinstance(sim, IM.network.PollLink)
+        assert sim.fileno() is None
+
+    #-----------------------------------------------------------------------
+    def test_commands(self, tmpdir):
+        sim = IM.network.Simulator(seed=1)
+        proto = IM.Protocol(sim)
+        modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+        modem.save_path = str(tmpdir)
+        modem.addr = sim.modem_addr
+
+        addr = IM.Address('aa.bb.01')
+        sim.add_device(addr, "dimmer")
+        device = IM.device.Dimmer(proto, modem, addr, "dim")
+        modem.add(device)
+
+        calls = []
+
+        def on_done(success, msg, data):
+            calls.append((success, msg))
+
+        # The refresh also downloads the database and model since they are
+        # unknown.
+        modem.get_addr(on_done=on_done)
+        device.refresh(force=True, on_done=on_done)
+        device.on(level=0x80, on_done=on_done)
+        run(proto, time.time())
+
+        assert [i[0] for i in calls] == [True, True, True]
+        assert device.db.desc.dev_cat == 0x01
+        assert len(device.db) == 2
+        assert device._level == 0x80
+        assert sim.devices[addr.id].level == 0x80
+        assert proto.stats.counters["finished"] == 5
+
+    #-----------------------------------------------------------------------
+    def test_errors(self, tmpdir):
+        sim = IM.network.Simulator(seed=1)
+        sim.nak_rate = 1.0
+        proto = IM.Protocol(sim)
+        modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+        modem.save_path = str(tmpdir)
+
+        addr = IM.Address('aa.bb.01')
+        sim.add_device(addr, "switch")
+        device = IM.device.Switch(proto, modem, addr, "sw")
+        modem.add(device)
+
+        calls = []
+
+        def on_done(success, msg, data):
+            calls.append((success, msg))
+
+        device.on(on_done=on_done)
+        t = run(proto, time.time())
+        assert calls[0][0] is False
+        assert "Illegal value" in calls[0][1]
+
+        # Timeouts retry and then fail.
+        sim.nak_rate = 0.0
+        sim.timeout_rate = 1.0
+        device.off(on_done=on_done)
+        for i in range(4):
+            t = run(proto, t, num=20)
+            time.sleep(0.0)
+            for handler in [i.handler for i in proto._write_queue]:
+                handler._expire_time = 0
+        run(proto, t, num=20)
+        assert calls[1] == (False, "Command timed out")
+        assert proto.stats.counters["handler_timeouts"] == 1
+
+    #-----------------------------------------------------------------------
+    def test_broadcast(self, tmpdir):
+        sim = IM.network.Simulator(seed=2)
+        proto = IM.Protocol(sim)
+        modem = IM.Modem(proto, IM.network.Stack(), IM.network.TimedCall())
+        modem.save_path = str(tmpdir)
+        modem.addr = sim.modem_addr
+
+        addr = IM.Address('aa.bb.01')
+        sim.add_device(addr, "motion")
+        device = IM.device.Motion(proto, modem, addr, "motion")
+        modem.add(device)
+
+        received = []
+
+        def on_broadcast(msg):
+            received.append(msg)
+
+        proto.signal_received.connect(on_broadcast)
+
+        # The broadcast repeats for each hop, then the cleanup and report.
+        # The repeats are dropped as duplicates by the protocol.
+        t = time.time()
+        proto._poll(t)
+        sim.broadcast(addr, 1, 0x11)
+        run(proto, t)
+        types = [i.flags.type for i in received]
+        assert types[-2:] == [Msg.Flags.Type.ALL_LINK_CLEANUP,
+                              Msg.Flags.Type.ALL_LINK_BROADCAST]
+        assert received[-1].cmd1 == 0x06
+        assert len(received) == 3
+        assert sim.num_read == received[0].flags.hops_left + 3
+        assert device.is_on
+
+        # Random broadcasts at 10/sec.
+        sim.broadcast_rate = 10
+        num = sim.num_read
+        run(proto, t + 10, dt=0.1, num=10)
+        assert sim.num_read > num + 10
+
+    #-----------------------------------------------------------------------
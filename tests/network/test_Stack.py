@@ -0,0 +1,99 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/Stack.py
+#
+#===========================================================================
+import logging
+import time
+import insteon_mqtt as IM
+
+
+#===========================================================================
+class Test_Stack:
+    #-----------------------------------------------------------------------
+    def test_budget(self):
+        stack = IM.network.Stack(time_budget=1.0)
+        calls = []
+
+        group = stack.new()
+        for i in range(100):
+            group.add(calls.append, i)
+
+        # Everything runs in one poll when it fits in the budget.
+        assert stack.next_poll_time(10) == 10
+        stack.poll(10)
+        assert calls == list(range(100))
+        assert group.progress == 1.0
+
+        # The empty group is removed on the next poll.
+        stack.poll(10)
+        assert stack.next_poll_time(10) is None
+
+    #-----------------------------------------------------------------------
+    def test_budget_used(self):
+        stack = IM.network.Stack(time_budget=0.0)
+        calls = []
+
+        def slow(i):
+            calls.append(i)
+            time.sleep(0.001)
+
+        group = stack.new()
+        for i in range(3):
+            group.add(slow, i)
+
+        # At least one call runs per poll.
+        stack.poll(10)
+        assert calls == [0]
+        assert group.num_done == 1
+        assert group.total == 3
+        stack.poll(10)
+        assert calls == [0, 1]
+
+    #-----------------------------------------------------------------------
+    def test_groups(self):
+        stack = IM.network.Stack(time_budget=1.0)
+        calls = []
+
+        a = stack.new()
+        b = stack.new()
+        for i in range(3):
+            a.add(calls.append, "a%d" % i)
+        b.add(calls.append, "b0")
+
+        # The groups take turns.
+        stack.poll(10)
+        assert calls == ["a0", "b0", "a1", "a2"]
+
+    #-----------------------------------------------------------------------
+    def test_error(self):
+        stack = IM.network.Stack(time_budget=1.0)
+        calls = []
+
+        def bad():
+            raise Exception("Test")
+
+        stop = stack.new(error_stop=True)
+        stop.add(bad)
+        stop.add(calls.append, "stop")
+        cont = stack.new(error_stop=False)
+        cont.add(bad)
+        cont.add(calls.append, "cont")
+
+        # The error stops the rest of the first group only.
+        stack.poll(10)
+        assert calls == ["cont"]
+
+    #-----------------------------------------------------------------------
+    def test_progress(self, caplog):
+        caplog.set_level(logging.DEBUG)
+        stack = IM.network.Stack(time_budget=1.0)
+        group = stack.new(name="Test Job")
+        group.add(print)
+        group.add(print)
+        assert group.progress == 0.0
+
+        stack.poll(10)
+        assert "Test Job: 2 of 2 steps done" in caplog.text
+
+    #-----------------------------------------------------------------------
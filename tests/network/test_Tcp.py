@@ -0,0 +1,147 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/Tcp.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import collections
+import socket
+import time
+import pytest
+import insteon_mqtt as IM
+
+
+@pytest.fixture
+def server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1)
+    yield sock
+    sock.close()
+
+
+def run(mgr, check, time_out=2):
+    t0 = time.time()
+    while not check() and time.time() - t0 < time_out:
+        mgr.select(time_out=0.05)
+    assert check()
+
+
+#===========================================================================
+class Test_Tcp:
+    #-----------------------------------------------------------------------
+    def test_config(self):
+        link = IM.network.Tcp()
+        link.load_config({"tcp_host": "10.0.0.1", "tcp_port": 123})
+        assert link._host == "10.0.0.1"
+        assert link._port == 123
+        assert str(link) == "Tcp 10.0.0.1:123"
+
+    #-----------------------------------------------------------------------
+    def test_read_write(self, server):
+        mgr = IM.network.Manager()
+        link = IM.network.Tcp("127.0.0.1", server.getsockname()[1])
+        read = []
+        wrote = []
+
+        def on_read(link, data):
+            read.append(data)
+
+        def on_wrote(link, data):
+            wrote.append(data)
+
+        link.signal_read.connect(on_read)
+        link.signal_wrote.connect(on_wrote)
+
+        # Written before the link is connected.
+        link.write(b"\x02\x60", lambda: 0)
+        mgr.add(link, connected=False)
+        mgr.select(time_out=0)
+        conn = server.accept()[0]
+
+        sock = socket.socket(fileno=link.fileno())
+        try:
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        finally:
+            sock.detach()
+
+        run(mgr, lambda: wrote)
+        assert conn.recv(100) == b"\x02\x60"
+
+        conn.send(b"\x02\x60\x44\x85\x11\x03\x15\x9b\x06")
+        run(mgr, lambda: read)
+        assert read == [b"\x02\x60\x44\x85\x11\x03\x15\x9b\x06"]
+
+        link.close()
+        assert mgr.active() == 1
+        conn.close()
+
+    #-----------------------------------------------------------------------
+    def test_reconnect(self, server):
+        mgr = IM.network.Manager()
+        link = IM.network.Tcp("127.0.0.1", server.getsockname()[1],
+                              reconnect_dt=4)
+        mgr.add(link, connected=False)
+        mgr.select(time_out=0)
+        conn = server.accept()[0]
+        assert len(mgr.links) == 1
+
+        # Writes are kept while the link is down.
+        link.write(b"\x02\x60", lambda: time.time() + 10)
+        conn.close()
+        run(mgr, lambda: not mgr.links)
+        assert link._write_buf
+
+        # The retry time doubles up to the reconnect time.
+        assert link.retry_connect_dt() == 2
+        assert link.retry_connect_dt() == 4
+        assert link.retry_connect_dt() == 4
+
+        link._write_buf[0] = (b"\x02\x60", lambda: 0)
+        assert link.connect()
+        mgr.add(link)
+        conn = server.accept()[0]
+        run(mgr, lambda: not link._write_buf)
+        assert conn.recv(100) == b"\x02\x60"
+        assert link._retry_dt == 1
+
+        link.close()
+        conn.close()
+
+    #-----------------------------------------------------------------------
+    def test_partial(self):
+        link = IM.network.Tcp("127.0.0.1")
+        link._write_buf = collections.deque([(b"\x02\x62", lambda: 0),
+                                             (b"\x02\x60", lambda: 0)])
+        link._write_partial = True
+        link._sock, other = socket.socketpair()
+        link._fd = link._sock.fileno()
+
+        # The rest of a partial write is dropped on close.
+        link.close()
+        assert len(link._write_buf) == 1
+        assert link._write_buf[0][0] == b"\x02\x60"
+        other.close()
+
+    #-----------------------------------------------------------------------
+    def test_resolve(self, server):
+        link = IM.network.Tcp("localhost", server.getsockname()[1])
+
+        # Host names are resolved in a thread.
+        assert link.connect() is False
+        assert link.retry_connect_dt() == link.resolve_dt
+        link._resolver.join()
+        assert link.connect() is True
+        link.close()
+
+    #-----------------------------------------------------------------------
+    def test_connect_error(self, caplog):
+        link = IM.network.Tcp("bad host name.invalid")
+        assert link.connect() is False
+        link._resolver.join()
+        assert link.connect() is False
+        assert "TCP modem can't resolve" in caplog.text
+        assert link.retry_connect_dt() == 1
+
+    #-----------------------------------------------------------------------
@@ -0,0 +1,153 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/TimedCall.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import insteon_mqtt as IM
+
+
+#===========================================================================
+class Test_TimedCall:
+    #-----------------------------------------------------------------------
+    def test_poll(self):
+        timed = IM.network.TimedCall()
+        calls = []
+
+        def call(name):
+            calls.append(name)
+
+        # Insert out of order - the heap sorts by time and then by the order
+        # they were added.
+        timed.add(30, call, "c")
+        timed.add(10, call, "a1")
+        timed.add(20, call, "b")
+        timed.add(10, call, "a2")
+        assert timed.next_poll_time(0) == 10
+
+        timed.poll(5)
+        assert calls == []
+
+        # Every due call runs in one poll.
+        timed.poll(20)
+        assert calls == ["a1", "a2", "b"]
+        assert timed.next_poll_time(20) == 30
+
+        timed.poll(30)
+        assert calls == ["a1", "a2", "b", "c"]
+        assert timed.next_poll_time(30) is None
+
+    #-----------------------------------------------------------------------
+    def test_remove(self):
+        timed = IM.network.TimedCall()
+        calls = []
+
+        def call(name):
+            calls.append(name)
+
+        a = timed.add(10, call, "a")
+        b = timed.add(20, call, "b")
+        c = timed.add(30, call, "c")
+        d = timed.add(40, call, "d")
+
+        # Removed calls stay in the heap and are skipped.
+        assert timed.remove(a) is True
+        assert timed.remove(a) is False
+        assert len(timed.calls) == 4
+        assert timed.next_poll_time(0) == 20
+        assert len(timed.calls) == 3
+
+        # Removing half of the calls rebuilds the heap.
+        assert timed.remove(d) is True
+        assert len(timed.calls) == 3
+        assert timed.remove(b) is True
+        assert timed.calls == [c]
+        assert timed._cancelled == 0
+
+        timed.poll(40)
+        assert calls == ["c"]
+
+        # Calls that already ran can't be removed.
+        assert timed.remove(c) is False
+        assert timed.calls == []
+
+    #-----------------------------------------------------------------------
+    def test_remove_in_poll(self):
+        timed = IM.network.TimedCall()
+        calls = []
+        pending = []
+
+        def call(name):
+            calls.append(name)
+            if name == "a":
+                # Remove more than half of the pending calls.
+                for i in pending:
+                    timed.remove(i)
+
+        timed.add(10, call, "a")
+        pending.append(timed.add(10, call, "b"))
+        timed.add(10, call, "c")
+        pending.append(timed.add(20, call, "d"))
+        pending.append(timed.add(20, call, "e"))
+
+        # Each remaining call runs once and the heap is rebuilt after the
+        # calls are run.
+        timed.poll(10)
+        assert calls == ["a", "c"]
+        assert timed.calls == []
+        assert timed._cancelled == 0
+
+        timed.poll(20)
+        assert calls == ["a", "c"]
+        assert timed.next_poll_time(20) is None
+
+    #-----------------------------------------------------------------------
+    def test_reschedule(self):
+        timed = IM.network.TimedCall()
+        calls = []
+
+        def call():
+            calls.append(len(calls))
+            timed.add(0, call)
+
+        # A call that schedules another due call runs once per poll.
+        timed.add(10, call)
+        timed.poll(10)
+        assert calls == [0]
+        timed.poll(10)
+        assert calls == [0, 1]
+
+    #-----------------------------------------------------------------------
+    def test_reschedule_older(self):
+        timed = IM.network.TimedCall()
+        calls = []
+
+        def call():
+            calls.append("a")
+            timed.add(0, calls.append, "c")
+
+        # The call added by the first call sorts first but the older due
+        # call is still run in the same poll.
+        timed.add(5, call)
+        timed.add(10, calls.append, "b")
+        timed.poll(10)
+        assert calls == ["a", "b"]
+        timed.poll(10)
+        assert calls == ["a", "b", "c"]
+
+    #-----------------------------------------------------------------------
+    def test_error(self):
+        timed = IM.network.TimedCall()
+        calls = []
+
+        def bad():
+            raise Exception("Test")
+
+        timed.add(10, bad)
+        timed.add(10, calls.append, 1)
+
+        # A call that raises doesn't stop the others.
+        timed.poll(10)
+        assert calls == [1]
+
+    #-----------------------------------------------------------------------
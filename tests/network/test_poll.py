@@ -0,0 +1,99 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/network/poll.py
+#
+#===========================================================================
+import socket
+import time
+import insteon_mqtt as IM
+
+
+class SockLink(IM.network.Link):
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.signal_closing.emit(self)
+        self.sock.close()
+
+
+class CountPoll:
+    def __init__(self, poll):
+        self._poll = poll
+        self.num_modify = 0
+
+    def modify(self, fd, mask):
+        self.num_modify += 1
+        self._poll.modify(fd, mask)
+
+    def __getattr__(self, name):
+        return getattr(self._poll, name)
+
+
+#===========================================================================
+class Test_Manager:
+    #-----------------------------------------------------------------------
+    def test_next_poll_time(self):
+        mgr = IM.network.Manager()
+        stack = IM.network.Stack()
+        timed = IM.network.TimedCall()
+        mgr.add_poll(stack)
+        mgr.add_poll(timed)
+        assert mgr.next_poll_time(10) is None
+
+        timed.add(20, print)
+        timed.add(15, print)
+        assert mgr.next_poll_time(10) == 15
+
+        # Stack calls are due right away.
+        stack.new().add(print)
+        assert mgr.next_poll_time(10) == 10
+
+    #-----------------------------------------------------------------------
+    def test_deadline(self):
+        mgr = IM.network.Manager()
+        timed = IM.network.TimedCall()
+        mgr.add_poll(timed)
+        calls = []
+
+        def call():
+            calls.append(time.time())
+
+        # The loop wakes up for the timed call instead of waiting for the
+        # full time out.
+        t0 = time.time()
+        timed.add(t0 + 0.05, call)
+        mgr.select(time_out=5)
+
+        assert len(calls) == 1
+        assert calls[0] - t0 < 1
+
+    #-----------------------------------------------------------------------
+    def test_needs_write(self):
+        mgr = IM.network.Manager()
+        mgr.poll = CountPoll(mgr.poll)
+        a, b = socket.socketpair()
+        link = SockLink(a)
+        mgr.add(link)
+        fd = link.fileno()
+
+        # Only changes to the event mask call modify().
+        for i in range(20):
+            link.signal_needs_write.emit(link, True)
+        assert mgr.poll.num_modify == 1
+        assert mgr.masks[fd] == mgr.READ_WRITE
+
+        link.signal_needs_write.emit(link, False)
+        link.signal_needs_write.emit(link, False)
+        assert mgr.poll.num_modify == 2
+        assert mgr.masks[fd] == mgr.READ
+
+        link.close()
+        assert fd not in mgr.masks
+        b.close()
+
+    #-----------------------------------------------------------------------
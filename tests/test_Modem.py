@@ -87,3 +87,21 @@ class Test_Base_Config():
         for record in caplog.records:
             assert record.levelname != "ERROR"
         assert test_device.addr == IM.Address('44.85.12')
+
+    def test_load_config_supersede(self, test_device, tmpdir):
+        cfg = {'address' : '44.85.12', 'storage' : str(tmpdir),
+               'devices' : {'dimmer' : ['aa.bb.01'], 'switch' : ['aa.bb.02'],
+                            'outlet' : ['aa.bb.03']}}
+        msg = Msg.OutModemInfo(addr=IM.Address('44.85.12'), dev_cat=None,
+                               sub_cat=None, firmware=None, is_ack=True)
+
+        # The device type defaults are used without the input.
+        test_device.load_config_step2(True, 'message', msg, cfg)
+        assert test_device.find('aa.bb.01').supersede_cmds is True
+        assert test_device.find('aa.bb.02').supersede_cmds is True
+        assert test_device.find('aa.bb.03').supersede_cmds is False
+
+        cfg['supersede'] = ['switch']
+        test_device.load_config_step2(True, 'message', msg, cfg)
+        assert test_device.find('aa.bb.01').supersede_cmds is False
+        assert test_device.find('aa.bb.02').supersede_cmds is True
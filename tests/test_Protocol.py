@@ -5,6 +5,7 @@
 # pylint: disable=protected-access
 #===========================================================================
 import time
+from unittest import mock
 import pytest
 import insteon_mqtt as IM
 import insteon_mqtt.message as Msg
@@ -23,7 +24,67 @@ class Test_Protocol:
         link.signal_read.emit(link, bytes([0x02, 0x03, 0x04]))
 
     #-----------------------------------------------------------------------
+    def test_read_split(self):
+        link = MockSerial()
+        proto = IM.Protocol(link)
+        msgs = []
+
+        def received(msg):
+            msgs.append(msg)
+        proto.signal_received.connect(received)
+
+        # Busy byte, leading garbage, then a standard message split across
+        # two reads, followed by an extended message.
+        std = bytes([0x02, 0x50, 0x0a, 0x12, 0x33, 0x00, 0x00, 0x01, 0xc0,
+                     0x11, 0x00])
+        ext = bytes([0x02, 0x51, 0x0a, 0x12, 0x34, 0x44, 0x85, 0x11, 0x10,
+                     0x2f, 0x00]) + bytes(range(14))
+        link.signal_read.emit(link, bytes([0x15, 0x01]) + std[:5])
+        assert msgs == []
+        assert proto._next_write_time > 0
+
+        link.signal_read.emit(link, std[5:] + ext[:3])
+        assert len(msgs) == 1
+        assert msgs[0].from_addr == IM.Address('0a.12.33')
+        assert proto._buf[proto._buf_pos:] == ext[:3]
+
+        link.signal_read.emit(link, ext[3:])
+        assert len(msgs) == 2
+        assert isinstance(msgs[1], Msg.InpExtended)
+        assert msgs[1].data == bytes(range(14))
+        assert isinstance(msgs[1].data, bytes)
+        assert len(proto._buf) == 0
+        assert proto._buf_pos == 0
+
+    #-----------------------------------------------------------------------
+    def test_read_compact(self):
+        link = MockSerial()
+        proto = IM.Protocol(link)
+        proto.buf_compact_size = 20
+        msgs = []
 
+        def received(msg):
+            msgs.append(msg)
+        proto.signal_received.connect(received)
+
+        std = bytes([0x02, 0x50, 0x0a, 0x12, 0x33, 0x00, 0x00, 0x01, 0xc0,
+                     0x11, 0x00])
+
+        # A partial message keeps the consumed bytes in place until the read
+        # offset passes the compact size.
+        link.signal_read.emit(link, std + std[:4])
+        assert len(msgs) == 1
+        assert proto._buf_pos == 11
+        assert len(proto._buf) == 15
+
+        # Change cmd2 so these aren't dropped as duplicates.
+        std2 = std[:10] + bytes([0x01])
+        link.signal_read.emit(link, std[4:] + std2 + std[:4])
+        assert len(msgs) == 3
+        assert proto._buf_pos == 0
+        assert proto._buf == std[:4]
+
+    #-----------------------------------------------------------------------
     def test_duplicate(self):
         link = MockSerial()
         proto = IM.Protocol(link)
@@ -53,12 +114,230 @@ class Test_Protocol:
         flags = Msg.Flags(Msg.Flags.Type.DIRECT_ACK, False)
         addr = IM.Address('0a.12.44')
         msg = Msg.InpStandard(addr, addr, flags, 0x11, 0x01)
-        proto._read_history.append(msg)
         msg.expire_time = 1
+        assert proto._is_duplicate(msg) is False
         assert len(proto._read_history) == 2
         proto._remove_expired_read(time.time())
         assert len(proto._read_history) == 1
-        assert proto._read_history[0] == msg_keep
+        assert len(proto._read_expire) == 1
+        assert msg_keep.fingerprint() in proto._read_history
+
+        # test extended messages, the data is part of the fingerprint
+        flags = Msg.Flags(Msg.Flags.Type.DIRECT, True)
+        data = bytes(14)
+        msg = Msg.InpExtended(addr, addr, flags, 0x2f, 0x00, data)
+        assert proto._is_duplicate(msg) is False
+        msg = Msg.InpExtended(addr, addr, flags, 0x2f, 0x00, data)
+        assert proto._is_duplicate(msg) is True
+        msg = Msg.InpExtended(addr, addr, flags, 0x2f, 0x00, bytes([1] * 14))
+        assert proto._is_duplicate(msg) is False
+
+    #-----------------------------------------------------------------------
+    def test_duplicate_same_time(self):
+        link = MockSerial()
+        proto = IM.Protocol(link)
+
+        # Entries w/ the same expire time must not compare fingerprints.
+        addr = IM.Address('0a.12.33')
+        flags = Msg.Flags(Msg.Flags.Type.DIRECT, False)
+        direct = Msg.InpStandard(addr, addr, flags, 0x11, 0x01)
+        flags = Msg.Flags(Msg.Flags.Type.ALL_LINK_BROADCAST, False)
+        bcast = Msg.InpStandard(addr, addr, flags, 0x11, 0x01)
+        direct.expire_time = bcast.expire_time = time.time() + 10
+        assert proto._is_duplicate(direct) is False
+        assert proto._is_duplicate(bcast) is False
+        assert len(proto._read_expire) == 2
+
+    #-----------------------------------------------------------------------
+    def test_timed(self):
+        link = mock.Mock()
+        proto = IM.Protocol(link)
+        addr = IM.Address('0a.12.33')
+        msgs = [Msg.OutStandard.direct(addr, 0x11, i) for i in range(4)]
+        handler = mock.Mock()
+
+        # Insert out of order - the heap sorts by time.
+        t0 = 1000
+        timed3 = proto.send(msgs[3], handler, after=t0 + 3)
+        timed1 = proto.send(msgs[1], handler, after=t0 + 1)
+        proto.send(msgs[2], handler, after=t0 + 1)
+        timed0 = proto.send(msgs[0], handler, after=t0)
+        assert isinstance(timed0, Msg.Timed)
+        assert proto.next_timed_time() == t0
+
+        # Cancelled messages are skipped.
+        proto.cancel_timed(timed1)
+        proto.cancel_timed(timed1)
+        assert proto._timed_cancelled == 1
+
+        # Everything that is due is moved to the write queue in one poll.
+        proto._poll(t0 + 2)
+        assert [i.msg for i in proto._write_queue] == msgs[0:3:2]
+        assert proto.next_timed_time() == t0 + 3
+        assert proto._timed_cancelled == 0
+
+        # Cancelling a sent message does nothing.
+        proto.cancel_timed(timed0)
+        assert proto._timed_cancelled == 0
+
+        # Cancelling most of the heap removes the cancelled entries.
+        proto.cancel_timed(timed3)
+        assert proto._timed_messages == []
+        assert proto.next_timed_time() is None
+
+    #-----------------------------------------------------------------------
+    def test_next_poll_time(self):
+        link = mock.Mock()
+        link.next_poll_time.return_value = None
+        proto = IM.Protocol(link)
+        addr = IM.Address('0a.12.33')
+        assert link.next_poll_time(10) is None
+
+        # Timed messages.
+        t0 = time.time() + 100
+        msg = Msg.OutStandard.direct(addr, 0x11, 0xff)
+        proto.send(msg, mock.Mock(), after=t0)
+        assert link.next_poll_time(10) == t0
+
+        # The time out of the message waiting for a reply is earlier.
+        handler = IM.handler.StandardCmd(msg, None)
+        proto.send(msg, handler)
+        proto._msg_written(link, msg.to_bytes())
+        assert link.next_poll_time(10) == handler.expire_time
+        assert handler.expire_time < t0
+
+    #-----------------------------------------------------------------------
+    def test_busy(self):
+        link = mock.Mock()
+        link.next_poll_time.return_value = None
+        proto = IM.Protocol(link)
+        addr = IM.Address('0a.12.33')
+        t = time.time()
+        assert proto.is_busy(t) is False
+
+        # Busy while the message is waiting for replies.
+        msg = Msg.OutStandard.direct(addr, 0x11, 0xff)
+        proto.send(msg, IM.handler.StandardCmd(msg, None))
+        link.poll(t)
+        link.set_busy.assert_called_with(True)
+
+        # Busy while more hops of an inbound message may arrive.
+        proto._write_finished()
+        assert proto.is_busy(t) is False
+        proto.set_wait_time(t + 1)
+        assert proto.is_busy(t) is True
+        assert link.next_poll_time(t) == t + 1
+        assert proto.is_busy(t + 2) is False
+
+    #-----------------------------------------------------------------------
+    def test_supersede(self):
+        link = mock.Mock()
+        proto = IM.Protocol(link)
+        addr = IM.Address('0a.12.33')
+        msgs = [Msg.OutStandard.direct(addr, 0x11, i) for i in range(3)]
+        handlers = [mock.Mock() for i in range(3)]
+
+        # The first message is written immediately so it becomes the head
+        # and the second is queued.
+        proto.send(msgs[0], handlers[0], supersede=("state", 1))
+        proto.send(msgs[1], handlers[1], supersede=("state", 1))
+        assert [i.msg for i in proto._write_queue] == msgs[:2]
+
+        # The unsent message is replaced and its handler is told.
+        proto.send(msgs[2], handlers[2], supersede=("state", 1))
+        assert [i.msg for i in proto._write_queue] == [msgs[0], msgs[2]]
+        handlers[1].on_done.assert_called_once_with(
+            False, "Command superseded", None)
+        handlers[0].on_done.assert_not_called()
+
+    #-----------------------------------------------------------------------
+    def test_stats(self):
+        link = mock.Mock()
+        proto = IM.Protocol(link)
+        addr = IM.Address('0a.12.33')
+        handler = IM.handler.StandardCmd(
+            Msg.OutStandard.direct(addr, 0x11, 0xff), lambda *x, **y: None)
+
+        # Queue two messages.  The first one is written immediately.
+        msg = Msg.OutStandard.direct(addr, 0x11, 0xff)
+        proto.send(msg, handler)
+        proto.send(Msg.OutStandard.direct(addr, 0x13, 0x00), mock.Mock())
+        assert proto.stats.gauges["queue_depth"] == [2, 2]
+        assert proto.stats.histograms["queue_time"].count == 1
+
+        # PLM ACK and then the device ACK finishes the message.
+        proto._msg_written(link, msg.to_bytes())
+        proto._data_read(link, msg.to_bytes() + bytes([0x06]))
+        reply = bytes([0x02, 0x50, 0x0a, 0x12, 0x33, 0x44, 0x85, 0x11,
+                       0x2b, 0x11, 0xff])
+        proto._data_read(link, reply)
+
+        # Busy byte and a duplicate.
+        proto._data_read(link, bytes([0x15]) + reply)
+
+        stats = proto.stats.to_dict()
+        assert stats["counters"] == {"written" : 1, "read" : 3,
+                                     "finished" : 1, "plm_busy" : 1,
+                                     "duplicates" : 1}
+        assert stats["gauges"]["queue_depth"] == {"value" : 1, "max" : 2}
+        assert stats["histograms"]["ack_time"]["count"] == 1
+        assert stats["histograms"]["finished_time.OutStandard"]["count"] == 1
+        assert stats["histograms"]["queue_time"]["count"] == 2
+
+    #-----------------------------------------------------------------------
+    def test_read_handlers(self):
+        link = MockSerial()
+        proto = IM.Protocol(link)
+        addr = IM.Address('0a.12.33')
+
+        # Each handler returns UNKNOWN so every matching handler is called.
+        any_msg = mock.Mock()
+        any_msg.msg_received.return_value = Msg.UNKNOWN
+        std = mock.Mock()
+        std.msg_received.return_value = Msg.UNKNOWN
+        std_addr = mock.Mock()
+        std_addr.msg_received.return_value = Msg.UNKNOWN
+        reset = mock.Mock()
+        reset.msg_received.return_value = Msg.UNKNOWN
+
+        proto.add_handler(any_msg)
+        proto.add_handler(std, [Msg.InpStandard.msg_code])
+        proto.add_handler(std_addr, [Msg.InpStandard.msg_code], addr)
+        proto.add_handler(reset, [Msg.InpUserReset.msg_code])
+
+        flags = Msg.Flags(Msg.Flags.Type.DIRECT, False)
+        msg = Msg.InpStandard(addr, addr, flags, 0x11, 0x01)
+        proto._process_msg(msg)
+        assert any_msg.msg_received.call_count == 1
+        assert std.msg_received.call_count == 1
+        assert std_addr.msg_received.call_count == 1
+        assert reset.msg_received.call_count == 0
+
+        # Different address only goes to the non-address handlers.
+        msg = Msg.InpStandard(IM.Address('0a.12.34'), addr, flags, 0x11, 0x01)
+        proto._process_msg(msg)
+        assert any_msg.msg_received.call_count == 2
+        assert std.msg_received.call_count == 2
+        assert std_addr.msg_received.call_count == 1
+
+        proto._process_msg(Msg.InpUserReset())
+        assert any_msg.msg_received.call_count == 3
+        assert std.msg_received.call_count == 2
+        assert reset.msg_received.call_count == 1
+
+        # The address handler is tried first and stops the search.
+        std_addr.msg_received.return_value = Msg.CONTINUE
+        msg = Msg.InpStandard(addr, addr, flags, 0x11, 0x02)
+        proto._process_msg(msg)
+        assert std_addr.msg_received.call_count == 2
+        assert std.msg_received.call_count == 2
+
+        proto.remove_handler(std_addr)
+        proto.remove_handler(std_addr)
+        assert (Msg.InpStandard.msg_code, addr.id) not in proto._read_handlers
+        proto._process_msg(msg)
+        assert std_addr.msg_received.call_count == 2
+        assert std.msg_received.call_count == 3
 
     #-----------------------------------------------------------------------
     def test_set_wait_time(self, test_proto):
@@ -70,6 +349,32 @@ class Test_Protocol:
         test_proto.set_wait_time(0)
         assert test_proto._next_write_time > 5
 
+    #-----------------------------------------------------------------------
+    def test_hold_off(self, test_proto):
+        t = time.time()
+        test_proto.hold_off("a", t + 10)
+        test_proto.hold_off("b", t + 5)
+        test_proto.set_wait_time(t + 2)
+        assert test_proto.get_next_write_time() == t + 10
+
+        # Releasing a hold off keeps the other waits.
+        assert test_proto.release_hold_off("b", t + 1) == t + 5
+        assert test_proto.get_next_write_time() == t + 10
+        assert test_proto.release_hold_off("a", t + 1) == t + 10
+        assert test_proto.get_next_write_time() == t + 2
+
+        # Released or unknown hold offs are ignored.
+        assert test_proto.release_hold_off("a", t) is None
+        assert test_proto.release_hold_off("c", t) is None
+
+        # The end becomes a normal wait and zero cancels everything.
+        test_proto.hold_off("a", t + 10)
+        assert test_proto.release_hold_off("a", t + 3) == t + 10
+        assert test_proto.get_next_write_time() == t + 3
+        test_proto.hold_off("a", t + 10)
+        test_proto.set_wait_time(0)
+        assert test_proto.get_next_write_time() < t + 2
+
 #===========================================================================
 
 
@@ -82,5 +387,8 @@ class MockSerial:
     def poll(self):
         pass
 
+    def next_poll_time(self, t):
+        return None
+
     def load_config(self, config):
         self.config = config
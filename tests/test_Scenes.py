@@ -736,7 +736,8 @@ class MockProto:
         self.msgs = []
         self.signal_msg_finished = MockSignal()
 
-    def send(self, msg, handler, high_priority=False, after=None):
+    def send(self, msg, handler, high_priority=False, after=None,
+             supersede=None):
         self.msgs.append(msg)
 
 class MockSignal:
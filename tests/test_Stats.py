@@ -0,0 +1,55 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/Stats.py
+#
+#===========================================================================
+import json
+import insteon_mqtt as IM
+from insteon_mqtt.Stats import Histogram
+
+
+class Test_Stats:
+    #-----------------------------------------------------------------------
+    def test_histogram(self):
+        hist = Histogram([1, 2, 5])
+        assert hist.to_dict() == {"count" : 0}
+
+        for value in (0.5, 1, 1.5, 4, 10):
+            hist.add(value)
+
+        data = hist.to_dict()
+        assert data["count"] == 5
+        assert data["sum"] == 17
+        assert data["min"] == 0.5
+        assert data["max"] == 10
+        assert data["mean"] == 17 / 5
+        assert data["buckets"] == {"1" : 2, "2" : 1, "5" : 1, "inf" : 1}
+
+        hist.reset()
+        assert hist.count == 0
+
+    #-----------------------------------------------------------------------
+    def test_stats(self):
+        stats = IM.Stats()
+        stats.incr("read")
+        stats.incr("read", 2)
+        stats.gauge("depth", 3)
+        stats.gauge("depth", 1)
+        stats.observe("time", 0.02)
+        stats.observe("count", 3, [1, 5])
+
+        data = stats.to_dict()
+        assert data["counters"] == {"read" : 3}
+        assert data["gauges"] == {"depth" : {"value" : 1, "max" : 3}}
+        assert data["histograms"]["time"]["count"] == 1
+        assert data["histograms"]["count"]["buckets"] == {"1" : 0, "5" : 1,
+                                                          "inf" : 0}
+
+        # The output must be JSON compatible.
+        json.dumps(data)
+
+        stats.reset()
+        assert stats.to_dict() == {"counters" : {}, "gauges" : {},
+                                   "histograms" : {}}
+
+    #-----------------------------------------------------------------------
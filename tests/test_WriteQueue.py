@@ -0,0 +1,145 @@
+#===========================================================================
+#
+# Tests for: insteont_mqtt/WriteQueue.py
+#
+# pylint: disable=protected-access
+#===========================================================================
+import insteon_mqtt as IM
+import insteon_mqtt.message as Msg
+from insteon_mqtt.Protocol import OutputMsg
+
+
+def out(addr, cmd2=0x00, supersede=None):
+    if addr is None:
+        return OutputMsg(Msg.OutModemInfo(), None, supersede)
+    msg = Msg.OutStandard.direct(IM.Address(addr), 0x11, cmd2)
+    return OutputMsg(msg, None, supersede)
+
+
+class Test_WriteQueue:
+    #-----------------------------------------------------------------------
+    def test_basic(self):
+        queue = IM.WriteQueue()
+        assert len(queue) == 0
+        assert queue.start() is None
+
+        a = out('0a.12.33')
+        b = out(None)
+        queue.append(a)
+        queue.append(b)
+        assert len(queue) == 2
+        assert list(queue) == [a, b]
+
+        assert queue.start() is a
+        assert queue.start() is a
+        assert queue.head is a
+        assert queue.finish() is a
+        assert queue.head is None
+        assert len(queue) == 1
+
+        assert queue.start() is b
+        queue.finish()
+        assert len(queue) == 0
+        assert not queue
+
+    #-----------------------------------------------------------------------
+    def test_round_robin(self):
+        queue = IM.WriteQueue()
+        a = [out('0a.12.33', i) for i in range(3)]
+        b = [out('0a.12.34', i) for i in range(2)]
+        c = out('0a.12.35')
+        for i in a + b:
+            queue.append(i)
+        queue.append(c)
+
+        # Devices take turns but each device is in order.
+        expected = [a[0], b[0], c, a[1], b[1], a[2]]
+        assert list(queue) == expected
+
+        sent = []
+        while queue:
+            sent.append(queue.start())
+            queue.finish()
+        assert sent == expected
+
+    #-----------------------------------------------------------------------
+    def test_high_priority(self):
+        queue = IM.WriteQueue()
+        a = out('0a.12.33')
+        b = out('0a.12.34')
+        c = out('0a.12.35')
+        queue.append(a)
+        assert queue.start() is a
+
+        # High priority doesn't replace the head message.
+        queue.append(b, high_priority=True)
+        queue.append(c, high_priority=True)
+        assert list(queue) == [a, c, b]
+        queue.finish()
+        assert queue.start() is c
+
+    #-----------------------------------------------------------------------
+    def test_has_addr(self):
+        queue = IM.WriteQueue()
+        addr = IM.Address('0a.12.33')
+        assert queue.has_addr(addr) is False
+
+        queue.append(out('0a.12.33', 1))
+        queue.append(out('0a.12.33', 2), high_priority=True)
+        queue.append(out(None))
+        assert queue.has_addr(addr) is True
+        assert queue.has_addr(IM.Address('0a.12.34')) is False
+
+        queue.start()
+        queue.finish()
+        assert queue.has_addr(addr) is True
+        queue.start()
+        queue.finish()
+        assert queue.has_addr(addr) is False
+        assert len(queue) == 1
+
+    #-----------------------------------------------------------------------
+    def test_replace(self):
+        queue = IM.WriteQueue()
+        a = out('0a.12.33', 1, ("state", 1))
+        b = out('0a.12.33', 2, ("state", 2))
+        c = out('0a.12.34', 3, ("state", 1))
+        d = out('0a.12.33', 4, ("state", 2))
+        for i in (a, b, c, d):
+            queue.append(i)
+
+        # The head is being sent so it can't be replaced.
+        assert queue.start() is a
+        assert queue.replace(out('0a.12.33', 5, ("state", 1))) is None
+
+        # The first match for the same device and key is replaced in place.
+        e = out('0a.12.33', 6, ("state", 2))
+        assert queue.replace(e) is b
+        assert list(queue) == [a, c, e, d]
+        assert len(queue) == 4
+
+        # No key never matches.
+        assert queue.replace(out('0a.12.34', 7)) is None
+
+        # High priority messages can be replaced too.
+        f = out('0a.12.35', 8, ("state", 1))
+        queue.append(f, high_priority=True)
+        g = out('0a.12.35', 9, ("state", 1))
+        assert queue.replace(g) is f
+        assert list(queue) == [a, g, c, e, d]
+
+        # A high priority replacement is moved to the front.
+        h = out('0a.12.34', 10, ("state", 1))
+        assert queue.replace(h, high_priority=True) is c
+        assert list(queue) == [a, h, g, e, d]
+        assert len(queue) == 5
+        assert 0x0a1234 not in queue._queues
+
+        queue.finish()
+        assert [queue.start(), queue.finish()] == [h, h]
+        assert queue.start() is g
+
+    #-----------------------------------------------------------------------
+
+
+#===========================================================================
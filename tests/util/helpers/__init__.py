@@ -5,6 +5,7 @@
 #===========================================================================
 
 from .Data import Data
+from . import hub
 from . import main
 from . import mqtt
 from . import network
@@ -0,0 +1,268 @@
+#===========================================================================
+#
+# Insteon Hub HTTP server emulator for the Hub link tests and benchmark.
+#
+#===========================================================================
+import base64
+import http.server
+import threading
+import time
+from urllib.parse import urlsplit
+import insteon_mqtt as IM
+
+LOG = IM.log.get_logger(__name__)
+
+
+class HubEmulator:
+    """Local HTTP server that acts like an Insteon Hub.
+
+    This is used to test and benchmark the Hub link without a Hub.  It
+    serves the same two requests the Hub link uses:
+
+    - /buffstatus.xml returns the ring buffer of hex characters read from
+      the modem followed by the end position of the buffer.
+    - /3?<hex>=I=3 writes the message to the modem.  Like a real Hub, this
+      clears the ring buffer.
+
+    Requests must use HTTP basic auth with the user and password.  The
+    modem and the Insteon network behind it are a Simulator link which is
+    run in real time by a server thread so devices can be added and the
+    error and broadcast rates set on the sim attribute.
+
+    Every request is delayed by latency seconds to act like the slow Hub
+    web server.  If more characters are added to the ring than it holds
+    between two buffer reads, the oldest data is lost the same way it is
+    on the Hub.  Those reads are counted in num_overflows.  Use a smaller
+    buff_length or a higher sim.broadcast_rate to cause more overflows.
+
+        hub = HubEmulator(latency=0.05).start()
+        hub.sim.add_device("aa.bb.cc", "dimmer")
+        link = IM.network.Hub("127.0.0.1", hub.port, "user", "password")
+        ...
+        hub.stop()
+    """
+    def __init__(self, user="user", password="password", host="127.0.0.1",
+                 port=0, buff_length=200, latency=0.0, sim=None):
+        """Constructor
+
+        Args:
+          user (str):  The basic auth user name.
+          password (str):  The basic auth password.
+          host (str):  The address to listen on.
+          port (int):  The port to listen on.  If this is 0, a free port is
+               used (see the port attribute).
+          buff_length (int):  The number of hex characters in the ring
+                      buffer.
+          latency (float):  Seconds to delay each request.
+          sim (Simulator):  The virtual modem and devices.  If this is None,
+              one is created.
+        """
+        self.sim = sim if sim is not None else IM.network.Simulator()
+        self.buff_length = buff_length
+        self.latency = latency
+        self._auth = "Basic " + base64.b64encode(
+            ("%s:%s" % (user, password)).encode()).decode()
+
+        # Ring buffer of hex characters, the position to add the next
+        # character, and the number added since the last read.
+        self._ring = bytearray(b"0" * buff_length)
+        self._end = 0
+        self._unread = 0
+
+        # Request counts.
+        self.num_reads = 0
+        self.num_writes = 0
+        self.num_overflows = 0
+        self.num_auth_errors = 0
+
+        # The simulator and ring buffer are used by the server and the
+        # simulator threads.
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.sim.signal_read.connect(self._sim_read)
+
+        emulator = self
+
+        class Handler(_Handler):
+            hub = emulator
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    #-----------------------------------------------------------------------
+    @property
+    def port(self):
+        """The port the server is listening on.
+        """
+        return self.server.server_address[1]
+
+    #-----------------------------------------------------------------------
+    def start(self):
+        """Start the server and simulator threads.
+
+        Returns:
+          Returns self.
+        """
+        for target in (self.server.serve_forever, self._run_sim):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    #-----------------------------------------------------------------------
+    def stop(self):
+        """Stop the server and simulator threads.
+        """
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    #-----------------------------------------------------------------------
+    def check_auth(self, header):
+        """Check a request Authorization header.
+
+        Args:
+          header (str):  The header value or None if there isn't one.
+
+        Returns:
+          bool:  Returns True if the header has the user and password.
+        """
+        if header == self._auth:
+            return True
+
+        self.num_auth_errors += 1
+        return False
+
+    #-----------------------------------------------------------------------
+    def buffstatus(self):
+        """Return the buffstatus.xml response body.
+
+        Returns:
+          bytes:  The response with the ring buffer and the end position.
+        """
+        with self._lock:
+            self.num_reads += 1
+            if self._unread > self.buff_length:
+                self.num_overflows += 1
+            self._unread = 0
+            return b"<response><BS>%s%02X</BS></response>" % (
+                bytes(self._ring), self._end)
+
+    #-----------------------------------------------------------------------
+    def write(self, data):
+        """Write a message to the modem.
+
+        The ring buffer is cleared like a real Hub does.
+
+        Args:
+          data (bytes):  The message to write.
+        """
+        with self._lock:
+            self.num_writes += 1
+            self._ring[:] = b"0" * self.buff_length
+            self._end = 0
+            self._unread = 0
+
+            self.sim.write(data, lambda: 0)
+            self.sim.poll(time.time())
+
+    #-----------------------------------------------------------------------
+    def _run_sim(self):
+        """Simulator thread.
+
+        Polls the simulator when it has replies or broadcasts due.
+        """
+        while not self._stop.is_set():
+            with self._lock:
+                t = time.time()
+                self.sim.poll(t)
+                next_time = self.sim.next_poll_time(t)
+
+            dt = 0.01 if next_time is None else next_time - time.time()
+            self._stop.wait(min(max(dt, 0.001), 0.01))
+
+    #-----------------------------------------------------------------------
+    def _sim_read(self, link, data):
+        """Simulator read callback.
+
+        Adds the data to the ring buffer.  This is called with the lock
+        held.
+
+        Args:
+          link (Simulator):  The simulator.
+          data (bytes):  The message read from the modem.
+        """
+        ring = self._ring
+        size = self.buff_length
+        for c in data.hex().upper().encode():
+            ring[self._end] = c
+            self._end = (self._end + 1) % size
+        self._unread += 2 * len(data)
+
+    #-----------------------------------------------------------------------
+
+
+#===========================================================================
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """HTTP request handler for the HubEmulator.
+
+    The hub class attribute is set to the emulator.
+    """
+    hub = None
+
+    #-----------------------------------------------------------------------
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle a GET request.
+        """
+        hub = self.hub
+        if hub.latency:
+            time.sleep(hub.latency)
+
+        if not hub.check_auth(self.headers.get("Authorization")):
+            self._reply(401, b"")
+            return
+
+        url = urlsplit(self.path)
+        if url.path == "/buffstatus.xml":
+            self._reply(200, hub.buffstatus())
+
+        # Writes look like /3?0262AABBCC0F1100=I=3
+        elif url.path == "/3" and url.query.endswith("=I=3"):
+            try:
+                data = bytes.fromhex(url.query[:-4])
+            except ValueError:
+                self._reply(400, b"")
+                return
+
+            hub.write(data)
+            self._reply(200, b"")
+
+        else:
+            self._reply(404, b"")
+
+    #-----------------------------------------------------------------------
+    def _reply(self, code, body):
+        """Send the response.
+
+        Args:
+          code (int):  The HTTP status code.
+          body (bytes):  The response body.
+        """
+        self.send_response(code)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    #-----------------------------------------------------------------------
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Log requests at the debug level instead of to stderr.
+        """
+        LOG.debug("HubEmulator: " + format, *args)
+
+    #-----------------------------------------------------------------------
@@ -50,10 +50,10 @@ class MockProtocol:
     def clear(self):
         self.sent = []
 
-    def send(self, msg, handler, priority=None, after=None):
+    def send(self, msg, handler, priority=None, after=None, supersede=None):
         self.sent.append(Data(msg=msg, handler=handler))
 
-    def add_handler(self, handler):
+    def add_handler(self, handler, msg_codes=None, addr=None):
         pass
 
     def set_wait_time(self, seconds):